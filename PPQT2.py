@@ -43,93 +43,110 @@ import constants as C
 import resources # make available fonts and images encoded by pyrcc5
 
 '''
-Select a writeable location for the log files depending on the OS platform.
-'''
-
-if C.PLATFORM_IS_MAC :
-    log_path = os.path.expanduser( '~/Library/Logs' )
-elif C.PLATFORM_IS_WIN :
-    if 'TMP' in os.environ :
-        log_path = os.environ['TMP']
-    elif 'TEMP' in os.environ :
-        log_path = os.environ['TEMP']
-    elif 'WINDIR' in os.environ :
-        log_path = os.path.join( os.environ['WINDIR'], 'TEMP' )
-    else :
-        log_path = '/Windows/Temp'
-else: # Linux
-    log_path = '/var/tmp'
-log_path = os.path.join( log_path, 'PPQT2.log' )
-
-'''
-Initiate a rotating log file in the chosen location and write
-a start-up log message documenting time and versions.
-'''
-
-log_handler = logging.handlers.RotatingFileHandler(
-    log_path, mode='a', encoding='UTF-8', maxBytes=100000, backupCount=5 )
-
-logging.basicConfig( handlers=[log_handler], level=logging.INFO )
-
-now = datetime.datetime.now()
-
-logging.info( '==========================================' )
-logging.info( 'PPQT2 starting up on {} with Qt {} and PyQt {}'.format(
-    now.ctime(), C.QT_VERSION_STR, C.PYQT_VERSION_STR ) )
-
-'''
-Create the Qt application, passing it either an empty list of options
-or, in Linux, a selected style chosen to avoid a GTK bug in Ubuntu Unity
-
-TODO: test to see if that is still needed or appropriate!
-
-The following import is required here, before creating the application,
-to avoid a stupid error message when creating the QWebEngineView in the
-helpview module.
-
-'''
-import PyQt6.QtWebEngineWidgets
-
-from PyQt6.QtWidgets import QApplication
-args = []
-import sys
-if sys.platform == 'linux' :
-    # avoid a GTK bug in Ubuntu Unity
-    args = ['','-style','Cleanlooks']
-
-the_app = QApplication( args )
-the_app.setOrganizationName( "PGDP" )
-the_app.setOrganizationDomain( "pgdp.net" )
-the_app.setApplicationName( "PPQT2" )
-
-'''
-Now that the application is running we can open our settings file. The
-settings file is saved by the Main Window and passed to each major module
-(such as a Book) when it is instantiated. Each module is expected to load its
-particular settings from it, and to save them during shut-down.
-
-Normally the settings file will contain the various items written when we
-last shut down. In the case of a clean install, the settings are empty, but
-each module supplies suitable defaults for that case.
-'''
-
-from PyQt6.QtCore import QSettings
-the_settings = QSettings()
-
-'''
-Create the one and only MainWindow instance, passing it the settings file.
-Ask it to show itself. Then initiate the application event loop.
-'''
-from mainwindow import MainWindow
-the_main_window = MainWindow( the_settings )
-the_main_window.show()
-the_app.exec()
-
-'''
-The application event loop has ended, meaning probably that Quit has been
-called. Annotate the log file for shutdown.
-'''
-now = datetime.datetime.now()
-
-logging.info( 'PPQT2 shutting down at {}'.format( now.ctime() ) )
-logging.info( '==========================================' )
+Everything else happens only when this is the main program. When the
+Images panel runs its page analysis on a pool of processes, each worker
+process imports this module under another name, and must not start up
+a second copy of the application.
+'''
+if __name__ == '__main__' :
+
+    '''
+    With --translate on the command line, translate books without opening
+    the main window, see xltbatch.py. Errors go to stderr, not the log file.
+    '''
+    if '--translate' in sys.argv :
+        logging.basicConfig( level=logging.WARNING )
+        import xltbatch
+        sys.exit( xltbatch.main( sys.argv ) )
+
+    '''
+    Select a writeable location for the log files depending on the OS platform.
+    '''
+
+    if C.PLATFORM_IS_MAC :
+        log_path = os.path.expanduser( '~/Library/Logs' )
+    elif C.PLATFORM_IS_WIN :
+        if 'TMP' in os.environ :
+            log_path = os.environ['TMP']
+        elif 'TEMP' in os.environ :
+            log_path = os.environ['TEMP']
+        elif 'WINDIR' in os.environ :
+            log_path = os.path.join( os.environ['WINDIR'], 'TEMP' )
+        else :
+            log_path = '/Windows/Temp'
+    else: # Linux
+        log_path = '/var/tmp'
+    log_path = os.path.join( log_path, 'PPQT2.log' )
+
+    '''
+    Initiate a rotating log file in the chosen location and write
+    a start-up log message documenting time and versions.
+    '''
+
+    log_handler = logging.handlers.RotatingFileHandler(
+        log_path, mode='a', encoding='UTF-8', maxBytes=100000, backupCount=5 )
+
+    logging.basicConfig( handlers=[log_handler], level=logging.INFO )
+
+    now = datetime.datetime.now()
+
+    logging.info( '==========================================' )
+    logging.info( 'PPQT2 starting up on {} with Qt {} and PyQt {}'.format(
+        now.ctime(), C.QT_VERSION_STR, C.PYQT_VERSION_STR ) )
+
+    '''
+    Create the Qt application, passing it either an empty list of options
+    or, in Linux, a selected style chosen to avoid a GTK bug in Ubuntu Unity
+
+    TODO: test to see if that is still needed or appropriate!
+
+    The following import is required here, before creating the application,
+    to avoid a stupid error message when creating the QWebEngineView in the
+    helpview module.
+
+    '''
+    import PyQt6.QtWebEngineWidgets
+
+    from PyQt6.QtWidgets import QApplication
+    args = []
+    import sys
+    if sys.platform == 'linux' :
+        # avoid a GTK bug in Ubuntu Unity
+        args = ['','-style','Cleanlooks']
+
+    the_app = QApplication( args )
+    the_app.setOrganizationName( "PGDP" )
+    the_app.setOrganizationDomain( "pgdp.net" )
+    the_app.setApplicationName( "PPQT2" )
+
+    '''
+    Now that the application is running we can open our settings file. The
+    settings file is saved by the Main Window and passed to each major module
+    (such as a Book) when it is instantiated. Each module is expected to load its
+    particular settings from it, and to save them during shut-down.
+
+    Normally the settings file will contain the various items written when we
+    last shut down. In the case of a clean install, the settings are empty, but
+    each module supplies suitable defaults for that case.
+    '''
+
+    from PyQt6.QtCore import QSettings
+    the_settings = QSettings()
+
+    '''
+    Create the one and only MainWindow instance, passing it the settings file.
+    Ask it to show itself. Then initiate the application event loop.
+    '''
+    from mainwindow import MainWindow
+    the_main_window = MainWindow( the_settings )
+    the_main_window.show()
+    the_app.exec()
+
+    '''
+    The application event loop has ended, meaning probably that Quit has been
+    called. Annotate the log file for shutdown.
+    '''
+    now = datetime.datetime.now()
+
+    logging.info( 'PPQT2 shutting down at {}'.format( now.ctime() ) )
+    logging.info( '==========================================' )
@@ -62,7 +62,7 @@ Naming convention: xxxxm is a model, e.g. editm = editdata.Document and
 xxxxxv is a view, e.g. wordv = wordview.WordPanel
 
 '''
-from PyQt6.QtCore import QObject, QCoreApplication,QCryptographicHash
+from PyQt6.QtCore import QObject, QCoreApplication, QTimer, pyqtSignal
 _TR = QCoreApplication.translate
 
 import utilities
@@ -79,6 +79,9 @@ import editview
 import findview
 import fnotdata
 import fnotview
+import journal
+import lintdata
+import lintview
 import imageview
 #import loupeview
 import noteview
@@ -86,9 +89,107 @@ import pagedata
 import pageview
 import worddata
 import wordview
+import concurrent.futures
+import hashlib
+import os
 import logging
 
+'''
+Saving a book in the background. save_book() takes a snapshot of the text,
+which is an immutable Python string, and of the metadata, see
+MetaMgr.snapshot(), and submits _write_book() to run on the one SAVER
+thread. Saves of all books go through the one thread, so two saves of the
+same book are written in the order they were made.
+
+_write_book() streams the text to a temporary file SAVE_CHUNK characters at
+a time, feeding each chunk's UTF-8 bytes to the hash for the DOCHASH section
+as it goes, so the text is encoded only once (twice for a Latin-1 book,
+whose file bytes differ from the hashed ones). Then it writes the metadata
+to a temporary file, and renames both over the old files only when they
+are complete: first the metadata, then the text, putting the old metadata
+back if the text cannot be renamed, so the text and its DOCHASH always
+agree. A failed save leaves the previous files intact, and deletes its
+temporary files. It returns
+the hash of the saved text, (algorithm, digest), or the exception that
+stopped it: usually an OSError, but an encoding or metadata error also
+counts as a failed save rather than escaping from the thread.
+
+The hash is SHA-1 unless the book's metadata says otherwise, see _read_hash().
+A book whose metadata is a compact container is hashed with the faster
+BLAKE2b. An SHA-1 hash is written as bytes, as always; any other is written
+as [algorithm name, bytes].
+'''
+SAVER = concurrent.futures.ThreadPoolExecutor( 1 )
+SAVE_POLL_MS = 50
+SAVE_CHUNK = 1024 * 1024
+FAST_HASH = 'blake2b'
+
+'''
+The most page separator anomalies listed in the warning new_book() shows.
+'''
+ANOMALIES_SHOWN = 20
+
+def _text_chunks(text):
+    for start in range( 0, len(text), SAVE_CHUNK ) :
+        yield text[ start : start + SAVE_CHUNK ]
+
+def _hash_text(text, hash_name):
+    hasher = hashlib.new( hash_name )
+    for chunk in _text_chunks( text ) :
+        hasher.update( chunk.encode('UTF-8') )
+    return hasher.digest()
+
+def _hash_value(hash_name, digest):
+    return digest if hash_name == 'sha1' else [ hash_name, digest ]
+
+def _discard(path):
+    try :
+        os.remove( path )
+    except OSError :
+        pass
+
+def _write_book(text, doc_path, encoding, hash_name, meta_snapshot, meta_path):
+    doc_temp = doc_path + '.tmp'
+    meta_temp = meta_path + '.tmp'
+    try :
+        hasher = hashlib.new( hash_name )
+        line_end = os.linesep.encode('ASCII')
+        with open( doc_temp, 'wb' ) as doc_file :
+            for chunk in _text_chunks( text ) :
+                data = chunk.encode('UTF-8')
+                hasher.update( data )
+                if encoding != 'UTF-8' :
+                    data = chunk.encode( encoding, errors='replace' )
+                if line_end != b'\n' :
+                    data = data.replace( b'\n', line_end )
+                doc_file.write( data )
+        metadata.write_snapshot( meta_snapshot,
+            { C.MD_DH : _hash_value( hash_name, hasher.digest() ) }, meta_temp )
+        old_meta = None
+        if os.path.exists( meta_path ) :
+            with open( meta_path, 'rb' ) as meta_file :
+                old_meta = meta_file.read()
+        os.replace( meta_temp, meta_path )
+        try :
+            os.replace( doc_temp, doc_path )
+        except OSError :
+            if old_meta is None :
+                _discard( meta_path )
+            else :
+                with open( meta_temp, 'wb' ) as meta_file :
+                    meta_file.write( old_meta )
+                os.replace( meta_temp, meta_path )
+            raise
+    except Exception as error_object :
+        _discard( doc_temp )
+        _discard( meta_temp )
+        return error_object
+    return ( hash_name, hasher.digest() )
+
 class Book(QObject):
+    ''' Signal emitted when a save finishes, with True for success '''
+    BookSaved = pyqtSignal(bool)
+
     def __init__(self, sequence, the_main ):
         super().__init__(None)
         '''
@@ -128,6 +229,20 @@ class Book(QObject):
         '''
         self.md_modified = 0
         '''
+        The algorithm of the DOCHASH read from metadata, see _read_hash()
+        '''
+        self.hash_name = 'sha1'
+        '''
+        Background saves not yet finished, as (future, edit count, metadata
+        revision) where the counts are those of the snapshot; and a timer
+        that polls for their completion. See save_book().
+        '''
+        self.md_revision = 0
+        self.saves_pending = []
+        self.save_timer = QTimer(self)
+        self.save_timer.setInterval( SAVE_POLL_MS )
+        self.save_timer.timeout.connect( self._harvest_saves )
+        '''
         Initialize bookmarks, loaded from metadata later. The bookmarks are
         indexed 1-9 (from control-1 to control-9 keys) but the list has ten
         entries, entry 0 not being used.
@@ -159,10 +274,24 @@ class Book(QObject):
         Create the data model objects. These are private to the book.
         '''
         self.editm = editdata.Document(self) # document, to be initialized later
+        '''
+        The journal of edits since the last save, see journal.py, and the
+        hash of the text as opened, if it matched the metadata.
+        '''
+        self.journal = journal.Journal(self.editm)
+        self.text_hash = None
+        '''
+        The bookmarks are not QTextCursors but pairs of slots, anchor and
+        position, in a PositionTracker, so they follow edits without adding
+        to the cursors Qt must adjust on every keystroke. See set_bookmark().
+        '''
+        self.mark_tracker = self.editm.make_tracker()
+        self.mark_tracker.set_positions( [0] * (2 * len(self.bookmarks)) )
         self.pagem = pagedata.PageData(self) # page data
         self.charm = chardata.CharData(self) # character data
         self.wordm = worddata.WordData(self) # vocabulary data
         self.fnotm = fnotdata.FnoteData(self) # footnote data
+        self.lintm = lintdata.MarkupLint(self.editm) # markup structure check
         '''
         Create our dict of activity panel objects, used by the main window
         when giving this book the focus. See mainwindow.py for details.
@@ -183,6 +312,7 @@ class Book(QObject):
         self.panel_dict['Words'] = wordview.WordPanel(self) # wordview.WordPanel(self)
         self.panel_dict['Pages'] = pageview.PagePanel(self) # pageview.PagePanel(self)
         self.panel_dict['Fnote'] = fnotview.FnotePanel(self) # fnotview.FnotePanel(self)
+        self.panel_dict['Markup'] = lintview.LintPanel(self)
         #self.panel_dict['Loupe'] = loupeview.LoupeView(self)
         self.panel_dict['tab_list'] = [
         (tabname, self.panel_dict[tabname]) for tabname in self.panel_dict['default']
@@ -245,10 +375,57 @@ class Book(QObject):
         # Everything loaded from a file, clear any mod status
         self.md_modified = 0
         self.editm.setModified(False)
+        self._recover_journal()
         # Set the edit cursor to a saved location
         tc = self.editv.make_cursor(self.edit_cursor[0],self.edit_cursor[1])
         self.editv.center_this( tc )
     '''
+    After opening a book whose text matched its metadata, look for a journal
+    left by a crash and offer to replay the edits it holds. They are applied
+    as one edit, from the first difference to the last, so positions in the
+    page table and the like are remapped as for any edit, and the user can
+    undo it. Then start a fresh journal.
+    '''
+    def _recover_journal(self):
+        if self.text_hash is None :
+            return
+        path = self.book_full_path + '.' + C.JOURNAL_SUFFIX
+        old_text = self.editm.full_text()
+        new_text = journal.read_journal( path, old_text, self.text_hash )
+        self.journal.start( self.book_full_path, self.text_hash )
+        if new_text is None or new_text == old_text :
+            return
+        if not utilities.ok_cancel_msg(
+            _TR('Book object', 'Edits made after the last save were found',
+                'Question during File:Open'),
+            _TR('Book object', 'PPQT may have stopped without saving this book. Recover those edits?',
+                'Question during File:Open'),
+            parent= self.mainwindow ) :
+            return
+        start = 0
+        limit = min( len(old_text), len(new_text) )
+        while start < limit and old_text[start] == new_text[start] :
+            start += 1
+        tail = 0
+        while tail < limit - start and old_text[-1-tail] == new_text[-1-tail] :
+            tail += 1
+        self.editm.apply_edits(
+            [ ( start, len(old_text) - tail, new_text[ start : len(new_text) - tail ] ) ] )
+        self.logger.info( 'Recovered edits from journal {}'.format(path) )
+    '''
+    The main window is closing the book. Let any save still being written
+    finish. Unless a save the user asked for has failed, the journal is no
+    longer wanted: the book was saved, or the user discarded the changes.
+    '''
+    def close_book(self, keep_journal=False):
+        for (future, mark, edit_count, md_revision) in self.saves_pending :
+            future.result()
+        self._harvest_saves()
+        if keep_journal :
+            self.journal.timer.stop()
+        else :
+            self.journal.close()
+    '''
     FILE>OPEN of a document that lacks an accompanying .meta file. Input:
     
     * doc_stream: a FileBasedTextStream with the document data
@@ -257,7 +434,8 @@ class Book(QObject):
     
     * bad_stream: None, or a text stream of a bad_words file
     
-    Create page-boundary metadata by scanning the text for page separators.
+    Create page-boundary metadata by scanning the text for page separators,
+    and warn the user of any that repeat a filename or are out of sequence.
     Default the cursor position to zero. Make a new speller dictionary just
     in the unlikely case that this new book folder has a local copy of the
     same dictionary tag as the global default we already set up. Set up as
@@ -286,6 +464,16 @@ class Book(QObject):
         if bad_stream :
             self.wordm.bad_file(bad_stream)
         self.pagem.scan_pages() # develop page metadata if possible
+        anomalies = self.pagem.anomalies()
+        if anomalies :
+            m2 = '\n'.join( message for (R, message) in anomalies[:ANOMALIES_SHOWN] )
+            if len(anomalies) > ANOMALIES_SHOWN :
+                m2 += '\n' + _TR( 'File:Open finds page anomalies',
+                                  'and {} more' ).format( len(anomalies) - ANOMALIES_SHOWN )
+            utilities.warning_msg(
+                _TR( 'File:Open finds page anomalies',
+                     'Some page separator lines repeat a filename or are out of sequence' ),
+                m2, self.mainwindow )
         self.hook_images() # set up display of scan images if possible
         self.editv.set_cursor(self.editv.make_cursor(0,0)) # cursor to top
         self._speller = dictionaries.Speller( self.dict_tag, self.book_folder )
@@ -332,34 +520,72 @@ The first bad character is at ''',
         self.book_full_path = doc_stream.fullpath()
         self.editv.book_renamed(self.book_name)
         self.md_modified = True
-
-    '''
-    
-    The only save function: called from main window with two streams to be
-    written. Note that we ASSUME any save will include a .meta file. (PPQT
-    is not a general purpose editor, if you use it for some scratch file,
-    you will get scratch.meta as well.)
-    
-    After writing the data into the streams, we call the flush() method. This
-    returns False if the operation is unsuccessful, presumably due to an I/O
-    error of some type. flush() is the main operation, in fact the close()
-    method ignores errors on flush and clears error status. The files will be
-    closed when mainwindow._save() exits.
-    '''
-    def save_book(self, doc_stream, meta_stream):
-        doc_stream << self.editm.toPlainText()
-        output_ok = doc_stream.flush()
-        if not output_ok :
-            doc_stream.show_error( 'saving', self.mainwindow )
-        else :
-            self.metamgr.write_meta(meta_stream)
-            output_ok = meta_stream.flush()
-            if not output_ok :
-                meta_stream.show_error( 'saving metadata', self.mainwindow )
-        if output_ok :
-            self.editm.setModified(False)
-            self.md_modified = False
-            self.editv.mod_change_signal(False)
+        self.md_revision += 1
+
+    '''
+
+    The only save function: called from main window to write the book and
+    its metadata to the book's path. Note that we ASSUME any save will
+    include a .meta file. (PPQT is not a general purpose editor, if you use
+    it for some scratch file, you will get scratch.meta as well.)
+
+    The text and the metadata are captured here, on the GUI thread; the
+    encoding, hashing and writing happen on the SAVER thread, so the user
+    can go on editing. When the write finishes, _harvest_saves() clears the
+    modified flags, but only those that have not changed since the snapshot,
+    and emits BookSaved. With wait=True (when closing a book or quitting)
+    we wait for the write and return its success; otherwise we return True
+    for a save begun.
+    '''
+    def save_book(self, wait=False):
+        doc_path = self.book_full_path
+        meta_path = doc_path + '.' + C.METAFILE_SUFFIX
+        meta_snapshot = self.metamgr.snapshot( late=(C.MD_DH,) )
+        future = SAVER.submit( _write_book,
+                               self.editm.full_text(), doc_path,
+                               utilities.python_encoding(doc_path),
+                               self._hash_name(), meta_snapshot, meta_path )
+        mark = self.journal.mark( doc_path )
+        self.saves_pending.append( (future, mark, self.editm.edit_count, self.md_revision) )
+        if not wait :
+            self.save_timer.start()
+            return True
+        future.result()
+        return self._harvest_saves()
+
+    '''
+    Slot for the save_timer: deal with each save that has finished, in the
+    order they were made, and stop the timer when none is left. Return False
+    if any of them failed.
+    '''
+    def _harvest_saves(self):
+        output_ok = True
+        while self.saves_pending and self.saves_pending[0][0].done() :
+            (future, mark, edit_count, md_revision) = self.saves_pending.pop(0)
+            result = future.result()
+            error_object = result if isinstance(result, Exception) else None
+            if error_object is None :
+                self.journal.restart( mark, result )
+                if edit_count == self.editm.edit_count :
+                    self.editm.setModified(False)
+                if md_revision == self.md_revision :
+                    self.md_modified = 0
+                self.editv.mod_change_signal(False)
+            else :
+                output_ok = False
+                self.journal.forget( mark )
+                self.logger.error( 'Error saving {}: {}'.format( self.book_full_path, str(error_object) ) )
+                if isinstance(error_object, OSError) :
+                    utilities.warning_msg(
+                        'Error {} ({}) on saving'.format( error_object.errno, error_object.strerror ),
+                        error_object.filename, self.mainwindow )
+                else :
+                    utilities.warning_msg(
+                        'Error {} on saving'.format( type(error_object).__name__ ),
+                        str(error_object), self.mainwindow )
+            self.BookSaved.emit( error_object is None )
+        if not self.saves_pending :
+            self.save_timer.stop()
         return output_ok
 
     '''
@@ -393,7 +619,7 @@ The first bad character is at ''',
                     cpos = int(p) # further exceptions if not numerics
                     canc = int(a)
                     if self._test_cpos(cpos) and self._test_cpos(canc) :
-                        self.bookmarks[ix] = self.editv.make_cursor(cpos,canc)
+                        self.set_bookmark(ix, cpos, canc)
                     else :
                         raise ValueError
                 except:
@@ -408,6 +634,16 @@ The first bad character is at ''',
                 ret.append([ix, self.bookmarks[ix].position(), self.bookmarks[ix].anchor()])
         return ret
 
+    '''
+    Set bookmark ix to the selection from anchor to position. The entry in
+    self.bookmarks becomes a TrackedCursor on slots 2*ix and 2*ix+1 of
+    mark_tracker; use its make_cursor() to get a QTextCursor.
+    '''
+    def set_bookmark(self, ix, position, anchor):
+        self.mark_tracker.set_position(2*ix, anchor)
+        self.mark_tracker.set_position(2*ix+1, position)
+        self.bookmarks[ix] = self.mark_tracker.cursor(2*ix)
+
     '''
     Process {"CURSOR: [position, anchor]}. Be suspicious of the coding.
     self.edit_cursor was initialized to (0,0), so just leave it if problems.
@@ -434,11 +670,18 @@ The first bad character is at ''',
     The tag might not be available, either because the user mistyped it,
     or because the dictionary path isn't set right, or other reasons.
     In that case log an error and stay with the current default.
+
+    Usually the tag is the default, whose speller we made on creation.
+    Loading a dictionary takes longer than the rest of the metadata, so
+    don't load the same one from the same path again.
     '''
     def _read_dict(self, sentinel, value, version) :
         tag_dict = dictionaries.get_tag_list(self.book_folder)
         try:
             dict_path = tag_dict[value] # index error if value not a known tag
+            if value == self.dict_tag and dict_path == self._speller.dict_path \
+            and self._speller.is_valid() :
+                return
             speller = dictionaries.Speller(value,dict_path)
             if not speller.is_valid() :
                 raise ValueError
@@ -473,23 +716,33 @@ The first bad character is at ''',
     Process {"DOCHASH": b'hash_string_in_hex'}. The purpose of storing a hash
     of the document text in the metadata file is to detect when by some
     error, the metadata file relates to a different version of the book, as
-    for example if one was restored from backup and the other not.
-    
-    Calculate a hash signature of the current document and return
-    it as a string like "b'\\xde\\xad\\xbe\\xef...'" 
+    for example if one was restored from backup and the other not. The value
+    may also be ["algorithm", b'hash_string_in_hex'], see _write_book().
+
+    Calculate a hash signature of the current document, hashing the cached
+    full text a chunk at a time rather than encoding a second copy of it.
+    '''
+    def _signature(self, hash_name='sha1'):
+        return _hash_text( self.editm.full_text(), hash_name )
     '''
-    def _signature(self):
-        cuisineart = QCryptographicHash(QCryptographicHash.Algorithm.Sha1)
-        cuisineart.reset()
-        text = self.editm.full_text()
-        cuisineart.addData( text.encode() )
-        return bytes(cuisineart.result())
+    The algorithm to hash with when saving: the faster one for a container,
+    else the one the metadata was read with.
+    '''
+    def _hash_name(self):
+        return FAST_HASH if self.metamgr.compact else self.hash_name
     '''
     Compare what should be a byte-string to the hash of the book text that we
-    have already loaded.
+    have already loaded, using the algorithm named with it, if any.
     '''
     def _read_hash(self, sentinel, value, version) :
-        if self._signature() != value :
+        if isinstance(value, list) and len(value) == 2 \
+        and value[0] in hashlib.algorithms_guaranteed :
+            (self.hash_name, value) = value
+        signature = self._signature(self.hash_name)
+        if signature == value :
+            self.text_hash = ( self.hash_name, signature )
+        else :
+            self.text_hash = None
             self.logger.error('Doc hash in metadata does not match book contents')
             utilities.warning_msg(
                 text= _TR(
@@ -505,12 +758,13 @@ The first bad character is at ''',
                 parent= self.mainwindow
             )
     '''
-    Calculate an SHA-1 hash over the current document and write it to the
+    Calculate a hash over the current document and write it to the
     metadata. The old SHA1 hash is perfectly adequate for this, security is
-    not the issue.
+    not the issue, but BLAKE2b is quicker.
     '''
     def _save_hash(self, section) :
-        return self._signature()
+        hash_name = self._hash_name()
+        return _hash_value( hash_name, self._signature(hash_name) )
     '''
     Process {"BOOKINFO": { "Title":"Whatever", etc... } } The facts about the
     book are stored as a dict with user-defined keys and values, see
@@ -657,6 +911,7 @@ Each line must have a key such as Title, a colon, then a value.'''),
     '''
     def metadata_modified(self, state, flag):
         previous = self.md_modified
+        self.md_revision += 1
         self.md_modified |= (state * flag)
         self.md_modified &= 255 - (flag * (not state))
         if previous != self.md_modified:
@@ -720,6 +975,9 @@ Each line must have a key such as Title, a colon, then a value.'''),
     ''' give access to the page data model '''
     def get_page_model(self):
         return self.pagem
+    ''' give access to the Images panel, for the Pages panel '''
+    def get_image_view(self):
+        return self.imagev
     ''' give access to the spellcheck object '''
     def get_speller(self):
         return self._speller
@@ -732,6 +990,9 @@ Each line must have a key such as Title, a colon, then a value.'''),
     ''' give access to the footnote data model '''
     def get_fnot_model(self):
         return self.fnotm
+    ''' give access to the markup check, for the edit view and Markup panel '''
+    def get_lint_model(self):
+        return self.lintm
     ''' give access to the words panel (mostly for test) '''
     def get_word_panel(self):
         return self.panel_dict['Words']
@@ -750,6 +1011,9 @@ Each line must have a key such as Title, a colon, then a value.'''),
     ''' give access to the Footnotes panel mostly for test '''
     def get_fnot_panel(self):
         return self.panel_dict['Fnote']
+    ''' give access to the Markup panel mostly for test '''
+    def get_lint_panel(self):
+        return self.panel_dict['Markup']
     ''' give access to the book_facts, for translators '''
     def get_book_facts(self):
         return self.book_facts
@@ -50,6 +50,8 @@ ENCODING_UTF8 = QStringConverter.Encoding.Utf8
 ENCODING_LATIN = QStringConverter.Encoding.Latin1
 # File suffix to tack on to a book filename to name our metadata file
 METAFILE_SUFFIX = 'ppqt'
+# File suffix to tack on to a book filename to name its edit journal
+JOURNAL_SUFFIX = 'journal'
 # constant value for the line-delimiter used by QPlainTextEdit
 UNICODE_LINE_DELIM = '\u2029'
 # constant for the en-space used instead of spaces when
@@ -78,6 +80,7 @@ MD_FR = 'FIND_RB'
 MD_FU = 'FIND_UB'
 MD_FN = 'FOOTNOTES'
 MD_GW = 'GOODWORDS'
+MD_IA = 'IMAGEANALYSIS'
 MD_IZ = 'IMAGEZOOM'
 MD_IX = 'IMAGELINKING'
 MD_MD = 'MAINDICT'
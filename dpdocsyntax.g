@@ -38,20 +38,20 @@ parser DPDOC:
     rule CENTER:    COPEN ( LINE | EMPTY )* CCLOSE EMPTY?
     rule TABLE:     TOPEN ( LINE | EMPTY )* TCLOSE EMPTY?
     rule POEM:      POPEN ( LINE | EMPTY )* PCLOSE EMPTY?
-    rule PARA:      LINE {{ open_para() }}
-                        LINE* ( EMPTY | END )  {{ close_para() }}
+    rule PARA:      LINE {{ self.doc_parse.open_para() }}
+                        LINE* ( EMPTY | END )  {{ self.doc_parse.close_para() }}
 
-    rule HEAD:      EMPTY {{ open_head() }}
-                   ( PARA {{ close_head(3) }}
-                   | EMPTY EMPTY PARA+ EMPTY {{ close_head(2) }}
+    rule HEAD:      EMPTY {{ self.doc_parse.open_head() }}
+                   ( PARA {{ self.doc_parse.close_head(3) }}
+                   | EMPTY EMPTY PARA+ EMPTY {{ self.doc_parse.close_head(2) }}
                    )
 
     rule ULIST:     UOPEN ( PARA | EMPTY )* UCLOSE EMPTY?
     rule QUOTE:     QOPEN ( PARA | POEM | RIGHT | CENTER | ULIST | QUOTE | EMPTY )+ QCLOSE EMPTY?
-    rule FIGURE:    IOPEN ( PARA | POEM | TABLE | QUOTE | ULIST | EMPTY )+ BCLOSE {{ close_note() }} EMPTY?
-    rule SNOTE:     SOPEN PARA+ BCLOSE {{ close_note() }} EMPTY?
-    rule FNOTE:     FOPEN ( PARA | POEM | TABLE | QUOTE | ULIST  )+ BCLOSE {{ close_note() }} EMPTY?
-    rule FZONE:     NOPEN ( HEAD {{ check_head() }} | FNOTE )* NCLOSE EMPTY?
+    rule FIGURE:    IOPEN ( PARA | POEM | TABLE | QUOTE | ULIST | EMPTY )+ BCLOSE {{ self.doc_parse.close_note() }} EMPTY?
+    rule SNOTE:     SOPEN PARA+ BCLOSE {{ self.doc_parse.close_note() }} EMPTY?
+    rule FNOTE:     FOPEN ( PARA | POEM | TABLE | QUOTE | ULIST  )+ BCLOSE {{ self.doc_parse.close_note() }} EMPTY?
+    rule FZONE:     NOPEN ( HEAD {{ self.doc_parse.check_head() }} | FNOTE )* NCLOSE EMPTY?
     rule NOFILLS:   ( NOFILL | RIGHT | CENTER | TABLE | POEM )
 
     rule goal:  EMPTY*
@@ -110,7 +110,7 @@ class DPDOC(runtime.Parser):
     def PARA(self, _parent=None):
         _context = self.Context(_parent, self._scanner, 'PARA', [])
         LINE = self._scan('LINE', context=_context)
-        open_para()
+        self.doc_parse.open_para()
         while self._peek('EMPTY', 'END', 'LINE', context=_context) == 'LINE':
             LINE = self._scan('LINE', context=_context)
         _token = self._peek('EMPTY', 'END', context=_context)
@@ -118,16 +118,16 @@ class DPDOC(runtime.Parser):
             EMPTY = self._scan('EMPTY', context=_context)
         else: # == 'END'
             END = self._scan('END', context=_context)
-        close_para()
+        self.doc_parse.close_para()
 
     def HEAD(self, _parent=None):
         _context = self.Context(_parent, self._scanner, 'HEAD', [])
         EMPTY = self._scan('EMPTY', context=_context)
-        open_head()
+        self.doc_parse.open_head()
         _token = self._peek('LINE', 'EMPTY', context=_context)
         if _token == 'LINE':
             PARA = self.PARA(_context)
-            close_head(3)
+            self.doc_parse.close_head(3)
         else: # == 'EMPTY'
             EMPTY = self._scan('EMPTY', context=_context)
             EMPTY = self._scan('EMPTY', context=_context)
@@ -135,7 +135,7 @@ class DPDOC(runtime.Parser):
                 PARA = self.PARA(_context)
                 if self._peek('LINE', 'EMPTY', 'POPEN', 'ROPEN', 'COPEN', 'UOPEN', 'TOPEN', 'QOPEN', 'BCLOSE', 'XOPEN', 'IOPEN', 'SOPEN', 'FOPEN', 'NOPEN', 'TBSYMB', 'UCLOSE', 'QCLOSE', 'END', 'NCLOSE', context=_context) != 'LINE': break
             EMPTY = self._scan('EMPTY', context=_context)
-            close_head(2)
+            self.doc_parse.close_head(2)
 
     def ULIST(self, _parent=None):
         _context = self.Context(_parent, self._scanner, 'ULIST', [])
@@ -193,7 +193,7 @@ class DPDOC(runtime.Parser):
                 EMPTY = self._scan('EMPTY', context=_context)
             if self._peek('LINE', 'POPEN', 'TOPEN', 'QOPEN', 'UOPEN', 'EMPTY', 'BCLOSE', 'ROPEN', 'COPEN', 'XOPEN', 'IOPEN', 'SOPEN', 'FOPEN', 'NOPEN', 'TBSYMB', 'UCLOSE', 'QCLOSE', 'END', 'NCLOSE', context=_context) not in ['LINE', 'POPEN', 'TOPEN', 'QOPEN', 'UOPEN', 'EMPTY']: break
         BCLOSE = self._scan('BCLOSE', context=_context)
-        close_note()
+        self.doc_parse.close_note()
         if self._peek('EMPTY', 'XOPEN', 'ROPEN', 'COPEN', 'TOPEN', 'POPEN', 'LINE', 'QOPEN', 'IOPEN', 'SOPEN', 'FOPEN', 'NOPEN', 'UOPEN', 'TBSYMB', 'BCLOSE', 'END', 'QCLOSE', 'UCLOSE', 'NCLOSE', context=_context) == 'EMPTY':
             EMPTY = self._scan('EMPTY', context=_context)
 
@@ -204,7 +204,7 @@ class DPDOC(runtime.Parser):
             PARA = self.PARA(_context)
             if self._peek('LINE', 'BCLOSE', 'EMPTY', 'POPEN', 'ROPEN', 'COPEN', 'UOPEN', 'TOPEN', 'QOPEN', 'XOPEN', 'IOPEN', 'SOPEN', 'FOPEN', 'NOPEN', 'TBSYMB', 'UCLOSE', 'QCLOSE', 'END', 'NCLOSE', context=_context) != 'LINE': break
         BCLOSE = self._scan('BCLOSE', context=_context)
-        close_note()
+        self.doc_parse.close_note()
         if self._peek('EMPTY', 'XOPEN', 'ROPEN', 'COPEN', 'TOPEN', 'POPEN', 'LINE', 'QOPEN', 'IOPEN', 'SOPEN', 'FOPEN', 'NOPEN', 'UOPEN', 'TBSYMB', 'BCLOSE', 'END', 'QCLOSE', 'UCLOSE', 'NCLOSE', context=_context) == 'EMPTY':
             EMPTY = self._scan('EMPTY', context=_context)
 
@@ -225,7 +225,7 @@ class DPDOC(runtime.Parser):
                 ULIST = self.ULIST(_context)
             if self._peek('LINE', 'POPEN', 'TOPEN', 'QOPEN', 'UOPEN', 'BCLOSE', 'EMPTY', 'ROPEN', 'COPEN', 'XOPEN', 'IOPEN', 'SOPEN', 'FOPEN', 'NOPEN', 'TBSYMB', 'UCLOSE', 'QCLOSE', 'END', 'NCLOSE', context=_context) not in ['LINE', 'POPEN', 'TOPEN', 'QOPEN', 'UOPEN']: break
         BCLOSE = self._scan('BCLOSE', context=_context)
-        close_note()
+        self.doc_parse.close_note()
         if self._peek('EMPTY', 'FOPEN', 'XOPEN', 'ROPEN', 'COPEN', 'TOPEN', 'POPEN', 'LINE', 'QOPEN', 'IOPEN', 'SOPEN', 'NOPEN', 'UOPEN', 'TBSYMB', 'NCLOSE', 'BCLOSE', 'END', 'QCLOSE', 'UCLOSE', context=_context) == 'EMPTY':
             EMPTY = self._scan('EMPTY', context=_context)
 
@@ -236,7 +236,7 @@ class DPDOC(runtime.Parser):
             _token = self._peek('EMPTY', 'FOPEN', context=_context)
             if _token == 'EMPTY':
                 HEAD = self.HEAD(_context)
-                check_head()
+                self.doc_parse.check_head()
             else: # == 'FOPEN'
                 FNOTE = self.FNOTE(_context)
         NCLOSE = self._scan('NCLOSE', context=_context)
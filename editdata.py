@@ -54,12 +54,59 @@ Externally-available functions, some from QTextDocument, some unique:
     cursor_lines(c)      iterator returning the text of each line spanned
                          by the selection of a QTextCursor c.
 
-    line_start(a)        character offset in the document to the start of line
-                         number a, used by the translator.
+    line_starts(a)       character offset in the document to the start of line
+                         number a, or -1 if there is no such line.
+
+    line_start_table()   a list of the offsets of the starts of all the lines,
+                         line number a at index a-1, used by the translator.
+                         It is made once for each version of the text.
+
+    register_tracker(t)  add t to the objects whose document positions are
+                         remapped after apply_edits(). t must have methods
+                         get_positions(), returning a list of positions,
+                         and set_positions(list) to store new ones.
+
+    apply_edits(edits)   apply a list of (start, end, text) edits as one
+                         undoable step, and remap all tracked positions.
+                         Returns an EditMap, or None if the edits overlap.
+
+    make_tracker()       return a new PositionTracker for this document,
+                         registered both to follow the user's edits and
+                         to be remapped by apply_edits().
+
+The EditMap class defined here translates a position in the document as it
+was before apply_edits() into the matching position after it:
+
+    position(p)          the new position of old position p.
+
+    new_span(k)          the (start, end) of the text inserted by the k'th
+                         edit in the list given to apply_edits.
+
+The PositionTracker class defined here keeps a list of document positions
+up to date as the document is edited, in place of a QTextCursor for each
+one. Positions are identified by "slot", their index in the list given to
+set_positions():
+
+    set_positions(list)  replace all tracked positions with the list.
+
+    get_positions()      the list of current positions, in slot order.
+
+    position(s)          the current position in slot s.
+
+    set_position(s, p)   move slot s to position p.
+
+    cursor(s)            a TrackedCursor whose anchor is slot s and whose
+                         position is slot s+1.
+
+A TrackedCursor offers the read-only parts of the QTextCursor API that
+the page and footnote models use: anchor(), position(), selectionStart(),
+selectionEnd(), hasSelection() and selectedText(), plus make_cursor() to
+get a real QTextCursor with the same selection.
 
 '''
 from PyQt6.QtGui import (
     QTextBlock,
+    QTextCursor,
     QTextDocument
     )
 from PyQt6.QtWidgets import (
@@ -67,6 +114,9 @@ from PyQt6.QtWidgets import (
     )
 
 import fonts
+import bisect
+import logging
+editdata_logger = logging.getLogger(name='editdata')
 
 class Document(QTextDocument):
     # TODO study qtdocument and do many overrides - resource? redos?
@@ -74,7 +124,20 @@ class Document(QTextDocument):
         super().__init__(parent = my_book)
         # Initialize slot for cached copy of document text, see full_text()
         self._text = None
+        # Likewise the offsets of the lines, see line_start_table()
+        self._line_starts = None
+        # Count of changes, so a save can tell if any came after it began
+        self.edit_count = 0
         self.contentsChanged.connect(self._text_modified)
+        # Objects whose positions are remapped by apply_edits()
+        self._trackers = []
+        # PositionTrackers that follow every change, see make_tracker()
+        self._position_trackers = []
+        # To tell an undo or redo from a new edit, see _track_change()
+        self._undo_steps = 0
+        self._command_added = False
+        self.undoCommandAdded.connect(self._note_command)
+        self.contentsChange.connect(self._track_change)
 
         # TODO do I want to customize the layout?
         self.setDocumentLayout(QPlainTextDocumentLayout(self))
@@ -99,6 +162,8 @@ class Document(QTextDocument):
 
     def _text_modified(self):
         self._text = None
+        self._line_starts = None
+        self.edit_count += 1
 
     '''
     The following functions return iterators over sequences of QTextBlocks,
@@ -222,3 +287,353 @@ class Document(QTextDocument):
         if tb.isValid() :
             return tb.position()
         return -1
+
+    '''
+    6. Return the start positions of all lines as a list, in which the
+    start of line number a is at index a-1. Asking the document for one
+    line at a time is a trip into Qt for each; instead we find the line
+    ends in the cached text. The list is kept until the next edit, like the
+    text, and must not be modified.
+    '''
+    def line_start_table(self):
+        if self._line_starts is None :
+            text = self.full_text()
+            starts = [0]
+            end = text.find( '\n' )
+            while end >= 0 :
+                starts.append( end + 1 )
+                end = text.find( '\n', end + 1 )
+            self._line_starts = starts
+        return self._line_starts
+
+    '''
+    Bulk editing.
+
+    Several operations (Renumber and Move in the Footnote panel, Insert in
+    the Page panel) make many small changes all through the document. Done
+    one at a time, each position computed for one change has to allow for
+    the changes before it, and the page and footnote positions that fall at
+    the point of a change can end up on the wrong side of it.
+
+    apply_edits() takes the whole list of changes at once, as tuples (start,
+    end, text) meaning "replace the characters from start to end with text",
+    with every position referring to the document as it is now. Edits at the
+    same position are applied in the order given. Edits may not overlap; if
+    any do, or any position is outside the document, we log it and return
+    None without changing anything.
+
+    The edits are applied from the bottom of the document up, so that no
+    edit moves the text of another, all under one edit block, so the whole
+    is a single undo step. Then every registered tracker gets its positions
+    back translated by an EditMap: positions not at an edit move by the
+    net change in length above them, a position at the start of an edit
+    stays ahead of the new text, a position at the end of an edit follows
+    the new text, and one strictly inside an edit goes to the start of the
+    new text.
+    '''
+    def register_tracker(self, tracker):
+        self._trackers.append(tracker)
+
+    def apply_edits(self, edits):
+        order = sorted( range(len(edits)), key=lambda k : edits[k][0] )
+        limit = self.characterCount() - 1
+        prior_end = 0
+        for k in order :
+            (start, end, text) = edits[k]
+            if start < prior_end or end < start or end > limit :
+                editdata_logger.error(
+                    'Invalid or overlapping edit {0} ignored with all others'.format((start, end)) )
+                return None
+            prior_end = end
+        edit_map = EditMap(edits, order)
+        saved = [ tracker.get_positions() for tracker in self._trackers ]
+        work_tc = QTextCursor(self)
+        work_tc.beginEditBlock()
+        for k in reversed(order) :
+            (start, end, text) = edits[k]
+            work_tc.setPosition(start)
+            work_tc.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+            work_tc.insertText(text)
+        work_tc.endEditBlock()
+        for (tracker, positions) in zip(self._trackers, saved) :
+            tracker.set_positions( [ edit_map.position(p) for p in positions ] )
+        return edit_map
+
+    '''
+    Make a PositionTracker and register it both for apply_edits() and to
+    hear about every change. Our own slot for contentsChange was connected
+    in __init__, before any other part of the program connects to it, so
+    trackers are up to date before anyone else hears of a change.
+    '''
+    def make_tracker(self):
+        tracker = PositionTracker(self)
+        self._trackers.append(tracker)
+        self._position_trackers.append(tracker)
+        return tracker
+
+    '''
+    Tell the trackers whether each change is an undo (-1), a redo (+1) or a
+    new edit (0). Qt emits undoCommandAdded just before the contentsChange
+    of a new edit, though not of one merged into the last command, as typed
+    characters are, and never for an undo or redo. Those instead make
+    availableUndoSteps() fall or rise.
+    '''
+    def _note_command(self):
+        self._command_added = True
+
+    def _track_change(self, pos, removed, added):
+        steps = self.availableUndoSteps()
+        undo_step = 0
+        if not self._command_added :
+            undo_step = (steps > self._undo_steps) - (steps < self._undo_steps)
+        self._undo_steps = steps
+        self._command_added = False
+        for tracker in self._position_trackers :
+            tracker.document_change(pos, removed, added, undo_step)
+
+'''
+An EditMap is made by Document.apply_edits() from its list of edits and
+the order that sorts them by start position. We keep, in sorted order, the
+start and end of each edit and its start in the new document, which is
+its old start plus the net change in length of all edits ahead of it.
+'''
+class EditMap(object):
+    def __init__(self, edits, order):
+        self.starts = []
+        self.ends = []
+        self.new_starts = []
+        self.shifts = [0] # shifts[j] is the net change of edits[0:j]
+        self.new_spans = [None] * len(edits)
+        shift = 0
+        for k in order :
+            (start, end, text) = edits[k]
+            self.starts.append(start)
+            self.ends.append(end)
+            self.new_starts.append(start + shift)
+            self.new_spans[k] = (start + shift, start + shift + len(text))
+            shift += len(text) - (end - start)
+            self.shifts.append(shift)
+
+    '''
+    Translate an old position. The edits before index j start ahead of pos,
+    and only the last of those can contain it.
+    '''
+    def position(self, pos):
+        j = bisect.bisect_left(self.starts, pos)
+        if j and self.ends[j-1] > pos :
+            return self.new_starts[j-1]
+        return pos + self.shifts[j]
+
+    def new_span(self, k):
+        return self.new_spans[k]
+
+'''
+A PositionTracker keeps a list of document positions, for example the start
+of every scan page, correct as the document is edited. A QTextCursor does
+this too, but Qt adjusts every live cursor on every keystroke, and a large
+book can have several thousand page and footnote cursors.
+
+The positions are kept as a sorted list, _values, with _index[slot] the
+place in _values of each slot. Edits never change the order of positions
+(they can only make some of them equal), so the permutation made when the
+positions are set stays valid.
+
+The effect of a change (pos, removed, added) is the same as Qt's: a
+position before pos is unchanged; one in pos..pos+removed-1 "collapses" to
+the end of the new text, pos+added; one at or after pos+removed moves by
+added-removed. Rather than add that to every later value, we keep one
+pending shift, _delta, which applies to _values[_from:]. When the user
+types in one place, each keystroke only updates _delta. When the user moves
+to another place we fold the pending shift into just the values between
+the old _from and the new one.
+
+QTBUG-32689: when a change collapses positions and the user undoes it, Qt
+does not restore the collapsed cursors. We do: every change that collapses
+positions is recorded with their old values. When the document undoes a
+change (the Document tells us, see _track_change()) and that change is the
+latest record, at the same place with the lengths reversed, the values are
+restored; the undo is itself recorded in case the user redoes it. This also lets apply_edits(), whose changes Qt
+reports as one change spanning all of them, be undone and redone without
+losing tracked positions inside the span. A record keeps the old values
+relative to the place of its change, and every later change before that
+place moves it as it moves the text, so that typing where the text used to
+be after an edit elsewhere is not taken for an undo; a change across the
+place drops the record.
+'''
+class PositionTracker(object):
+    # most collapse records kept for undo and for redo
+    RECORD_LIMIT = 100
+
+    def __init__(self, document):
+        self.document = document
+        self._values = []
+        self._index = []
+        self._from = 0
+        self._delta = 0
+        self._undo_records = []
+        self._redo_records = []
+
+    def __len__(self):
+        return len(self._index)
+
+    ''' The value at place i in the sorted list, allowing for the pending shift '''
+    def _value(self, i):
+        if i >= self._from :
+            return self._values[i] + self._delta
+        return self._values[i]
+
+    def _store(self, i, value):
+        if i >= self._from :
+            value -= self._delta
+        self._values[i] = value
+
+    ''' The first place in the sorted list whose value is >= pos '''
+    def _bisect(self, pos):
+        if self._from and self._values[self._from-1] >= pos :
+            return bisect.bisect_left(self._values, pos, 0, self._from)
+        return bisect.bisect_left(self._values, pos - self._delta, self._from)
+
+    ''' Add delta to every value from place lo on, moving the pending shift to lo '''
+    def _shift(self, lo, delta):
+        values = self._values
+        if lo > self._from and self._delta :
+            d = self._delta
+            values[self._from:lo] = [v + d for v in values[self._from:lo]]
+        elif lo < self._from :
+            d = self._delta
+            values[lo:self._from] = [v - d for v in values[lo:self._from]]
+        self._from = lo
+        self._delta += delta
+
+    '''
+    Follow a change, with undo_step -1 if it is an undo, +1 if a redo, and
+    0 if a new edit, which makes any redo records useless.
+    '''
+    def document_change(self, pos, removed, added, undo_step=0):
+        if not self._values : return
+        lo = self._bisect(pos)
+        hi = self._bisect(pos + removed) if removed else lo
+        old_values = [ (i, self._value(i) - pos) for i in range(lo, hi) ]
+        if undo_step < 0 :
+            (source, records) = (self._undo_records, self._redo_records)
+        elif undo_step > 0 :
+            (source, records) = (self._redo_records, self._undo_records)
+        else :
+            self._redo_records = []
+            (source, records) = (None, self._undo_records)
+        restore = None
+        if source and source[-1][0] == pos \
+        and source[-1][1] == added and source[-1][2] == removed :
+            restore = source.pop()
+        self._move_records(self._undo_records, pos, removed, added)
+        self._move_records(self._redo_records, pos, removed, added)
+        self._shift(hi, added - removed)
+        for i in range(lo, hi) :
+            self._store(i, pos + added)
+        if restore is not None :
+            for (i, offset) in restore[3] :
+                self._store(i, pos + offset)
+        if old_values :
+            records.append( (pos, removed, added, old_values) )
+            if len(records) > self.RECORD_LIMIT :
+                del records[0]
+
+    '''
+    Keep the records in step with a change, in place. A record is of the
+    text now at pos..pos+added; a change wholly before that moves it, one
+    wholly after leaves it be, and one that overlaps it means it can never
+    be undone as recorded, so it is dropped.
+    '''
+    def _move_records(self, records, pos, removed, added):
+        kept = []
+        for record in records :
+            (rpos, rremoved, radded, offsets) = record
+            if pos + removed <= rpos :
+                if added != removed :
+                    record = (rpos + added - removed, rremoved, radded, offsets)
+            elif pos < rpos + radded or (radded == 0 and pos == rpos) :
+                continue
+            kept.append(record)
+        records[:] = kept
+
+    '''
+    Set all the positions. If there are as many as before, in the same
+    order, just store them; this is the case when apply_edits() remaps
+    us, and our records of collapsed positions are still good. Otherwise
+    sort them afresh and forget the records.
+    '''
+    def set_positions(self, positions):
+        self._from = 0
+        self._delta = 0
+        if len(positions) == len(self._index) :
+            values = [0] * len(positions)
+            for (slot, i) in enumerate(self._index) :
+                values[i] = positions[slot]
+            if all( values[i] <= values[i+1] for i in range(len(values)-1) ) :
+                self._values = values
+                return
+        order = sorted( range(len(positions)), key=positions.__getitem__ )
+        self._values = [ positions[slot] for slot in order ]
+        self._index = [0] * len(positions)
+        for (i, slot) in enumerate(order) :
+            self._index[slot] = i
+        self._undo_records = []
+        self._redo_records = []
+
+    def get_positions(self):
+        return [ self._value(i) for i in self._index ]
+
+    def position(self, slot):
+        return self._value(self._index[slot])
+
+    '''
+    Move one position. If it stays between its neighbors in the sorted
+    list it is stored in place, else all the positions are sorted again.
+    '''
+    def set_position(self, slot, pos):
+        i = self._index[slot]
+        if (i == 0 or self._value(i-1) <= pos) \
+        and (i+1 == len(self._values) or pos <= self._value(i+1)) :
+            self._store(i, pos)
+        else :
+            positions = self.get_positions()
+            positions[slot] = pos
+            self.set_positions(positions)
+
+    def cursor(self, slot):
+        return TrackedCursor(self, slot)
+
+'''
+A TrackedCursor stands in for a QTextCursor selecting the text between two
+tracked positions: the anchor in slot s and the position in slot s+1.
+'''
+class TrackedCursor(object):
+    __slots__ = ('tracker', 'slot')
+
+    def __init__(self, tracker, slot):
+        self.tracker = tracker
+        self.slot = slot
+
+    def anchor(self):
+        return self.tracker.position(self.slot)
+
+    def position(self):
+        return self.tracker.position(self.slot+1)
+
+    def selectionStart(self):
+        return min( self.anchor(), self.position() )
+
+    def selectionEnd(self):
+        return max( self.anchor(), self.position() )
+
+    def hasSelection(self):
+        return self.anchor() != self.position()
+
+    def make_cursor(self):
+        tc = QTextCursor( self.tracker.document )
+        tc.setPosition( self.anchor() )
+        tc.setPosition( self.position(), QTextCursor.MoveMode.KeepAnchor )
+        return tc
+
+    def selectedText(self):
+        return self.make_cursor().selectedText()
@@ -32,6 +32,10 @@ Implements all keyboard actions (ctl-F, etc) in the editor.
 Implements the syntax highlighter that colors scannos and spelling errors.
 Calls on a WordData object to identify scannos and spelling errors.
 
+Shows a mark in a narrow margin at the left of each line that has an error
+of markup structure, as found by the book's lintdata.MarkupLint, with the
+error message as its tooltip.
+
 Provides a basic Edit menu with Undo/Redo, Cut/Copy/Paste,
 and Find-action same as our keystrokes: Find Selected/Next/Prior
 
@@ -78,7 +82,7 @@ Offers these additional methods:
 '''
 
 import regex
-from PyQt6.QtCore import Qt, QObject, QCoreApplication, QSize
+from PyQt6.QtCore import Qt, QObject, QCoreApplication, QEvent, QPoint, QRect, QSize
 _TR = QCoreApplication.translate
 
 from PyQt6.QtCore import pyqtSignal
@@ -92,13 +96,16 @@ from PyQt6.QtWidgets import (
     QSizePolicy,
     QSpacerItem,
     QTextEdit,
+    QToolTip,
     QVBoxLayout,
     QWidget
     )
 from PyQt6.QtGui import (
     QAction,
     QBrush,
+    QColor,
     QKeySequence,
+    QPainter,
     QSyntaxHighlighter,
     QTextBlockFormat,
     QTextCursor,
@@ -182,9 +189,37 @@ class HighLighter(QSyntaxHighlighter):
                 if self.speller(t) :
                     self.setFormat(p,l,spelling_fmt)
 '''
+Define the margin that shows the lines with markup errors. It is a child
+of the editor, which keeps it beside its viewport and paints it.
+'''
+LINT_MARGIN = 8 # width in pixels
+LINT_COLOR = QColor( 'Red' )
+
+class LintMargin( QWidget ):
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+    def sizeHint(self):
+        return QSize( LINT_MARGIN, 0 )
+    def paintEvent(self, event):
+        self.editor.paint_margin(event)
+    def event(self, event):
+        if event.type() == QEvent.Type.ToolTip :
+            message = self.editor.margin_message( event.pos().y() )
+            if message is None :
+                QToolTip.hideText()
+                event.ignore()
+            else :
+                QToolTip.showText( event.globalPos(), message, self )
+            return True
+        return super().event(event)
+
+'''
 Define a custom QPlainTextEdit. This differs from the stock variety in that
 it has a keyEvent override to trap and handle numerous special keystrokes,
-and in using the mainwindow to populate a custom edit menu.
+and in using the mainwindow to populate a custom edit menu. It also keeps
+the lint margin: it makes room for it with setViewportMargins, and repaints
+it as the text scrolls and as the errors change.
 '''
 class PTEditor( QPlainTextEdit ):
 
@@ -193,6 +228,11 @@ class PTEditor( QPlainTextEdit ):
     def __init__(self, parent, my_book):
         super().__init__(parent)
         self.my_book = my_book # Need access to book
+        self.lint = my_book.get_lint_model()
+        self.margin = LintMargin(self)
+        self.setViewportMargins( LINT_MARGIN, 0, 0, 0 )
+        self.updateRequest.connect( self._update_margin )
+        self.lint.changed.connect( self.margin.update )
         self.ed_action_list = [
             (C.ED_MENU_UNDO, self.undo, QKeySequence.StandardKey.Undo),
             (C.ED_MENU_REDO, self.redo, QKeySequence.StandardKey.Redo),
@@ -214,6 +254,42 @@ class PTEditor( QPlainTextEdit ):
     def emit_key(self, kkey) :
         self.editFindKey.emit(kkey)
 
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        cr = self.contentsRect()
+        self.margin.setGeometry( QRect( cr.left(), cr.top(), LINT_MARGIN, cr.height() ) )
+
+    def _update_margin(self, rect, dy):
+        if dy :
+            self.margin.scroll( 0, dy )
+        else :
+            self.margin.update( 0, rect.y(), LINT_MARGIN, rect.height() )
+
+    '''
+    Paint a mark beside each visible line that has an error. The margin
+    and the viewport have the same top, so the geometry of the blocks is
+    the same for both.
+    '''
+    def paint_margin(self, event):
+        painter = QPainter(self.margin)
+        painter.fillRect( event.rect(), self.margin.palette().window() )
+        if not self.lint.errors :
+            return
+        block = self.firstVisibleBlock()
+        top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
+        bottom = event.rect().bottom()
+        while block.isValid() and top <= bottom :
+            height = self.blockBoundingRect(block).height()
+            if block.isVisible() and self.lint.line_message( block.blockNumber() ) is not None :
+                painter.fillRect( 2, int(top) + 2, LINT_MARGIN - 4, int(height) - 4, LINT_COLOR )
+            top += height
+            block = block.next()
+
+    ''' The message for the line at y in the margin, or None '''
+    def margin_message(self, y):
+        line = self.cursorForPosition( QPoint( 0, y ) ).blockNumber()
+        return self.lint.line_message( line )
+
     def focusInEvent(self, event) :
         mainwindow.set_up_edit_menu(self.ed_action_list)
         super().focusInEvent(event)
@@ -242,12 +318,13 @@ class PTEditor( QPlainTextEdit ):
                 mark_list = self.my_book.bookmarks # quick reference to the list
                 if kkey in C.KEYS_MARK_SET : # alt-1..9, set bookmark
                     # Set a bookmark to the current edit selection
-                    mark_list[mark_number] = QTextCursor(self.textCursor())
+                    tc = self.textCursor()
+                    self.my_book.set_bookmark(mark_number, tc.position(), tc.anchor())
                     self.my_book.metadata_modified(True, C.MD_MOD_FLAG)
                 elif kkey in C.KEYS_MARK : # ctl-1..9, go to mark
                     # Move to the save position including a saved selection
                     if mark_list[mark_number] is not None :
-                        self.parent().center_this(mark_list[mark_number])
+                        self.parent().center_this(mark_list[mark_number].make_cursor())
                 else : # shft-ctl-1..9, go to mark, extending selection
                     if mark_list[mark_number] is not None:
                         pos = mark_list[mark_number].position()
@@ -497,13 +574,16 @@ class EditView( QWidget ):
     syntax highlighter, which clears all highlights, then restarting it.
     
     We stop the highlighter by assigning it to an empty document, and we
-    start it by assigning it to our actual document.
+    start it by assigning it to our actual document. Before spelling
+    highlights start, the word census must be loaded, see worddata.
     '''
     
     def _clear_highlights(self):
         self.highlighter.setDocument(QTextDocument())
 
     def _start_highlights(self):
+        if self.spelling_check :
+            self.word_model.load_census()
         self.highlighter.setDocument(self.document)
     '''
     These are called by the triggered signal of the menu items. The first
@@ -57,6 +57,12 @@ sw_in_range      While False, the find range is the whole document.
                  range for find/replace. It is given a background color
                  so as to be visible.
 
+sw_all_books     When checked, the search buttons list every match in
+                 every open book, and a global replace (ALL!) is
+                 applied to every open book. In Range does not apply;
+                 each book is searched in full. See "searching all
+                 open books" below.
+
 (Note that version 1 had a Greedy checkbox; this is gone as the Python regex
 support does not have a global greedyness flag. Use the '?' qualifier to
 perform not-greedy searches: *?, +?, {m,n}?.)
@@ -133,6 +139,16 @@ range and a list is made of all matches. The user is shown a warning dialog:
 
 When OK is clicked, the replacements are done.
 
+When All Books is checked, any of the four search buttons makes a list of
+the matches in every book open in the main window. The list is shown in a
+tree below the replace fields, with one top-level item per book and one
+child item per match giving the line number and line text. Clicking a
+match focusses its book and selects the matched text. A global replace
+with All Books checked asks for one OK for the total count, then replaces
+in each book under a separate undo macro, so each book can be undone on
+its own. The documents are searched as snapshots on a pool of worker
+threads; a book that is edited while the OK dialog is up is skipped.
+
 The bottom of the panel is occupied by 24 buttons in a grid array in a frame.
 These are the user macro buttons, which can be saved or loaded to a text
 file. They are defined as UserButton class.
@@ -167,6 +183,8 @@ from PyQt6.QtWidgets import(
     QPushButton,
     QSizePolicy,
     QToolButton,
+    QTreeWidget,
+    QTreeWidgetItem,
     QWidget
 )
 from PyQt6.QtGui import(
@@ -186,6 +204,7 @@ import fonts
 import utilities
 import constants as C
 import regex
+import concurrent.futures
 import logging
 find_logger = logging.getLogger(name='Find panel')
 
@@ -209,6 +228,14 @@ def RE_Compile(string, case_switch, extra_flag = 0):
     flag |= 0 if case_switch.isChecked() else regex.IGNORECASE
     return regex.compile( string, flag )
 
+'''
+Global function run on a worker thread to find every match to a compiled
+regex in a snapshot of one document. The concurrent argument tells regex
+that the string will not change, so it can release the GIL while matching.
+'''
+def _find_all(rex, text):
+    return [ m for m in rex.finditer(text, concurrent=True) ]
+
 '''
       RecallMenuButton class
       
@@ -643,6 +670,8 @@ class FindPanel(QWidget):
         self.editm = my_book.get_edit_model()
         # True while the current edit selection is the result of find
         self.selection_by_find = False
+        # The most recent All Books search result, see show_book_hits()
+        self.book_hits = []
         # Register to read and write metadata class MD_FP, for its
         # format see _meta_read below.
         self.book.get_meta_manager().register(
@@ -657,6 +686,7 @@ class FindPanel(QWidget):
                 self.sw_whole_word
                 self.sw_regex
                 self.sw_in_range
+                self.sw_all_books
                 self.sw_and_next
                 self.sw_and_prior
                 self.sw_do_all
@@ -684,6 +714,9 @@ class FindPanel(QWidget):
         self.sw_and_next.stateChanged.connect(self.andnext_change)
         self.sw_and_prior.stateChanged.connect(self.andprior_change)
         self.sw_in_range.stateChanged.connect(self.insel_change)
+        self.sw_all_books.stateChanged.connect(self.all_books_change)
+        ''' Clicking a match in the All Books list goes to it. '''
+        self.hit_tree.itemClicked.connect(self.hit_click)
         '''
         Connect the four do-search buttons to the common do_search method,
         passing a 2-bit code to distinguish each.
@@ -880,6 +913,10 @@ class FindPanel(QWidget):
     '''
     
     def start_search(self, flag):
+        if self.sw_all_books.isChecked() :
+            ''' Searching all books is a whole different thing. Go do it. '''
+            self.all_books_search()
+            return
         '''
         Begin with the position of the current selection, often the result
         of a previous match. Search goes forward or backward from there.
@@ -1116,27 +1153,14 @@ class FindPanel(QWidget):
     macro so it is a single undo.
     '''
     def do_global_replace(self, button):
-        r_pattern = self.replace_fields[button].text()
-        f_pattern = self.find_field.text()
-        # prepare the "blah with blarg" before we possibly mung the texts
-        info_with = f_pattern + _TR(
-            "replace <string> with <string>",
-            " with " ) + r_pattern
-        if self.sw_regex.isChecked() :
-            ''' supposedly a regex find, make sure it is a valid one '''
-            rex = self.find_field.regex
-            if rex is None : # bad regex syntax
-                utilities.beep()
-                return
-        else :
-            ''' Find string does not claim to be a regex pattern, make it one. '''
-            if f_pattern == '' : # empty pattern, not good for global find!
-                utilities.beep()
-                return
-            # escape any magic chars in the rep and search patterns
-            r_pattern = r_pattern.replace('\\','\\\\')
-            f_pattern = FindPanel.RE_MAGIC_CHARS.sub('\\\\\\1',f_pattern)
-            rex = regex.compile(f_pattern, (regex.M | 0 if self.sw_respect_case.isChecked else regex.I))
+        if self.sw_all_books.isChecked() :
+            ''' Replace in every open book, see all_books_replace() '''
+            self.all_books_replace(button)
+            return
+        (rex, r_pattern) = self._global_regex( self.replace_fields[button].text() )
+        if rex is None : # bad regex syntax or empty find string
+            utilities.beep()
+            return
         range_tc = self.editv.get_find_range()
         full_text = self.editm.full_text()
         # In one statement get a match for every hit in the range.
@@ -1157,15 +1181,207 @@ class FindPanel(QWidget):
         info_msg = self.find_field.text().__repr__() + info_with + self.replace_fields[button].text().__repr__()
         if not utilities.ok_cancel_msg(msg,info_msg,self) :
             return
-        ''' OK, do the deed. '''
-        find_tc = self.editv.get_cursor()
-        find_tc.beginEditBlock() # start single-undo macro
-        for j in reversed(range(count)):
-            m = mlist[j]
-            find_tc.setPosition(m.end())
-            find_tc.setPosition(m.start(),QTextCursor.MoveMode.KeepAnchor)
-            find_tc.insertText(m.expand(r_pattern))
-        find_tc.endEditBlock() # complete undo macro block
+        '''
+        OK, do the deed. The edit model makes all the replacements as one
+        undoable edit, and maps the tracked positions (page starts, notes,
+        bookmarks) through each replacement, where a single edit block
+        would be reported as one change spanning the first to last match.
+        '''
+        self.editm.apply_edits(
+            [ (m.start(), m.end(), m.expand(r_pattern)) for m in mlist ] )
+
+    '''
+    Prepare the find and replace patterns for a global operation, one that
+    uses regex.finditer() to collect every match: global replace in this
+    book, or search and replace in all open books.
+
+    If the Regex switch is on, use the find field's compiled regex, which is
+    None if its syntax is bad. Otherwise make the find string usable as a
+    regex by escaping all regex magic characters in it, and apply the Whole
+    Word and Respect Case switches. Ditto for the replace string, but we only
+    escape backslashes, because only "\#" and "\g<#>" are magic in regex
+    replace strings.
+
+    Returns a tuple (rex, r_pattern) where rex is None when the find
+    pattern is not usable.
+    '''
+    def _global_regex(self, r_pattern=''):
+        if self.sw_regex.isChecked() :
+            ''' supposedly a regex find, return it valid or not '''
+            return (self.find_field.regex, r_pattern)
+        f_pattern = self.find_field.text()
+        if f_pattern == '' : # empty pattern, not good for global find!
+            return (None, r_pattern)
+        # escape any magic chars in the rep and search patterns
+        r_pattern = r_pattern.replace('\\','\\\\')
+        f_pattern = FindPanel.RE_MAGIC_CHARS.sub('\\\\\\1',f_pattern)
+        if self.sw_whole_word.isChecked() :
+            f_pattern = '\\b' + f_pattern + '\\b'
+        flags = regex.M
+        if not self.sw_respect_case.isChecked() :
+            flags |= regex.I
+        return (regex.compile(f_pattern, flags), r_pattern)
+
+    '''
+    Methods related to searching all open books.
+
+    Come here when the state of the All Books switch changes. The list of
+    matches is only shown while the switch is on.
+    '''
+    def all_books_change(self, state):
+        self.hit_tree.setVisible(bool(state))
+
+    '''
+    Search every open book for the regex rex. We take a snapshot of each
+    document, along with its revision number, here on the GUI thread, then
+    search the snapshots on a pool of worker threads. Returns a list of
+    tuples (book, revision, [match objects]) in the order that the main
+    window opened the books.
+    '''
+    def _search_all_books(self, rex):
+        snapshots = []
+        for book in self.book.mainwindow.get_all_books() :
+            editm = book.get_edit_model()
+            snapshots.append( (book, editm.revision(), editm.full_text()) )
+        with concurrent.futures.ThreadPoolExecutor() as pool :
+            futures = [ pool.submit(_find_all, rex, text)
+                        for (book, revision, text) in snapshots ]
+            return [ (book, revision, future.result())
+                     for ((book, revision, text), future) in zip(snapshots, futures) ]
+
+    '''
+    Execute any of the four search buttons when All Books is checked. Find
+    every match in every open book and show them in the list, grouped by
+    book. If there are none, beep.
+    '''
+    def all_books_search(self):
+        (rex, r_pattern) = self._global_regex()
+        if rex is None : # bad regex syntax or empty find string
+            utilities.beep()
+            return
+        hit_list = []
+        for (book, revision, mlist) in self._search_all_books(rex) :
+            if len(mlist) :
+                hit_list.append( (book, [ m.span() for m in mlist ]) )
+        self.show_book_hits(hit_list)
+        if 0 == len(hit_list) :
+            utilities.beep()
+            return
+        self.find_field.content_used() # remember a successful use
+
+    '''
+    Load the list of matches with hit_list, a list of tuples (book,
+    [(start,end),...]). Each book is a top-level item showing the book name
+    and count of matches. Each match is a child item showing the line
+    number and text of the line, and carrying the book sequence number and
+    the span of the match as its data.
+
+    This is public because when the user clicks on a match in another book,
+    that book's Find panel replaces this one, and we pass it the list so the
+    user can continue with it.
+    '''
+    def show_book_hits(self, hit_list):
+        self.book_hits = hit_list
+        self.hit_tree.clear()
+        for (book, spans) in hit_list :
+            editm = book.get_edit_model()
+            book_item = QTreeWidgetItem( [
+                '{0} ({1})'.format(book.get_book_name(), len(spans)) ] )
+            for (a, z) in spans :
+                block = editm.findBlock(a)
+                hit_item = QTreeWidgetItem( [
+                    '{0}: {1}'.format(block.blockNumber()+1, block.text().strip()) ] )
+                hit_item.setData(0, Qt.ItemDataRole.UserRole, (book.sequence, a, z) )
+                book_item.addChild(hit_item)
+            self.hit_tree.addTopLevelItem(book_item)
+        self.hit_tree.expandAll()
+        self.sw_all_books.setChecked(True) # make sure the list is visible
+
+    '''
+    Come here when the user clicks an item in the list of matches. If it is
+    a book item, do nothing. Otherwise select the matched text in its book,
+    and if that is not our book, give that book the focus. The list is a
+    snapshot, so the book may have been closed (beep) or edited since
+    (select what is now at that position, within the document).
+    '''
+    def hit_click(self, item, column):
+        hit = item.data(0, Qt.ItemDataRole.UserRole)
+        if hit is None : return # a book item
+        (seq, a, z) = hit
+        book = self.book.mainwindow.open_books.get(seq, None)
+        if book is None : # book has been closed
+            utilities.beep()
+            return
+        limit = book.get_edit_model().characterCount() - 1
+        find_tc = book.get_edit_view().get_cursor()
+        find_tc.setPosition( min(z, limit) )
+        find_tc.setPosition( min(a, limit), QTextCursor.MoveMode.KeepAnchor )
+        if book is not self.book :
+            find_panel = book.get_find_panel()
+            find_panel.show_book_hits(self.book_hits)
+            self.book.mainwindow.focus_me(seq)
+            book.make_me_visible(find_panel)
+        book.get_edit_view().center_this(find_tc)
+
+    '''
+    Execute global replace when All Books is checked. Find every match in
+    every open book and ask the user's permission once for the total. Then
+    in each book, replace its matches from the end toward the top under
+    its own undo macro, so each book can be undone separately.
+
+    The replace string is tried on the first match before any book is
+    changed, so an error in it does not leave some books replaced and
+    others not. The OK dialog lets the user edit a book while it is up;
+    a book whose revision changed since its snapshot is skipped.
+    '''
+    def all_books_replace(self, button):
+        (rex, r_pattern) = self._global_regex( self.replace_fields[button].text() )
+        if rex is None : # bad regex syntax or empty find string
+            utilities.beep()
+            return
+        results = [ result for result in self._search_all_books(rex) if len(result[2]) ]
+        count = sum( len(mlist) for (book, revision, mlist) in results )
+        if 0 == count : # no hits
+            utilities.beep()
+            return
+        try:
+            results[0][2][0].expand(r_pattern)
+        except (regex.error, IndexError) as whatever:
+            utilities.warning_msg(
+                _TR( 'Find panel error in Replace text',
+                     'Error in Replace text' ),
+                str(whatever), self )
+            return
+        msg = _TR(
+            "Global replace",
+            "OK to replace %n occurences in all open books of",n=count
+            )
+        info_with = _TR(
+            "replace <string> with <string>",
+            "\nwith\n"
+            )
+        info_msg = self.find_field.text().__repr__() + info_with + self.replace_fields[button].text().__repr__()
+        info_msg += '\n\n' + '\n'.join(
+            '{0}: {1}'.format(book.get_book_name(), len(mlist))
+            for (book, revision, mlist) in results )
+        if not utilities.ok_cancel_msg(msg,info_msg,self) :
+            return
+        skipped = []
+        for (book, revision, mlist) in results :
+            if book.get_edit_model().revision() != revision :
+                find_logger.error('Book {0} changed during global replace, skipped'.format(book.get_book_name()))
+                skipped.append(book.get_book_name())
+                continue
+            # one undoable edit per book, remapping its tracked positions
+            book.get_edit_model().apply_edits(
+                [ (m.start(), m.end(), m.expand(r_pattern)) for m in mlist ] )
+        if len(skipped) :
+            utilities.warning_msg(
+                _TR( 'Global replace',
+                     'Some books were edited during the replace and were not changed' ),
+                '\n'.join(skipped), self )
+        self.book_hits = [] # its spans are no longer valid
+        self.hit_tree.clear()
 
 
     '''
@@ -1440,6 +1656,13 @@ class FindPanel(QWidget):
         self.sw_in_range.setToolTip(
             _TR('Find panel checkbox','When checked, search and replace are restricted to a chosen block of text.','button_tooltip')
             )
+        # Make the All Books switch.
+        self.sw_all_books = QCheckBox(
+            _TR('Find panel checkbox','All Books')
+            )
+        self.sw_all_books.setToolTip(
+            _TR('Find panel checkbox','When checked, search lists the matches in every open book, and ALL! replaces in every open book.','button tooltip')
+            )
         # Make the recall button for the Find text. Save its reference as [0] in
         # the list of four recall buttons.
         self.recall_buttons[0] = RecallMenuButton()
@@ -1487,6 +1710,7 @@ class FindPanel(QWidget):
         box_switches.addWidget(self.sw_whole_word)
         box_switches.addWidget(self.sw_regex)
         box_switches.addWidget(self.sw_in_range)
+        box_switches.addWidget(self.sw_all_books)
         box_switches.addStretch() # compress to the left
         # Arrange the popup and find text in a row with the text maximized.
         box_find_text = QHBoxLayout()
@@ -1579,6 +1803,15 @@ class FindPanel(QWidget):
         box_reps.addLayout(box_3_reps,1)
         box_reps.addLayout(box_3_sws,0)
 
+        # Make the list of matches for All Books searches. It is only
+        # visible while All Books is checked.
+        self.hit_tree = QTreeWidget()
+        self.hit_tree.setHeaderHidden(True)
+        self.hit_tree.setToolTip(
+            _TR('Find panel','Matches in all open books. Click a match to select it.','tooltip')
+            )
+        self.hit_tree.setVisible(False)
+
         # Make the array of 24 User buttons. Initially we have no userdict
         # string for initializing them so they go in with (empty) contents.
         # The metadata reader may load some of them later.
@@ -1598,6 +1831,7 @@ class FindPanel(QWidget):
         vb1 = QVBoxLayout()
         vb1.addWidget(frame_find,0)
         vb1.addWidget(frame_reps,0)
+        vb1.addWidget(self.hit_tree,1)
         vb1.addStretch()
         vb1.addWidget(frame_user,0)
         self.setLayout(vb1)
\ No newline at end of file
@@ -97,26 +97,34 @@ The example above might produce the following logical table:
   i     ivx      1570       1574         1      Footnote i: inner note refe..
 
 The table is actually implemented as a list of lists, each list having just
-two members: [ ACursor, NCursor] where ACursor is a QTextCursor that selects
+two members: [ ACursor, NCursor] where ACursor is a cursor that selects
 the the KEY in the ANCHOR, and NCursor selects all the lines of the NOTE.
 
+The cursors are TrackedCursors (see editdata.py), each a pair of slots in
+one PositionTracker, rather than QTextCursors, because a large book can have
+thousands of Anchors and Notes and Qt adjusts every live QTextCursor on
+every keystroke. They answer the same selectedText(), selectionStart() and
+so on as QTextCursors.
+
 The other values (key, class, Anchor Line#, Note Line#, Note Length, Note
-Text) can be extracted from the two QTextCursors. Qt maintains the text
-cursors while the user is editing the document, so the line numbers, length
-and text remain accurate despite editing.
+Text) can be extracted from the two cursors. The tracker maintains the
+positions while the user is editing the document, so the line numbers,
+length and text remain accurate despite editing.
 
               Refresh Process
 
 Initially the table is empty. The refresh() method is called from the
-fnotview module at user request. Refresh scans the document line by line
-looking for anchors and notes. We use the QTextDocument find() method and
-QRegularExpression items for this search, because these result in QTextCursors.
-
-The document is scanned twice, first to build a list of Anchors, then to
-build a list of Notes. The two lists are merged and the table is built from
-the matching (Anchor, Note) pairs. If any Anchors and Notes remain unmatched
-they are stored as mismatched entries, in which either ACursor or NCursor is
-None, showing either an anchor with no note, or vice versa.
+fnotview module at user request. Refresh scans the full text of the document
+once, as a Python string, with a single regex that recognizes both Anchors
+and Note openings.
+
+Anchors are matched to Notes as they are found: each Anchor is queued by its
+Key, and each Note takes the oldest queued Anchor with its Key from an
+earlier line. The table is built in Anchor sequence as the Anchors are found.
+If any Anchors and Notes remain unmatched they are stored as mismatched
+entries, in which either ACursor or NCursor is None, showing either an anchor
+with no note, or vice versa. Cursors are made only at the end, for the
+final table entries.
 
               Metadata
 
@@ -178,8 +186,9 @@ The following methods are provided for the use of the footnote view display.
                       or the full text "[Footnote K: ....]" when t=0.
                       Returns an empty string if there is no Note n.
 
-    set_key(n,key)    change key value of the Anchor/Note pair n to
-                      key (used when renumbering notes).
+    set_keys(keys)    change the key value of each Anchor/Note pair n to
+                      keys[n] unless that is None (used when renumbering
+                      notes), as a single undoable edit.
 
     find_zones()      sweep the document and find all /F..F/ markers,
                       and return the number found.
@@ -187,16 +196,30 @@ The following methods are provided for the use of the footnote view display.
     move_notes()      move all notes that are not already in a footnote
                       section, into the next higher footnote section
                       if any. Notes in a section, and notes where there
-                      is no following section, are not moved.
-
-
-The Query methods take advantage of the expected sequence of calls to
-QTableModel.data(): that it will call for each column of a single row before
-moving on to the next row. On the first call for a given "n" row number, the
-cursors for that row are used to derive five logical column values (key,
-class, aline, nline, nlen) anticipating they will be called for sequentially.
-
-Note on QTextCursor use: A QTextCursor has two values, anchor and position,
+                      is no following section, are not moved. This is
+                      a single undoable edit.
+
+The Anchor and Note positions are in a PositionTracker made by the document,
+so that editdata.apply_edits() remaps them after a bulk edit.
+
+
+The Query methods are served from a columnar cache: one list per logical
+column (key, class, aline, nline, nlen, text) indexed by row. After a
+refresh or a metadata load every row is marked uncached, and each row is
+cached when it is first queried. So opening a book with thousands of notes
+only makes their cursors; no text or line number is fetched until the
+Footnote panel or some other user asks.
+
+The cache is invalidated by the contentsChange signal of the document,
+which counts edits in edit_generation and records the position of each
+edit. When a row is queried and there has been an edit since the row was
+cached, the row is checked: if every such edit was below the end of the
+row, nothing about it changed. Otherwise its key and text are compared to
+the cursors, and its line numbers are recomputed if needed. Thus after an
+edit, only the rows the view actually asks for are examined, and each of
+them once.
+
+Note on cursor use: A cursor has two values, anchor and position,
 to define the text it selects. Qt doesn't care which is lower (closer to the
 top of the doc) but QTextDocument.find() returns anchor < position(), i.e.
 the cursor is "positioned" at the end of the found text, with the anchor at
@@ -204,9 +227,11 @@ the start. So we try to keep that relation on all cursors.
 
 '''
 import regex
+import collections
+import itertools
 import constants as C
 from PyQt6.QtCore import pyqtSignal
-from PyQt6.QtCore import QObject, QRegularExpression
+from PyQt6.QtCore import QObject
 from PyQt6.QtGui import QTextCursor
 import logging
 fnotdata_logger = logging.getLogger(name='fnotdata')
@@ -223,6 +248,12 @@ KeyClass_abc = 3
 KeyClass_123 = 4
 KeyClass_sym = 5
 
+'''
+The number of recent edit positions kept in edit_log. A cached row older
+than this many edits is checked against its cursors, see _check_row().
+'''
+EDIT_LOG_SIZE = 16
+
 '''
 
 The FnoteData class definition. One instance of this is constructed per book.
@@ -243,34 +274,44 @@ class FnoteData(QObject):
         '''
         self.book = my_book
         ''' Register our metadata reader/writer pair. '''
-        self.book.get_meta_manager().register(
-            C.MD_FN, self._fnot_reader, self._fnote_save)
+        self.metamgr = self.book.get_meta_manager()
+        self.metamgr.register(
+            C.MD_FN, self._fnot_reader, self._fnote_save, tracked=True)
         ''' Save a reference to our QTextDocument. '''
         self.doc = self.book.get_edit_model()
-        '''
-        Save a reference to our edit view, which coins cursor objects. No
-        actually do that later because when we are initializing, the editview
-        has not been created.
-        '''
-        self.eview = None
         ''' This is the actual database, a list of two-item lists. '''
         self.the_list = []
+        ''' The positions of the cursors in the_list '''
+        self.tracker = self.doc.make_tracker()
         ''' The count of currently unmatched items, Anchors plus Notes '''
         self.count_of_unpaired_keys = 0
         '''
-        Items from the last row queried, cached because we expect fnotview to
-        refer to all of these before moving to another row. See _load_row().
+        The columnar cache of the logical table, one list per column, and
+        for each row the edit generation at which it was cached, the line
+        generation at which its line numbers were found, and the end of the
+        last character it covers. See _build_cache() and _check_row().
         '''
-        self.last_row = None
-        self.last_key = ''
-        self.last_anchor = None
-        self.last_note = None
+        self._clear_cache()
+        '''
+        Every change to the document increments edit_generation and appends
+        its position to edit_log, which keeps only the latest EDIT_LOG_SIZE,
+        so its last k entries are the positions of the edits since
+        generation edit_generation-k. A change that alters the number of
+        lines, or spans more than one line, also increments line_generation.
+        '''
+        self.edit_generation = 0
+        self.edit_log = collections.deque(maxlen=EDIT_LOG_SIZE)
+        self.line_generation = 0
+        self.block_count = self.doc.blockCount()
+        self.doc.contentsChange.connect(self._doc_change)
         ''' list of footnote zone cursors, see find_zones(). '''
         self.zone_cursors = []
         '''
-        Set up QRegularExpressions and regexes we use out of line. This creates members:
+        Set up regexes we use out of line. This creates members:
         note_finder_re
-        anchor_finder_re
+        item_finder_re
+        note_end_re
+        zone_finder_re
         class_re_list
         '''
         self._set_up_res()
@@ -279,7 +320,107 @@ class FnoteData(QObject):
     def _reset(self):
         self.the_list = []
         self.count_of_unpaired_keys = 0
-        self.last_row = None
+        self._clear_cache()
+
+    ''' Reset the columnar cache to empty. '''
+    def _clear_cache(self):
+        self.col_key = []
+        self.col_class = []
+        self.col_aline = []
+        self.col_nline = []
+        self.col_nsize = []
+        self.col_text = []
+        self.col_gen = []
+        self.col_line_gen = []
+        self.col_end = []
+
+    '''
+    Slot for the contentsChange signal of the document. Note the edit, and
+    whether it could have moved any line numbers. It may have moved the
+    cursors, so our metadata needs writing.
+    '''
+    def _doc_change(self, pos, removed, added):
+        self.metamgr.mark_dirty(C.MD_FN)
+        self.edit_generation += 1
+        self.edit_log.append(pos)
+        block_count = self.doc.blockCount()
+        block = self.doc.findBlock(pos)
+        if block_count != self.block_count \
+        or pos + added >= block.position() + block.length() :
+            self.block_count = block_count
+            self.line_generation += 1
+
+    '''
+    Set up the columnar cache after a refresh or metadata load, with every
+    row marked never-cached by a generation of -1. Getting the values of a
+    row means asking the document for text and line numbers, which for
+    thousands of notes takes longer than anything else in opening a book,
+    so each row is cached only when it is first asked for, see _check_row().
+    Start a fresh edit_log since no cached row predates it.
+    '''
+    def _build_cache(self):
+        self.metamgr.mark_dirty(C.MD_FN)
+        self.edit_generation = 0
+        self.edit_log.clear()
+        self._clear_cache()
+        for n in range( len(self.the_list) ) :
+            self.col_key.append(None)
+            self.col_class.append(None)
+            self.col_aline.append(None)
+            self.col_nline.append(None)
+            self.col_nsize.append(0)
+            self.col_text.append('')
+            self.col_gen.append(-1)
+            self.col_line_gen.append(0)
+            self.col_end.append(0)
+
+    '''
+    Load the cache values for row n from its cursors. If only_if_changed,
+    the row was cached before and we update only what its cursors show has
+    changed: the key and class if the key text differs, and the line numbers
+    if the key or note text differs or lines may have moved.
+    '''
+    def _cache_row(self, n, only_if_changed=False):
+        [anchor_tc, note_tc] = self.the_list[n]
+        text = note_tc.selectedText() if note_tc is not None else ''
+        key = anchor_tc.selectedText() if anchor_tc is not None \
+            else self._key_from_note(note_tc)
+        changed = key != self.col_key[n] or text != self.col_text[n]
+        if key != self.col_key[n] or not only_if_changed :
+            self.col_key[n] = key
+            self.col_class[n] = self._key_class_code(key)
+        self.col_text[n] = text
+        if changed or self.col_line_gen[n] != self.line_generation or not only_if_changed :
+            self.col_aline[n] = self._cursor_start_line(anchor_tc)
+            self.col_nline[n] = self._cursor_start_line(note_tc)
+            self.col_nsize[n] = self._cursor_line_count(note_tc)
+            self.col_line_gen[n] = self.line_generation
+        self.col_end[n] = max(
+            anchor_tc.selectionEnd() if anchor_tc is not None else 0,
+            note_tc.selectionEnd() if note_tc is not None else 0 )
+        self.col_gen[n] = self.edit_generation
+
+    '''
+    Make sure the cached values of row n are current. If it has never been
+    cached, cache it now. If there has been no edit since it was cached,
+    they are. If all the edits since were past the
+    end of the row, they are also, as nothing before an edit moves. (Check
+    only a few edits that way; after many, just look at the cursors.)
+    Otherwise compare to the cursors and update.
+    '''
+    def _check_row(self, n):
+        gen = self.col_gen[n]
+        if gen == self.edit_generation :
+            return
+        if gen < 0 :
+            self._cache_row(n)
+            return
+        age = self.edit_generation - gen
+        if age <= EDIT_LOG_SIZE \
+        and min( itertools.islice( reversed(self.edit_log), age ) ) > self.col_end[n] :
+            self.col_gen[n] = self.edit_generation
+            return
+        self._cache_row(n, only_if_changed=True)
 
     '''
     
@@ -288,148 +429,148 @@ class FnoteData(QObject):
     * Set up a progress bar, which will only display if this takes a some
       time, which it usually does not.
     
-    * Using QTextDocument.find, scan the document top to bottom to find all
-      Anchors and make a list of them as QTextCursors.
-    
-    * Again scan, this time finding Notes, and making a list of QTextCursor
-      items which each select a Note in full to its end.
-    
-    * Merge the lists by matching each Anchor to the nearest following
-      matching Note. Add the matched cursor pairs to the_list.
-    
-    * Add any remaining unmatched Anchors and Notes to the_list as
-      unmatched items, incrementing count_of_unpaired_keys.
+    * Using the combined item_finder_re, scan the full text of the document
+      top to bottom, finding Anchors and Notes in sequence. Keep a running
+      count of the lines passed, so we know the line number of each item
+      without asking the document.
+
+    * For each Anchor, append a row [anchor_span, None] to a list of rows,
+      and append the row to a FIFO queue for its Key.
+
+    * For each Note, find the line that ends it, the next one that ends in
+      a right bracket. Then if the oldest row in the queue for its Key has
+      its Anchor on an earlier line, pop the row and put the Note span in
+      it. Otherwise the Note is unmatched; save it in a list of orphans.
+      Because anchors on any line are queued in sequence, only the oldest
+      row in a queue needs to be tested.
+
+    * The rows are in Anchor sequence. Merge the orphan Notes into them,
+      each ahead of the first row whose Note follows it.
+
+    * Convert the spans to cursors and store them in the_list, counting
+      the unmatched items in count_of_unpaired_keys.
     
     A QProgressDialog is passed, and we update it during the process.
     (creating such a dialog is the job of the View, not the Model!)
     '''
     def _refresh(self, progresso) :
+        ''' Clear the database '''
+        self._reset()
+        doc_text = self.doc.full_text()
         '''
-        Initialize the progress dialog. As we scan the doc twice, its max
-        value is twice the document length.
+        Initialize the progress dialog to the length of the text, and
+        plan to update it about 100 times.
         '''
-        progress_half = self.doc.characterCount()
-        progresso.setMaximum(2 * progress_half)
+        progresso.setMaximum( len(doc_text) )
         progresso.setValue(0)
-        ''' Clear the database '''
-        self._reset()
-        ''' Pass one: look for Anchors '''
-        anchors_list = []
-        find_tc = self.doc.find( self.anchor_finder_qre, QTextCursor( self.doc ) )
-        while not find_tc.isNull() :
-            '''
-            find_tc now selects the whole Anchor [Key] but we want to select
-            only the Key. The means to do this are awkward.
-            '''
-            a = find_tc.anchor() + 1
-            p = find_tc.position() - 1
-            find_tc.setPosition( a, QTextCursor.MoveMode.MoveAnchor )
-            find_tc.setPosition( p, QTextCursor.MoveMode.KeepAnchor )
-            progresso.setValue( p )
-            '''
-            Special case: the PGDP conventional diphthong [oe] or [OE] looks
-            like an alpha key, and we manually exclude it.
-            '''
-            if not self._is_oe( find_tc.selectedText() ) :
-                anchors_list.append( QTextCursor(find_tc) )
-            ''' restore loop invariant '''
-            find_tc = self.doc.find( self.anchor_finder_qre, find_tc )
-        ''' Pass two: look for Notes '''
-        notes_list = []
-        find_tc = self.doc.find( self.note_finder_qre, QTextCursor( self.doc ) )
-        while not find_tc.isNull() :
-            progresso.setValue( progress_half + find_tc.position() )
+        progress_step = 1 + len(doc_text) // 100
+        progress_next = progress_step
+        ''' rows, each [anchor_span, note_span] with spans as (start, end) '''
+        rows = []
+        ''' for each Key, the deque of rows whose anchors await a note '''
+        queues = collections.defaultdict(collections.deque)
+        ''' Notes with no matching anchor '''
+        orphan_notes = []
+        ''' running line count: line_number is the line of text[line_pos] '''
+        line_number = 0
+        line_pos = 0
+        ''' end of the last note: no note can start before this '''
+        note_limit = 0
+        for match in self.item_finder_re.finditer(doc_text) :
+            start = match.start()
+            line_number += doc_text.count('\n', line_pos, start)
+            line_pos = start
+            if start >= progress_next :
+                progresso.setValue( start )
+                progress_next = start + progress_step
+            if match.group('akey') is not None :
+                '''
+                An Anchor. Span only the Key, not the brackets. Special case:
+                the PGDP conventional diphthong [oe] or [OE] looks like an
+                alpha key, and we manually exclude it.
+                '''
+                key = match.group('akey')
+                if self._is_oe( key ) :
+                    continue
+                row = [ match.span('akey'), None, line_number ]
+                rows.append( row )
+                queues[key].append( row )
+                continue
             '''
-            find_tc now selects just "[Footnote Key:" but we want to extend
-            it to all the lines of the note. Proceed by text blocks until we
-            have one that ends like this.]
+            The opening of a Note, "[Footnote Key:". Ignore it if it is
+            inside the previous Note. Otherwise extend it to the end of the
+            first line that ends in a right bracket. If there is no such
+            line, it is not a legal Note. If there was a matching Anchor it
+            will go unmatched and the user will be informed that way. No
+            later Note could be legal either, but later Anchors still count.
             '''
-            while True:
-                ''' "drag" to the end of the block selecting the whole line. '''
-                find_tc.movePosition( QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor )
-                if find_tc.selectedText().endswith(']') :
-                    break # find_tc selects a whole Note
-                ''' Make sure we have not reached the end of the document. '''
-                if find_tc.atEnd() :
-                    '''
-                    Reached end of document looking for the closing line of
-                    [Footnote... As there is no closing bracket, it is not a
-                    legal Note. If there was a matching Anchor it will go
-                    unmatched and the user will be informed that way.
-                    '''
-                    find_tc.clearSelection()
-                    break
-                else : # there is another line, move to its head and try again
-                    find_tc.movePosition(QTextCursor.MoveOperation.NextBlock,QTextCursor.MoveMode.KeepAnchor)
-            # end of while true looking for end of Note
-            if find_tc.hasSelection() : # we did find a line or lines ending in ]
-                notes_list.append( QTextCursor( find_tc ) )
-            find_tc = self.doc.find( self.note_finder_qre, find_tc )
-        # end while not find_tc.isNull
-
-        '''
-        Now, anchors_list is all the Anchors, and notes_list is all the
-        Notes, each in sequence by document position. For each Anchor in
-        sequence, find the first Note with a matching Key at a higher line
-        number. If there is one, add the matched pair to the_list and delete
-        the Note from its list. If there is no match, copy the Anchor to a
-        list of unmatched Anchors (because we can't del() from anchors_list
-        while we are looping over it).
-        
-        Despite appearances this is not an MxN process because we remove
-        Notes from the list when they are matched, so most Anchors find a
-        match on the 1st or 2nd test, or not at all.
-        '''
-        orphan_anchors_list = []
-        for anchor_tc in anchors_list :
-            hit = False
-            anchor_line = self._cursor_start_line(anchor_tc)
-            for note_tc in notes_list :
-                hit = anchor_tc.selectedText() == self._key_from_note(note_tc) \
-                    and anchor_line < self._cursor_start_line(note_tc)
-                if hit : break
-            if hit : # a match was made
-                self.the_list.append( [anchor_tc, note_tc] )
-                notes_list.remove(note_tc)
-            else : # no match was found
-                orphan_anchors_list.append(anchor_tc)
+            if start < note_limit :
+                continue
+            end_match = self.note_end_re.search( doc_text, start )
+            if end_match is None :
+                note_limit = len(doc_text)
+                continue
+            note_limit = end_match.end()
+            note_span = ( start, note_limit )
+            queue = queues[ match.group('nkey') ]
+            if len(queue) and queue[0][2] < line_number :
+                queue.popleft()[1] = note_span
+            else :
+                orphan_notes.append( note_span )
         '''
-        All matches have been made. Unmatched Anchors are in orphan_anchors_list.
-        Now add them to the_list as unmatched items, in their line number order
-        (basically an insertion sort).
+        Rows are in Anchor sequence. Merge in the orphan Notes (which are in
+        document sequence) each ahead of the first row with a Note that
+        starts at or after the orphan. Since the orphans are in sequence,
+        that row can only move forward, so one pass does it.
         '''
-        for anchor_tc in orphan_anchors_list :
-            this_anchor_line = self._cursor_start_line( anchor_tc )
-            j = 0
-            while j < len(self.the_list) : # old-fashioned loop
-                that_anchor_line = self._cursor_start_line( self.the_list[j][0] )
-                if this_anchor_line <= that_anchor_line :
+        merged = []
+        j = 0
+        for note_span in orphan_notes :
+            while j < len(rows) :
+                if rows[j][1] is not None and rows[j][1][0] >= note_span[0] :
                     break
+                merged.append( rows[j] )
                 j += 1
-            self.the_list.insert( j, [anchor_tc, None] )
+            merged.append( [ None, note_span, None ] )
+        merged.extend( rows[j:] )
         '''
-        Any Notes that remain in notes_list are unmatched. Now insert them in
-        the_list. Another insertion sort,but there are now also possibly
-        unmatched Anchors in the_list.
+        Make cursors for the final table, and count the unmatched items.
         '''
-        for note_tc in notes_list :
-            this_note_line = self._cursor_end_line( note_tc )
-            j = 0
-            while j < len(self.the_list) :
-                list_note_line = self._cursor_start_line( self.the_list[j][1] )
-                if list_note_line : # is not None from an unmatched Anchor
-                    if this_note_line <= list_note_line :
-                        break
-                j += 1
-            self.the_list.insert( j, [None, note_tc] )
+        for [anchor_span, note_span, line_number] in merged :
+            if anchor_span is None or note_span is None :
+                self.count_of_unpaired_keys += 1
+        self._make_cursors( [ row[:2] for row in merged ] )
         '''
         Tidy up
         '''
-        self.count_of_unpaired_keys = len(orphan_anchors_list) + len(notes_list)
+        self._build_cache()
         progresso.reset()
         if self.count() : # there were some footnotes
             self.FootNotesLoaded.emit() # tell the view panel.
 
+    '''
+    Given a list of [anchor_span, note_span] pairs, where a span is (anchor,
+    position) or None, load all the spans into our tracker and set the_list
+    to matching pairs of cursors, or None for missing spans.
+    '''
+    def _make_cursors(self, span_pairs):
+        positions = []
+        for pair in span_pairs :
+            for span in pair :
+                if span is not None :
+                    positions.extend( span )
+        self.tracker.set_positions( positions )
+        slot = 0
+        for pair in span_pairs :
+            row = []
+            for span in pair :
+                if span is None :
+                    row.append( None )
+                else :
+                    row.append( self.tracker.cursor( slot ) )
+                    slot += 2
+            self.the_list.append( row )
+
     '''
     
     Metadata writing and reading.
@@ -464,12 +605,8 @@ class FnoteData(QObject):
             fnotdata_logger.error(
                 'FOOTNOTES metadata is not a list of lists, ignoring' )
             return
-        if self.eview is None :
-            '''
-            During __init__ we didn't have an edit view. Now during document
-            load, we had better have one.
-            '''
-            self.eview = self.book.get_edit_view()
+        doc_size = self.doc.characterCount()
+        span_pairs = []
         for item in value :
             try :
                 [a_a, a_p, n_a, n_p] = item # exception if not [a,b,c,d]
@@ -481,19 +618,16 @@ class FnoteData(QObject):
                 else : raise ValueError
                 if (n_a == 0 and n_p == 0) or (n_a >= 0 and n_a < n_p) : pass
                 else : raise ValueError
-                if (a_a + a_p) :
-                    anchor_tc = self.eview.make_cursor(a_p, a_a)
-                else : # anchor is 0,0
-                    anchor_tc = None
-                if (n_a + n_p) :
-                    note_tc = self.eview.make_cursor(n_p, n_a)
-                else : # note is 0,0
-                    note_tc = None
-                self.the_list.append( [ anchor_tc, note_tc ] )
+                if a_p >= doc_size or n_p >= doc_size : raise ValueError
+                ''' a span of 0,0 means no anchor or no note '''
+                span_pairs.append( [ (a_a, a_p) if (a_a + a_p) else None,
+                                     (n_a, n_p) if (n_a + n_p) else None ] )
             except:
                 fnotdata_logger.error(
                     'FOOTNOTES metadata item is invalid, ignoring: {}'.format(item) )
         # end for item in value
+        self._make_cursors( span_pairs )
+        self._build_cache()
         if self.count() : # there were some footnotes
             self.FootNotesLoaded.emit() # tell the view panel.
 
@@ -507,7 +641,7 @@ class FnoteData(QObject):
         return s.lower() == 'oe'
 
     '''
-    Given a QTextCursor, return the number of the document line for the
+    Given a cursor, return the number of the document line for the
     end of its selection. Probably that's its position() value but don't
     assume that; use selectionEnd instead. Allow for missing cursors (None).
     '''
@@ -516,7 +650,7 @@ class FnoteData(QObject):
             return self.doc.findBlock( tc.selectionEnd() ).blockNumber()
         return None
     '''
-    Given a QTextCursor, return the document line number for the start of
+    Given a cursor, return the document line number for the start of
     its selection, which is probably its anchor() value but don't assume
     that. Allow for missing cursors (None).
     '''
@@ -526,7 +660,7 @@ class FnoteData(QObject):
         return None
 
     '''
-    Given a QTextCursor presumably for a Note, return the count of lines
+    Given a cursor presumably for a Note, return the count of lines
     that its selection spans. Allow for missing cursors (None).
     '''
     def _cursor_line_count(self, tc):
@@ -546,7 +680,7 @@ class FnoteData(QObject):
         return None
 
     '''
-    Given a QTextCursor selecting a Note, isolate the Key and return it.
+    Given a cursor selecting a Note, isolate the Key and return it.
     Use the regex version of note_finder_re in which the Key is group(1).
     '''
     def _key_from_note(self, tc):
@@ -570,84 +704,60 @@ class FnoteData(QObject):
     def mismatches(self):
         return self.count_of_unpaired_keys
 
-    def _load_row(self, n):
-        self.last_row = n
-        [self.last_anchor, self.last_note] = self.the_list[n]
-        if self.last_anchor is not None :
-            self.last_key = self.last_anchor.selectedText()
-        else :
-            self.last_key = self._key_from_note(self.last_note)
-
     def key(self, n):
-        if n != self.last_row: self._load_row(n)
-        return self.last_key
+        self._check_row(n)
+        return self.col_key[n]
 
     def key_class(self, n):
-        if n != self.last_row: self._load_row(n)
-        return self._key_class_code(self.last_key)
+        self._check_row(n)
+        return self.col_class[n]
 
     def anchor_line(self, n):
-        if n != self.last_row: self._load_row(n)
-        return self._cursor_start_line(self.last_anchor)
+        self._check_row(n)
+        return self.col_aline[n]
 
     def note_line(self, n):
-        if n != self.last_row: self._load_row(n)
-        return self._cursor_start_line(self.last_note)
+        self._check_row(n)
+        return self.col_nline[n]
 
     def note_size(self, n):
-        if n != self.last_row: self._load_row(n)
-        return self._cursor_line_count(self.last_note)
+        self._check_row(n)
+        return self.col_nsize[n]
 
     def note_text(self, n, t=0):
-        if n != self.last_row: self._load_row(n)
-        if self.last_note is not None:
-            txt = self.last_note.selectedText()
-            if (t) and t < len(txt) :
-                txt = txt[:t] + '...'
-            return txt
-        return ''
+        self._check_row(n)
+        txt = self.col_text[n]
+        if (t) and t < len(txt) :
+            txt = txt[:t] + '...'
+        return txt
 
     '''
-    For renumbering notes, alter the Key text of a matched pair of Anchor and Note.
-    
-    We assume fnotview cannot call this for a mismatched pair, because it
-    only permits renumbering when the mismatch count is 0. It passes a
-    work_tc as a cursor that has an open EditBlock, so that renumbering will
-    be undoable as a single step.
-    
-    We have to copy the anchor and note cursors into work_tc before changing
-    the key text. Then in case the new text has a different length from the
-    old, update the cursors in the database to match
-    '''
-    def set_key(self, j, new_key, work_tc):
-        [anchor_tc, note_tc] = self.the_list[j]
-        old_key = anchor_tc.selectedText()
-        key_len_diff = len(new_key) - len(old_key)
-        ''' Update the Anchor text '''
-        anchor_start = anchor_tc.selectionStart()
-        work_tc.setPosition( anchor_start, QTextCursor.MoveMode.MoveAnchor )
-        work_tc.setPosition( anchor_tc.selectionEnd(), QTextCursor.MoveMode.KeepAnchor )
-        work_tc.insertText( new_key ) # that replaces the Key in the Anchor
-        ''' Reset the anchor_tc to select the replaced Key '''
-        anchor_tc.setPosition( anchor_start, QTextCursor.MoveMode.MoveAnchor )
-        anchor_tc.setPosition( anchor_start+len(new_key), QTextCursor.MoveMode.KeepAnchor )
-        ''' Update the Note. First, extract its full text as a Python string.'''
-        note_text = note_tc.selectedText()
-        note_start = note_tc.selectionStart()
-        '''
-        Locate the key as group(1) of a match against the note text
+    For renumbering notes, alter the Key text of matched pairs of Anchor and
+    Note. keys is a list with one item per row, either the new key for that
+    row or None for no change.
+
+    We assume fnotview cannot call this when there are mismatched pairs,
+    because it only permits renumbering when the mismatch count is 0.
+
+    For each key to change make two edits, one replacing the Key in the
+    Anchor, and one replacing the Key in the Note, located as group(1) of a
+    match against the note text:
             [Footnote xiv: ...]
             start(1)--^  ^--end(1)
-        '''
-        match = self.note_finder_re.match( note_text )
-        ''' point work_tc at the Key within the note '''
-        work_tc.setPosition( note_tc.selectionStart() + match.start(1), QTextCursor.MoveMode.MoveAnchor )
-        work_tc.setPosition( note_tc.selectionStart() + match.end(1), QTextCursor.MoveMode.KeepAnchor )
-        ''' replace the key in the note '''
-        work_tc.insertText( new_key )
-        ''' Reposition the note_tc to account for a change in the length of the key. '''
-        note_tc.setPosition( note_start, QTextCursor.MoveMode.MoveAnchor )
-        note_tc.setPosition( note_start + len(note_text) + key_len_diff, QTextCursor.MoveMode.KeepAnchor )
+    The document applies all the edits as a single undoable step, and
+    remaps our cursors so that each Anchor cursor selects its new Key and
+    each Note cursor selects the whole Note including its new Key.
+    '''
+    def set_keys(self, keys):
+        edits = []
+        for (j, new_key) in enumerate(keys) :
+            if new_key is None : continue
+            [anchor_tc, note_tc] = self.the_list[j]
+            edits.append( (anchor_tc.selectionStart(), anchor_tc.selectionEnd(), new_key) )
+            match = self.note_finder_re.match( note_tc.selectedText() )
+            note_start = note_tc.selectionStart()
+            edits.append( (note_start + match.start(1), note_start + match.end(1), new_key) )
+        self.doc.apply_edits(edits)
 
     '''
     Record the defined footnote zones as a list of lists, [tcA, tcZ] where
@@ -688,13 +798,20 @@ class FnoteData(QObject):
     Also assume that fnotview will call for a refresh after this operation
     in order to correct the anchor cursors of embedded footnotes.
     
-    The move logic needs to be a single undo operation. That means all text
-    changes have to go through a single QTextCursor, work_tc, which is
-    passed as a parameter.
-    TODO: need progress bar???
+    Each moved Note makes two edits: one inserting a copy of the note text,
+    with leading and trailing newlines, at the end of the zone, and one
+    erasing the original note text and the newlines before and after it.
+    (When two notes are on adjacent lines, the newline between them is
+    erased only once, with the first.) The document applies them all as a
+    single undoable step, and we point each moved Note cursor at its text
+    in the zone.
     '''
 
-    def move_notes(self, work_tc):
+    def move_notes(self):
+        doc_text = self.doc.full_text()
+        edits = []
+        moved = [] # (note_tc, index of its inserting edit)
+        prior_end = 0
         for [anchor_tc, note_tc] in self.the_list :
             note_line = self._cursor_end_line(note_tc)
             ''' Find the first zone that starts below the note '''
@@ -715,34 +832,32 @@ class FnoteData(QObject):
                 continue # to the next note
             '''
             Note defined by note_tc is above the start of zone tcA/tcZ, so we
-            will move it. Duplicate the note text with leading and trailing
-            newlines to the end of the zone.
-            '''
-            note_text = note_tc.selectedText() # cache the note text
-            work_tc.setPosition(tcZ.position()) # point to end of zone
+            will move it.
             '''
-            Inserting text into the document ahead of the position in tcZ
-            causes Qt to update tcZ automatically.
-            '''
-            work_tc.insertText( '\n' + note_text + '\n' )
-            '''
-            Erase the original note text and the newlines before and after,
-            using work_tc so it is part of the undo action.
-            '''
-            work_tc.setPosition(note_tc.anchor()-1)
-            work_tc.setPosition(note_tc.position()+1, QTextCursor.MoveMode.KeepAnchor)
-            work_tc.removeSelectedText()
-            ''' Set note_tc to point to the new location of the note text. '''
-            note_tc.setPosition(tcZ.position() - len(note_text) - 2)
-            note_tc.setPosition(tcZ.position() - 1,QTextCursor.MoveMode.KeepAnchor)
+            note_start = note_tc.selectionStart()
+            note_end = note_tc.selectionEnd()
+            moved.append( (note_tc, len(edits)) )
+            edits.append( (tcZ.position(), tcZ.position(),
+                           '\n' + doc_text[note_start:note_end] + '\n') )
+            edits.append( (max(note_start - 1, prior_end), note_end + 1, '') )
+            prior_end = note_end + 1
         # end for notes in the_list
+        edit_map = self.doc.apply_edits(edits)
+        if edit_map is None : return # error was logged
+        ''' Set each moved note_tc to select the new location of its text. '''
+        positions = self.tracker.get_positions()
+        for (note_tc, k) in moved :
+            (new_start, new_end) = edit_map.new_span(k)
+            positions[note_tc.slot] = new_start + 1
+            positions[note_tc.slot + 1] = new_end - 1
+        self.tracker.set_positions( positions )
     # end move_notes
 
     '''
     As part of initialization, set up the regexes we use. Here and in the
-    rest of the app we prefer the Python package regex, but in order to use
-    QTextDocument.find() we also need some QRegularExpression. They are not reentrant so
-    must be members of the object, not globals or class members.
+    rest of the app we prefer the Python package regex. All of these are
+    applied to Python strings, either the full document text or the text of
+    a cursor selection.
     '''
     def _set_up_res(self):
         global KeyClass_IVX,KeyClass_ABC,KeyClass_ivx,KeyClass_abc,KeyClass_123,KeyClass_sym
@@ -758,20 +873,26 @@ class FnoteData(QObject):
             '[\*\u00a4\u00a7\u00b6\u2020\u2021]' # star currency section para dagger dbl-dagger
             )
         '''
-        Set up a single QRegularExpression that recognizes anchors of all the above
-        types, [A], [xviii], [*] etc
-        '''
-        anchor_finder_string = '\[(' + '|'.join(class_re_strings) + ')\]'
-        self.anchor_finder_qre = QRegularExpression(anchor_finder_string)
-        '''
         Set up the RE that recognizes the opening of a note "[Footnote K:",
-        for K being any of the above key types. Make both QRegularExpression and regex
-        versions.
+        for K being any of the above key types.
         '''
         note_finder_string = '\[Footnote\s+(' + '|'.join(class_re_strings) + ')\s*\:'
-        self.note_finder_qre = QRegularExpression( note_finder_string )
         self.note_finder_re = regex.compile( note_finder_string )
         '''
+        Set up the regex used by refresh to find, in one pass over the
+        document text, both anchors of all the above types, [A], [xviii], [*]
+        etc, and Note openings. An Anchor match has its Key in group akey; a
+        Note opening has its Key in group nkey.
+        '''
+        self.item_finder_re = regex.compile(
+            '\[(?P<akey>' + '|'.join(class_re_strings) + ')\]'
+            + '|\[Footnote\s+(?P<nkey>' + '|'.join(class_re_strings) + ')\s*\:' )
+        '''
+        Set up the regex that finds the end of a Note, the first right
+        bracket at the end of a line.
+        '''
+        self.note_end_re = regex.compile( '\]$', regex.MULTILINE )
+        '''
         
         Set up the RE that finds footnote zones /F..F/. This is applied to
         the complete document text in Python, so we can use regex.
@@ -159,12 +159,6 @@ class FnoteTableModel(QAbstractTableModel):
         super().__init__(parent)
         ''' save access to FnoteData database '''
         self.data_model = model
-        ''' cached items of the most recent row requested in data() '''
-        self.last_row = None # index of row
-        self.brush_for_row = None # background color brush
-        self.note_line = None
-        self.anchor_line = None
-        self.note_size = None
         '''
         Greate the brushes for painting the background of good,
         questionable, and bad (unmatched) rows.
@@ -215,34 +209,18 @@ class FnoteTableModel(QAbstractTableModel):
     The row & column are in the index, and what it wants to know is expressed
     by the role argument.
     
-    We trust QTableView to only ask for rows that exist. We assume that it
-    asks for all columns of one row before going on to the next, hence we
-    cache everything about a row the first time a cell in that row is
-    requested.
+    We trust QTableView to only ask for rows that exist. The data model
+    keeps a cache of every value in the table, so we can just ask it.
     '''
     def data(self, index, role ):
         row = index.row()
         col = index.column()
-        if row != self.last_row :
-            self.last_row = row
-            self.brush_for_row = self.white_brush # be optimistic
-            self.note_line = self.data_model.note_line(row)
-            self.anchor_line = self.data_model.anchor_line(row)
-            self.note_size = self.data_model.note_size(row)
-            if (self.anchor_line is None) or (self.note_line is None) :
-                # unmatched anchor or note, show in pink
-                self.brush_for_row = self.pink_brush
-            elif (self.note_size > SUSPICIOUS_NOTE_SIZE) \
-                 or SUSPICIOUS_NOTE_DISTANCE \
-                           <= ( self.note_line - self.anchor_line ) :
-                self.brush_for_row = self.green_brush
-        # Now, what was it you wanted?
         if role == Qt.ItemDataRole.DisplayRole : # wants actual data
             if   col == 0 : return self.data_model.key(row)
             elif col == 1 : return key_class_names[self.data_model.key_class(row)]
-            elif col == 2 : return self.anchor_line
-            elif col == 3 : return self.note_line
-            elif col == 4 : return self.note_size
+            elif col == 2 : return self.data_model.anchor_line(row)
+            elif col == 3 : return self.data_model.note_line(row)
+            elif col == 4 : return self.data_model.note_size(row)
             else : return self.data_model.note_text(row)
         elif (role == Qt.ItemDataRole.TextAlignmentRole) :
             return COL_ALIGNMENT[col]
@@ -250,10 +228,25 @@ class FnoteTableModel(QAbstractTableModel):
           or (role == Qt.ItemDataRole.StatusTipRole) :
             return COL_TOOLTIPS[col]
         elif (role == Qt.ItemDataRole.BackgroundRole) :
-            return self.brush_for_row
+            return self._row_brush(row)
         # don't support other roles
         return None
 
+    '''
+    Return the background brush for a row: pink for an unmatched anchor or
+    note, green for a suspicious one, else white.
+    '''
+    def _row_brush(self, row):
+        note_line = self.data_model.note_line(row)
+        anchor_line = self.data_model.anchor_line(row)
+        if (anchor_line is None) or (note_line is None) :
+            # unmatched anchor or note, show in pink
+            return self.pink_brush
+        if (self.data_model.note_size(row) > SUSPICIOUS_NOTE_SIZE) \
+             or SUSPICIOUS_NOTE_DISTANCE <= ( note_line - anchor_line ) :
+            return self.green_brush
+        return self.white_brush
+
 '''
 
       Define the class of the Footnote panel, based on a QWidget.
@@ -483,15 +476,17 @@ class FnotePanel(QWidget):
     all decimal Keys are given sequential decimal numbers, alpha Keys get
     sequential letters, roman numeral Keys get sequential roman numerals.
     
-    This means altering Key values in every Anchor and Note. We do all the
-    text changes using a single QTextCursor, so the whole operation can be
+    This means altering Key values in every Anchor and Note. We work out
+    all the new keys and hand the list to the data model, which makes all
+    the text changes as a single edit, so the whole operation can be
     un-done in one undo.
     
     Since some keys may change in length, the position values of all the text
     cursors maintained by the data model (a cursor for each Anchor and each
-    Note) are kept up to date by Qt. Hence there is no need to refresh
-    (rescan the document) after this operation. We tell the table to reset
-    itself, which causes it to re-fetch and update all displayed data items.
+    Note) are remapped by the document after the edit. Hence there is no need
+    to refresh (rescan the document) after this operation. We tell the table
+    to reset itself, which causes it to re-fetch and update all displayed
+    data items.
     '''
     def do_renumber(self):
         if not self._can_we_do_this() : return
@@ -499,14 +494,12 @@ class FnotePanel(QWidget):
         self.streams = [ 0, 0, 0, 0, 0, 0]
         ''' Tell the table model that things are gonna change '''
         self.model.beginResetModel()
-        ''' create a working cursor and start an undo sequence on it. '''
-        worktc = self.edit_view.get_cursor()
-        worktc.beginEditBlock()
         '''
         Do the actual work inside a try-except block so as to be sure that
-        the EditBlock (undo sequence) is ultimately closed.
+        the table model is ultimately reset.
         '''
         try :
+            new_keys = []
             for j in range(self.data_model.count()):
                 old_key = self.data_model.key(j)
                 old_class = self.data_model.key_class(j)
@@ -537,20 +530,19 @@ class FnotePanel(QWidget):
                     new_key = self.stream_lambdas[stream_index](self.streams[stream_index])
                 '''
                 If new_key is None, we make no change to this note.
-                Otherwise, make the change in the text.
                 '''
-                if new_key is not None :
-                    self.data_model.set_key(j, new_key, worktc)
+                new_keys.append( new_key )
             # end of for j in range of keys
+            ''' Make all the changes in the text. '''
+            self.data_model.set_keys(new_keys)
         except Exception as whatever:
             fnotview_logger.error(
                 'Unexpected error renumbering footnotes: {}'.format(whatever.args)
                 )
         '''
-        Close the undo macro and tell the table view to refresh itself,
-        which will populate the table with the updated key values.
+        Tell the table view to refresh itself, which will populate the table
+        with the updated key values.
         '''
-        worktc.endEditBlock()
         self.model.endResetModel()
     # end of do_renumber
 
@@ -578,22 +570,16 @@ class FnotePanel(QWidget):
                 'A Footnote zone is defined by "/F" and "F/" lines.' )
             utilities.warning_msg(emsg,expl,self)
             return
-        ''' create a working cursor and start an undo macro on it. '''
-        worktc = self.edit_view.get_cursor()
-        worktc.beginEditBlock()
         '''
-        Do the actual work inside a try-finally block so as to be sure
-        that the Edit Block is ultimately closed.
-        
-        TODO: why is this done in the data model and not here?
+        Do the actual work inside a try-except block so as to be sure
+        that we refresh afterward.
         '''
         try :
-            self.data_model.move_notes(worktc)
+            self.data_model.move_notes()
         except Exception as whatever:
             fnotview_logger.error(
                 'Unexpected error moving footnotes: {}'.format(whatever.args)
                 )
-        worktc.endEditBlock()
         self.do_refresh()
 
 
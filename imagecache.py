@@ -0,0 +1,513 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "2.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2013, 2014, 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+'''
+                          IMAGECACHE.PY
+
+Load and keep decoded scan images for the Images panel (imageview.py).
+
+The Images panel used to load each page image from disk when the edit
+cursor moved onto its page, looking first for name.png and then for
+name.jpg in the image folder. On a large scan, decoding takes long enough
+that paging quickly through the text stutters.
+
+One ImageCache is made by the ImageDisplay of a book when it finds a folder
+of images. It:
+
+  * lists the folder once into a dict {name:path}, where name is the
+    filename without its .png or .jpg suffix (.png preferred, as before),
+    and watches the folder with a QFileSystemWatcher so the dict is rebuilt
+    when files are added, removed or replaced;
+
+  * decodes an image at a given scale, as a percent of its full size.
+    Below 100% a QImageReader is told setScaledSize(), so that formats
+    able to decode at reduced size (JPEG) do so, and in any case only the
+    reduced image is kept. The panel asks for the scale of its zoom, or
+    100% at zoom over 100%, and for 100% when it needs every pixel;
+
+  * keeps decoded QImages, keyed by (name, percent), in an LRU (below)
+    bounded by their total size in bytes, CACHE_BYTES;
+
+  * decodes images on a small thread pool when asked to prefetch them.
+    QImage (unlike QPixmap) may be made on any thread. Completed loads are
+    moved into the cache only on the calling (GUI) thread, so the cache
+    itself needs no lock.
+
+The interface is:
+
+    path(name)      the full path to the image file for name, or None.
+
+    names()         a sorted list of the names of all images in the folder.
+
+    get(name, pct=100) the QImage for name at pct percent. If it is
+                    cached that is a hit; if it is being prefetched, wait
+                    for it (also a hit); else load it now, a miss. A null
+                    QImage is returned when there is no such file or it
+                    cannot be read.
+
+    prefetch(names, pct=100) start loading, in the background, each name
+                    in the list that is not cached or already loading.
+
+    close()         stop the loader threads and the folder watcher.
+
+    FolderChanged   a signal emitted when the folder has changed, after
+                    the index has been rebuilt and the cache emptied.
+
+    stats()         a dict of counters: hits, misses, prefetches, the
+                    number of cached images and their total bytes.
+
+The hits and misses are also public members for a quick look.
+
+Class LRU is a dict of items in least- to most-recently used order, bounded
+by the total of their sizes. The Images panel uses one to keep the scaled
+QPixmaps it displays.
+
+Class ThumbnailCache makes and keeps small images of the pages for the
+thumbnail strip of the Images panel. See its comments below.
+
+The module also offers text_box(image), which finds the rectangle of
+print in a page image, for the zoom-to-width and zoom-to-height buttons,
+and analyze_image(image) and analyze_file(path) which add to that a guess
+at whether the page is blank.
+'''
+import collections
+import concurrent.futures
+import hashlib
+import multiprocessing
+import os
+import regex
+
+from PyQt6.QtCore import (
+    Qt,
+    QDir,
+    QFileSystemWatcher,
+    QObject,
+    QSize,
+    QStandardPaths,
+    QTimer,
+    pyqtSignal
+)
+from PyQt6.QtGui import QImage, QImageReader
+
+import logging
+imagecache_logger = logging.getLogger(name='imagecache')
+
+'''
+Limits as module constants (they affect only this module, so not placed
+in constants.py). A typical scan at 8 bits per pixel is a few megabytes.
+'''
+CACHE_BYTES = 256 * 1024 * 1024
+LOADER_THREADS = 2
+SUFFIXES = ('.png', '.jpg')
+
+'''
+A dict whose items are kept in order of use, and whose total size is kept
+under a limit by dropping the least-recently used items. The size of an
+item is found by calling size_of(item). The most recent item is kept even
+if it alone is over the limit.
+'''
+class LRU(object):
+    def __init__(self, limit, size_of):
+        self.limit = limit
+        self.size_of = size_of
+        self.items = collections.OrderedDict()
+        self.size = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key):
+        if key in self.items :
+            self.items.move_to_end(key)
+            return self.items[key]
+        return None
+
+    def put(self, key, item):
+        if key in self.items :
+            self.size -= self.size_of( self.items.pop(key) )
+        self.items[key] = item
+        self.size += self.size_of(item)
+        while self.size > self.limit and len(self.items) > 1 :
+            (old_key, old_item) = self.items.popitem(last=False)
+            self.size -= self.size_of(old_item)
+
+    def clear(self):
+        self.items.clear()
+        self.size = 0
+
+'''
+Decode one image file at pct percent of full size. Called on a pool thread,
+so it touches nothing but its arguments.
+'''
+def _load(path, pct):
+    reader = QImageReader(path)
+    if pct < 100 :
+        size = reader.size()
+        if size.isValid() :
+            reader.setScaledSize( size * (pct / 100) )
+    return reader.read()
+
+class ImageCache(QObject):
+    ''' Signal emitted after the folder changes and the cache is emptied '''
+    FolderChanged = pyqtSignal()
+
+    def __init__(self, folder_path, parent=None):
+        super().__init__(parent)
+        self.folder_path = folder_path
+        self.hits = 0
+        self.misses = 0
+        self.prefetches = 0
+        ''' {(name,pct):QImage} in least- to most-recently used order '''
+        self.images = LRU( CACHE_BYTES, QImage.sizeInBytes )
+        ''' {(name,pct):Future} of loads not yet moved into images '''
+        self.pending = {}
+        self.pool = concurrent.futures.ThreadPoolExecutor( LOADER_THREADS )
+        self.name_index = {}
+        self._index_folder()
+        self.watcher = QFileSystemWatcher( [folder_path] )
+        self.watcher.directoryChanged.connect( self._folder_changed )
+
+    '''
+    List the folder into name_index. Go through the suffixes in reverse
+    order of preference so that name.png replaces name.jpg.
+    '''
+    def _index_folder(self):
+        folder = QDir( self.folder_path )
+        self.name_index = {}
+        for suffix in reversed(SUFFIXES) :
+            for f_name in folder.entryList( ['*' + suffix], QDir.Filter.Files ) :
+                self.name_index[ f_name[:-len(suffix)] ] = folder.absoluteFilePath( f_name )
+
+    '''
+    Slot for the watcher's directoryChanged signal. Index the folder again,
+    and since any file may have been replaced, forget what we have loaded.
+    Loads still running will be discarded when they finish.
+    '''
+    def _folder_changed(self, path):
+        imagecache_logger.info( 'Image folder {} changed, re-indexing'.format(path) )
+        self._index_folder()
+        self.images.clear()
+        for future in self.pending.values() :
+            future.cancel()
+        self.pending = {}
+        self.FolderChanged.emit()
+
+    def path(self, name):
+        return self.name_index.get(name, None)
+
+    def names(self):
+        return sorted( self.name_index.keys() )
+
+    '''
+    Move finished prefetches into the cache.
+    '''
+    def _harvest(self):
+        for key in [ key for (key, future) in self.pending.items() if future.done() ] :
+            future = self.pending.pop(key)
+            if not future.cancelled() :
+                self.images.put( key, future.result() )
+
+    def get(self, name, pct=100):
+        self._harvest()
+        key = (name, pct)
+        image = self.images.get(key)
+        if image is not None :
+            self.hits += 1
+            return image
+        path = self.path(name)
+        if path is None :
+            return QImage()
+        if key in self.pending :
+            self.hits += 1
+            image = self.pending.pop(key).result()
+        else :
+            self.misses += 1
+            image = _load(path, pct)
+        self.images.put(key, image)
+        return image
+
+    def prefetch(self, names, pct=100):
+        self._harvest()
+        for name in names :
+            key = (name, pct)
+            if key in self.images or key in self.pending :
+                continue
+            path = self.path(name)
+            if path is not None :
+                self.prefetches += 1
+                self.pending[key] = self.pool.submit( _load, path, pct )
+
+    '''
+    Stop watching and loading, when the book loses its images or closes.
+    '''
+    def close(self):
+        self.watcher.directoryChanged.disconnect( self._folder_changed )
+        self.pool.shutdown( wait=False, cancel_futures=True )
+        self.pending = {}
+
+    def stats(self):
+        return { 'hits' : self.hits,
+                 'misses' : self.misses,
+                 'prefetches' : self.prefetches,
+                 'images' : len(self.images),
+                 'bytes' : self.images.size }
+
+'''
+Thumbnails of page images, for the thumbnail strip in the Images panel.
+
+Thumbnails are PNG files of height THUMB_HEIGHT, kept in a cache folder per
+image folder. The cache folder is in the user's cache location (for example
+~/.cache/PGDP/PPQT2 on Linux) under thumbnails/, named by a hash of the
+absolute path to the image folder. Each thumbnail file is named for its
+image and the modification time of the image file, name.mtime.png, so a
+replaced scan gets a new thumbnail. When the cache is made, files in the
+cache folder that match no current image file are deleted.
+
+Thumbnails not found on disk are made by make_thumbnail() on a pool of
+worker processes, started when first needed with the "spawn" method (see
+ImageDisplay.analyze_all()). A QTimer polls the pending work; as each
+thumbnail is finished it is read and ThumbnailReady(name) is emitted.
+
+The interface is:
+
+    get(name)       the QImage thumbnail of name if there is one in memory
+                    or on disk, else None, after starting to make one.
+
+    close()         stop the worker processes and the timer.
+
+    ThumbnailReady(name)  signal that get(name) will now return an image.
+'''
+THUMB_HEIGHT = 96
+THUMB_POLL_MS = 100
+
+def make_thumbnail(image_path, thumb_path):
+    reader = QImageReader(image_path)
+    size = reader.size()
+    if size.isValid() and size.height() > THUMB_HEIGHT :
+        reader.setScaledSize( size * (THUMB_HEIGHT / size.height()) )
+    image = reader.read()
+    if image.isNull() or not image.save(thumb_path) :
+        return False
+    return True
+
+class ThumbnailCache(QObject):
+    ThumbnailReady = pyqtSignal(str)
+
+    def __init__(self, image_cache, parent=None):
+        super().__init__(parent)
+        self.image_cache = image_cache
+        self.image_cache.FolderChanged.connect( self._folder_changed )
+        folder_hash = hashlib.sha1( image_cache.folder_path.encode('UTF-8') ).hexdigest()
+        self.thumb_dir = os.path.join(
+            QStandardPaths.writableLocation( QStandardPaths.StandardLocation.CacheLocation ),
+            'thumbnails', folder_hash[:16] )
+        os.makedirs( self.thumb_dir, exist_ok=True )
+        ''' {name:QImage} of thumbnails read from disk '''
+        self.thumbs = dict()
+        ''' {name:(Future,thumb_path)} of thumbnails being made '''
+        self.pending = dict()
+        ''' names of images that could not be made into thumbnails '''
+        self.failed = set()
+        self.pool = None
+        self.timer = QTimer(self)
+        self.timer.setInterval( THUMB_POLL_MS )
+        self.timer.timeout.connect( self._harvest )
+        self._clean_dir()
+
+    '''
+    The name of the thumbnail file for an image, or None if there is no
+    such image (or it vanished since the folder was indexed).
+    '''
+    def _thumb_path(self, name):
+        path = self.image_cache.path(name)
+        if path is None :
+            return None
+        try :
+            mtime = os.stat(path).st_mtime_ns
+        except OSError :
+            return None
+        return os.path.join( self.thumb_dir, '{}.{}.png'.format(name, mtime) )
+
+    def _clean_dir(self):
+        current = set( os.path.basename( self._thumb_path(name) or '' )
+                       for name in self.image_cache.names() )
+        for f_name in os.listdir( self.thumb_dir ) :
+            if f_name not in current :
+                try :
+                    os.remove( os.path.join( self.thumb_dir, f_name ) )
+                except OSError :
+                    pass
+
+    def _folder_changed(self):
+        self.thumbs = dict()
+        self.failed = set()
+
+    def get(self, name):
+        if name in self.thumbs :
+            return self.thumbs[name]
+        thumb_path = self._thumb_path(name)
+        if thumb_path is None :
+            return None
+        if os.path.exists(thumb_path) :
+            image = QImage(thumb_path)
+            if not image.isNull() :
+                self.thumbs[name] = image
+                return image
+        if name not in self.pending and name not in self.failed :
+            if self.pool is None :
+                self.pool = concurrent.futures.ProcessPoolExecutor(
+                    mp_context=multiprocessing.get_context('spawn') )
+            self.pending[name] = ( self.pool.submit(
+                make_thumbnail, self.image_cache.path(name), thumb_path ), thumb_path )
+            self.timer.start()
+        return None
+
+    def _harvest(self):
+        for name in [ name for (name, (future, thumb_path)) in self.pending.items() if future.done() ] :
+            (future, thumb_path) = self.pending.pop(name)
+            if future.cancelled() or future.exception() is not None or not future.result() :
+                imagecache_logger.error( 'Could not make thumbnail for {}'.format(name) )
+                self.failed.add(name)
+                continue
+            image = QImage(thumb_path)
+            if not image.isNull() :
+                self.thumbs[name] = image
+                self.ThumbnailReady.emit(name)
+        if not self.pending :
+            self.timer.stop()
+
+    def close(self):
+        self.timer.stop()
+        if self.pool is not None :
+            self.pool.shutdown( wait=False, cancel_futures=True )
+        self.pending = dict()
+
+'''
+Find the box of dark pixels in a page image, ignoring the white margins.
+
+White pixels are 255 or nearly, black pixels are 0 or nearly. What we look
+for is a 3-px window of adjacent pixels in a row that sum to less than 24.
+This skips tiny noise freckles that are common in scanned page images.
+
+The image is scaled to 1/4 size (1/16 the pixel count) and converted by Qt
+to 8-bit grayscale, one byte per pixel; then the pixel data is copied out as
+one bytes value, and a reversed copy is made. Rather than looping over
+pixels in Python, we let a regex search for the first spot where three
+pixels in a row are each less than 24, a necessary condition for a dark
+trio. Only the rare candidate that fails the exact sum test, or that runs
+off the end of a scan line, costs a trip around the loop in _find_trio().
+
+  * The top row is the row of the first dark trio in the pixels, and the
+    bottom row that of the first dark trio in the reversed pixels.
+
+  * For each row from top to bottom, search only the part of the row to
+    the left of the narrowest left margin so far, and in the reversed copy,
+    only the part to the right of the right margin so far. Once the margins
+    are established each search is short, and all of them run in C.
+
+Return a tuple (left, top, right, bottom) in pixels of the full-size
+image, or None if the image is null or has no dark trio at all.
+'''
+SCALE_FACTOR = 4
+RE_DARK_TRIO = regex.compile( b'[\\x00-\\x17]{3}' )
+
+'''
+Return the index of the first dark trio in pixels[pos:endpos] that lies
+within one scan line, or None. Scan lines are stride bytes apart and the
+first cols of them are pixels, the rest padding; in the reversed copy the
+padding comes first.
+'''
+def _find_trio(pixels, pos, endpos, stride, cols, reverse=False):
+    skip = (stride - cols) if reverse else 0
+    match = RE_DARK_TRIO.search(pixels, pos, endpos)
+    while match :
+        p = match.start()
+        if ( skip <= (p % stride) <= (skip + cols - 3) ) \
+           and (pixels[p] + pixels[p+1] + pixels[p+2]) < 24 :
+            return p
+        # Not a trio: try again one pixel on, as trios may overlap.
+        match = RE_DARK_TRIO.search(pixels, p+1, endpos)
+    return None
+
+def text_box(image):
+    if image.isNull() :
+        return None
+    work_image = image.scaled(
+        QSize(int(image.width()/SCALE_FACTOR),int(image.height()/SCALE_FACTOR)),
+        Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.FastTransformation)
+    work_image = work_image.convertToFormat(QImage.Format.Format_Grayscale8)
+    rows = work_image.height() # number of pixels high
+    cols = work_image.width() # number of pixels across
+    stride = work_image.bytesPerLine() # scan-line width in bytes
+    size = stride * rows
+    pixels = work_image.constBits().asstring( size )
+    reversed_pixels = pixels[::-1]
+    p = _find_trio( pixels, 0, size, stride, cols )
+    if p is None :
+        return None # all white
+    top = p // stride
+    bottom = rows - 1 - ( _find_trio( reversed_pixels, 0, size, stride, cols, True ) // stride )
+    left = cols
+    right = -1
+    for r in range(top, bottom+1) :
+        row_start = r * stride
+        p = _find_trio( pixels, row_start, row_start + left + 2, stride, cols )
+        if p is not None :
+            left = p - row_start
+        # this row's pixels end at cols-1, its reversed pixels start there
+        row_start = size - row_start - cols
+        p = _find_trio( reversed_pixels, row_start, row_start + cols - right + 1,
+                        stride, cols, True )
+        if p is not None :
+            right = cols - 1 - (p - row_start)
+    return ( left*SCALE_FACTOR, top*SCALE_FACTOR,
+             right*SCALE_FACTOR, bottom*SCALE_FACTOR )
+
+'''
+Analysis of one page image for the Analyze button of the Images panel.
+Return [box, blank], where box is the text_box() of the image as a list, or
+None if there was no dark trio at all; and blank is True when there was no
+box, or the box covers less than BLANK_AREA of the page, as when a blank
+leaf carries only a library stamp or a stray mark. Return None if the image
+is null, i.e. the file could not be read.
+
+analyze_file() is what runs in the worker processes; it is given a path so
+that only a short string, and not an image, crosses between processes.
+'''
+BLANK_AREA = 0.02
+
+def analyze_image(image):
+    if image.isNull() :
+        return None
+    box = text_box(image)
+    if box is None :
+        return [None, True]
+    (left, top, right, bottom) = box
+    area = (right - left) * (bottom - top)
+    return [ list(box), area < BLANK_AREA * image.width() * image.height() ]
+
+def analyze_file(path):
+    return analyze_image( QImage(path) )
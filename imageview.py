@@ -29,7 +29,7 @@ edit cursor is on. Support paging, zooming and scrolling the image.
 The Book creates an ImageView object as part of its own initialization
 before it is called to load a book. So on creation we set up for the
 "no-image" condition, displaying a gray image and disabling all controls.
-We register reader/writer functions for two metadata sections.
+We register reader/writer functions for three metadata sections.
 
 The Book is also responsible for linking the editor's cursorMoved signal
 to our cursor_move() method.
@@ -57,24 +57,40 @@ We intercept keystrokes and process them as follows:
   page up:    go to the next-lower page index
   page down:  go to the next-higher page index
 
+The Analyze button runs the text-box analysis of imagecache.py over every
+image in the folder, on a pool of worker processes, and keeps the results
+in self.analysis, which is saved in the IMAGEANALYSIS metadata section.
+Zoom-to-width and to-height then take the box of the current page from
+there. The Pages panel asks is_blank() to mark pages whose scans seem to
+be blank.
+
+Below the image is a strip of thumbnails of the pages around the current
+one; clicking one shows that page and moves the edit cursor to it. The
+thumbnails come from an imagecache.ThumbnailCache, which keeps them on disk.
 '''
 import constants as C
 import metadata
 import pagedata
+import imagecache
 import resources # for hand icons
 import math # for isnan() only
+import concurrent.futures
+import multiprocessing
+import utilities
 
 from PyQt6.QtCore import (
     Qt,
     QDir,
     QCoreApplication,
-    QSize
+    QSize,
+    pyqtSignal
 )
 _TR = QCoreApplication.translate
 
 from PyQt6.QtWidgets import (
     QHBoxLayout,
     QLabel,
+    QListView, QListWidget, QListWidgetItem,
     QAbstractScrollArea, QScrollArea,
     QSizePolicy,
     QPushButton,
@@ -87,7 +103,6 @@ from PyQt6.QtGui import (
     QColor,
     QFontMetrics,
     QIcon,
-    QImage,
     QPixmap,
     QPalette
 )
@@ -101,14 +116,47 @@ only this module, so not placed in constants.py).
 ZOOM_FACTOR_MIN = 0.15
 ZOOM_FACTOR_MAX = 2.0
 
+'''
+How many pages on each side of the displayed one to decode in advance.
+'''
+PREFETCH_PAGES = 3
+
+'''
+Memory limit for the cache of scaled pixmaps, see _show_page().
+'''
+PIXMAP_BYTES = 128 * 1024 * 1024
+
+def _pixmap_bytes(pix_map):
+    return pix_map.width() * pix_map.height() * pix_map.depth() // 8
+
+'''
+How many pages on each side of the current one to show in the thumbnail
+strip, and the width to allow for a thumbnail.
+'''
+STRIP_PAGES = 4
+THUMB_WIDTH = int( 0.75 * imagecache.THUMB_HEIGHT )
+
+'''
+How long analyze_all() waits for a result before letting the GUI run.
+'''
+ANALYSIS_POLL_SECONDS = 0.05
+
 class ImageDisplay(QWidget):
+    ''' Signal emitted when self.analysis is loaded or refilled '''
+    AnalysisUpdated = pyqtSignal()
+
     def __init__(self, my_book, parent=None):
         super().__init__(parent)
         self.my_book = my_book
         ''' register metadata readers and writers '''
-        md = my_book.get_meta_manager()
-        md.register(C.MD_IZ,self._zoom_read,self._zoom_write)
-        md.register(C.MD_IX,self._link_read,self._link_write)
+        self.metamgr = my_book.get_meta_manager()
+        self.metamgr.register(C.MD_IZ,self._zoom_read,self._zoom_write)
+        self.metamgr.register(C.MD_IX,self._link_read,self._link_write)
+        self.metamgr.register(C.MD_IA,self._analysis_read,self._analysis_write,tracked=True)
+        ''' {image name : [box, blank]}, see imagecache.analyze_image() '''
+        self.analysis = dict()
+        ''' {(image name, zoom pct) : QPixmap}, see _show_page() '''
+        self.pix_maps = imagecache.LRU( PIXMAP_BYTES, _pixmap_bytes )
         '''
         Create all our widgets including cursor_to_image and image_to_cursor
         pushbuttons
@@ -121,6 +169,8 @@ class ImageDisplay(QWidget):
         self.image_to_cursor.setChecked(False)
         self.zoom_factor = 0.25
         self.png_path = None
+        self.image_cache = None
+        self.thumb_cache = None
         ''' disable all widgetry until we get some metadata '''
         self._disable()
         # end of __init__()
@@ -129,13 +179,24 @@ class ImageDisplay(QWidget):
     def _disable(self):
         self.no_image = True
         self.last_index = None # compares unequal to anything
+        self.last_shown = None # (last_index, zoom pct)
+        self.image_name = None # name of the image displayed, if any
+        self.pix_maps.clear()
+        if self.image_cache is not None :
+            self.image_cache.close()
+        self.image_cache = None
+        if self.thumb_cache is not None :
+            self.thumb_cache.close()
+        self.thumb_cache = None
+        self.thumb_strip.clear()
+        self.thumb_strip.setVisible(False)
         self.pix_map = QPixmap()
-        self.image = QImage()
         self.cursor_to_image.setEnabled(False)
         self.image_to_cursor.setEnabled(False)
         self.zoom_pct.setEnabled(False)
         self.zoom_to_width.setEnabled(False)
         self.zoom_to_height.setEnabled(False)
+        self.analyze_button.setEnabled(False)
         self.image_display.setPixmap(self.gray_image)
         self.image_display.setToolTip(
             _TR('Image view tooltip',
@@ -154,6 +215,8 @@ class ImageDisplay(QWidget):
         self.image_to_cursor.setEnabled(True)
         self.zoom_to_width.setEnabled(True)
         self.zoom_to_height.setEnabled(True)
+        self.analyze_button.setEnabled(True)
+        self.thumb_strip.setVisible(True)
         self.image_display.setToolTip('')
         #self.image_display.setToolTip(
             #_TR('Image view tooltip',
@@ -202,13 +265,38 @@ class ImageDisplay(QWidget):
     def _link_write(self, section):
         return [self.cursor_to_image.isChecked(), self.image_to_cursor.isChecked()]
 
+    '''
+    Metadata: read or write the page image analysis as a dict of
+    {image name : [box, blank]} where box is null or a list of four ints
+    (left, top, right, bottom) and blank is true or false. On input, check
+    each entry and drop any that has been meddled with.
+    '''
+    def _analysis_read(self, section, value, version):
+        self.analysis = dict()
+        if not isinstance(value, dict) :
+            imageview_logger.error('Invalid IMAGEANALYSIS section ignored')
+            value = dict()
+        for (im_name, entry) in value.items() :
+            try:
+                (box, blank) = entry
+                if box is not None :
+                    if not ( len(box) == 4 and all( isinstance(v, int) for v in box ) ) :
+                        raise ValueError
+                self.analysis[im_name] = [box, bool(blank)]
+            except (TypeError, ValueError) :
+                imageview_logger.error('Invalid IMAGEANALYSIS entry for {} ignored'.format(im_name))
+        self.AnalysisUpdated.emit()
+
+    def _analysis_write(self, section):
+        return self.analysis
+
     '''
     The Book calls here after it has loaded a book which it is sure has
     defined page data, passing the path to the folder containing the book. If
     we can find a folder named 'pngs' or one named 'images' we record that
-    path as self.png_dir. Having what looks like a folder of page images,
-    enable our widgets, and fake a cursorMoved signal to display the current
-    edit page.
+    path as self.png_dir, and make an ImageCache to index and load its files.
+    Having what looks like a folder of page images, enable our widgets, and
+    fake a cursorMoved signal to display the current edit page.
     
     There is no guarantee that this folder contains all, or indeed any, of
     the page images. But when it is time to display, see _show_page(), that
@@ -222,6 +310,11 @@ class ImageDisplay(QWidget):
         if folder_name :
             self.png_dir = QDir(book_dir.absoluteFilePath(folder_name))
             self._enable()
+            self.image_cache = imagecache.ImageCache(
+                self.png_dir.absolutePath(), self )
+            self.image_cache.FolderChanged.connect( self._folder_changed )
+            self.thumb_cache = imagecache.ThumbnailCache( self.image_cache, self )
+            self.thumb_cache.ThumbnailReady.connect( self._thumb_ready )
             self.cursor_move()
 
     '''
@@ -239,39 +332,120 @@ class ImageDisplay(QWidget):
     * greater than page_data.page_count() on a Page-Down keystroke.
       Display the last available page.
     
-    If different from last_index, try to load the .png file for that
-    page. If that fails, use the gray image. Otherwise display that
-    page and save it as last_index.
+    The pixmap displayed is made at the size for the current zoom, so that
+    the QLabel does not have to scale it on every paint. Pixmaps are kept
+    in self.pix_maps by image name and zoom percent, so returning to a page
+    or zoom seen recently costs no image work. When the page and zoom are
+    those last shown, as they are on most cursor moves, there is nothing to
+    do at all.
+    
+    Otherwise, get the image for that page from the image cache, decoded
+    at the zoom percent (at 100% when zooming in, then smoothly scaled up).
+    If that fails, use the gray image. Then ask the cache to start loading
+    the PREFETCH_PAGES pages on either side at the same percent, nearest
+    first, so that paging up or down finds them already decoded.
     '''
     def _show_page(self, page_index):
+        pct = int( round( 100 * self.zoom_factor ) )
+        if (page_index, pct) == self.last_shown :
+            return
+        self.last_shown = (page_index, pct)
         if page_index != self.last_index :
-            ''' Change of page. Note new page. '''
-            self.last_index = page_index
-            ''' Ask the page data model for its filename '''
-            self.pix_map = self.gray_image # assume failure...
-            im_name = self.page_data.filename(page_index)
-            if im_name :
+            self._fill_strip(page_index)
+        self.last_index = page_index
+        self.image_name = None
+        self.pix_map = self.gray_image # assume failure...
+        ''' Ask the page data model for its filename '''
+        im_name = self.page_data.filename(page_index)
+        if im_name :
+            pix_map = self.pix_maps.get( (im_name, pct) )
+            if pix_map is None :
                 '''
                 pagedata has a filename; of course there is no guarantee
-                such a file exists now or ever did. Use the QDir to look for
-                the file as .png or .jpg.
+                such a file exists now or ever did. The cache knows which
+                .png or .jpg files are in the folder, and returns a null
+                QImage when there is none or it can't be read.
                 '''
-                f_name = im_name + '.png'
-                if not self.png_dir.exists( f_name ) :
-                    f_name = im_name + '.jpg'
-                if self.png_dir.exists(f_name) :
-                    ''' file exists, try to load it as a QImage '''
-                    self.image = QImage(self.png_dir.absoluteFilePath(f_name))
-                    if not self.image.isNull():
-                        ''' we loaded it; make a full-scale pixmap for display '''
-                        self.pix_map = QPixmap.fromImage(self.image,Qt.ImageConversionFlag.ColorOnly)
-        '''
-        Whether or not the page changed, rescale the pixmap to the current
-        zoom. The .resize method takes a QSize; pix_map.size() returns one,
-        and QSize supports being multiplied by a real.
-        '''
+                image = self.image_cache.get( im_name, min(pct, 100) )
+                if not image.isNull():
+                    ''' we loaded it; make a pixmap at display size '''
+                    if pct > 100 :
+                        image = image.scaled( image.size() * (pct / 100),
+                                    Qt.AspectRatioMode.IgnoreAspectRatio,
+                                    Qt.TransformationMode.SmoothTransformation )
+                    pix_map = QPixmap.fromImage(image,Qt.ImageConversionFlag.ColorOnly)
+                    self.pix_maps.put( (im_name, pct), pix_map )
+            if pix_map is not None :
+                self.pix_map = pix_map
+                self.image_name = im_name
+            self._prefetch( page_index, min(pct, 100) )
         self.image_display.setPixmap(self.pix_map)
-        self.image_display.resize( self.zoom_factor * self.pix_map.size() )
+        if self.image_name :
+            self.image_display.resize( self.pix_map.size() )
+        else :
+            '''
+            The gray image is scaled to the zoom. The .resize method takes a
+            QSize; pix_map.size() returns one, and QSize supports being
+            multiplied by a real.
+            '''
+            self.image_display.resize( self.zoom_factor * self.pix_map.size() )
+
+    '''
+    Fill the thumbnail strip with the pages around page_index, and select
+    and center the current one. Thumbnails not yet made show as a gray
+    placeholder until _thumb_ready() gets them. Each item's UserRole data
+    is its page index, for _thumb_clicked().
+    '''
+    def _fill_strip(self, page_index):
+        self.thumb_strip.clear()
+        if page_index is None or not ( 0 <= page_index < self.page_data.page_count() ) :
+            return
+        lo = max( 0, page_index - STRIP_PAGES )
+        hi = min( self.page_data.page_count(), page_index + STRIP_PAGES + 1 )
+        for ix in range(lo, hi) :
+            im_name = self.page_data.filename(ix)
+            item = QListWidgetItem( im_name )
+            item.setData( Qt.ItemDataRole.UserRole, ix )
+            thumb = self.thumb_cache.get(im_name)
+            item.setIcon( QIcon( QPixmap.fromImage(thumb) if thumb else self.gray_thumb ) )
+            self.thumb_strip.addItem(item)
+            if ix == page_index :
+                self.thumb_strip.setCurrentItem(item)
+        self.thumb_strip.scrollToItem( self.thumb_strip.currentItem(),
+                                       QListView.ScrollHint.PositionAtCenter )
+
+    def _thumb_ready(self, im_name):
+        thumb = self.thumb_cache.get(im_name)
+        for item in self.thumb_strip.findItems( im_name, Qt.MatchFlag.MatchExactly ) :
+            item.setIcon( QIcon( QPixmap.fromImage(thumb) ) )
+
+    '''
+    Slot for a click on a thumbnail: show that page, and move the edit
+    cursor to the start of it.
+    '''
+    def _thumb_clicked(self, item):
+        ix = item.data( Qt.ItemDataRole.UserRole )
+        self._show_page(ix)
+        self.edit_view.show_position( self.page_data.position(ix) )
+
+    '''
+    Slot for the FolderChanged signal of the image cache: some image files
+    were added, removed or replaced. Forget our pixmaps and show the current
+    page again.
+    '''
+    def _folder_changed(self):
+        self.pix_maps.clear()
+        self.last_shown = None
+        self._fill_strip(self.last_index)
+        self._show_page(self.last_index)
+
+    def _prefetch(self, page_index, pct):
+        names = []
+        for d in range(1, PREFETCH_PAGES+1) :
+            for ix in (page_index + d, page_index - d) :
+                if 0 <= ix < self.page_data.page_count() :
+                    names.append( self.page_data.filename(ix) )
+        self.image_cache.prefetch(names, pct)
 
     '''
     Slot to receive the cursorMoved signal from the editview widget. This is
@@ -350,88 +524,34 @@ class ImageDisplay(QWidget):
     '''
     Zoom to width and zoom to height are basically the same thing:
     
-    1. Using the QImage of the current page in self.image,
-       scan its pixels to find the width (height) of the nonwhite area.
-    2. Get the ratio of that to our image label's viewport width (height).
+    1. Get the box of nonwhite pixels of the current page; see text_box()
+       in imagecache.py for how that is found.
+    2. Get the ratio of its width (height) to our image label's viewport
+       width (height).
     3. Set that ratio as the zoom factor and redraw the image.
-    5. Set the scroll position(s) of our scroll area to left-justify the text.
-    
-    We get access to the pixel data using QImage.bits() which gives us a
-    "sip.voidptr" object that we can index to get byte values.
+    4. Set the scroll position(s) of our scroll area to left-justify the text.
     
-    TODO: finish editing comments on this section after verifying it works
-    and understanding WTF it is really doing.
+    Finding the box means looking at every pixel of the full-size image.
+    Once a page has been analyzed, by the Analyze button or by an earlier
+    zoom, its box is taken from self.analysis and the pixels are not looked
+    at again.
     '''
+    def _text_box(self):
+        if self.image_name not in self.analysis :
+            result = imagecache.analyze_image( self.image_cache.get(self.image_name) )
+            if result is None :
+                return None
+            self.analysis[self.image_name] = result
+            self.metamgr.mark_dirty(C.MD_IA)
+        return self.analysis[self.image_name][0]
+
     def _zoom_to_width(self):
-        '''
-        Generic loop to scan from the left or right edge of one column,
-        inward until a dark pixel is seen, and return that margin.
-        
-        White pixels are 255 or nearly, black pixels are 0 or nearly. What we
-        actually do is move a 3-px window along looking for 3 adjacent pixels
-        that sum to less than 24. This skips tiny noise freckles that
-        are common in scanned page images.        
-        '''
-        def inner_loop(row_range, col_start, margin, col_step):
-            pa, pb = 255, 255 # virtual white outside column
-            for row in row_range:
-                for col in range(col_start, margin, col_step):
-                    pc = color_table[ bytes_ptr[row+col] ]
-                    if (pa + pb + pc) < 24 : # black or dark gray trio
-                        margin = col # new, narrower, margin
-                        break # no need to look further on this row
-                    pa, pb = pb, pc # else shift 3-pixel window
-            return margin - (2*col_step) # allow for 3-px window
-
-        if self.no_image or self.image.isNull() :
+        if self.no_image or (self.image_name is None) :
             return # nothing to do
-        scale_factor = 4
-        orig_rows = self.image.height() # number of pixels high
-        orig_cols = self.image.width() # number of logical pixels across
-        # Scale the image to 1/4 size (1/16 the pixel count) and then force
-        # it to indexed-8 format, one byte per pixel.
-        work_image = self.image.scaled(
-            QSize(int(orig_cols/scale_factor),int(orig_rows/scale_factor)),
-            Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.FastTransformation)
-        work_image = work_image.convertToFormat(QImage.Format.Format_Indexed8,Qt.ImageConversionFlag.ColorOnly)
-        # Get a reduced version of the color table by extracting just the GG
-        # values of each entry, as a dict keyed by the pixel byte value. For
-        # PNG-2, this gives [0,255] but it could have 8, 16, even 256 elements.
-        color_table = { bytes([c]): int((work_image.color(c) >> 8) & 255)
-                         for c in range(work_image.colorCount()) }
-        # Establish limits for the inner loop
-        rows = work_image.height() # number of pixels high
-        cols = work_image.width() # number of logical pixels across
-        stride = (cols + 3) & (-4) # scan-line width in bytes
-        bytes_ptr = work_image.bits() # uchar * a_bunch_o_pixels
-        bytes_ptr.setsize(stride * rows) # make the pointer indexable
-
-        # Scan in from left and from right to find the outermost dark spots.
-        # Pages tend to start with many lines of white pixels so in hopes of
-        # establishing a narrow margin quickly, scan from the middle to the
-        # end, then do the top half.
-        left_margin = inner_loop(
-                        range(int(rows/2)*stride, (rows-1)*stride, stride*2),
-                        0, int(cols/2), 1
-        )
-        left_margin = inner_loop(
-                        range(0, int(rows/2)*stride, stride*2),
-                        0, left_margin, 1
-                        )
-        # Now do exactly the same but for the right margin.
-        right_margin = inner_loop(
-                        range(int(rows/2)*stride, (rows-1)*stride, stride*2),
-                        cols-1, int(cols/2), -1
-                        )
-        right_margin = inner_loop(
-                        range(0, int(rows/2)*stride, stride*2),
-                        cols-1, right_margin, -1
-                        )
-        # Adjust the margins by the scale factor to fit the full size image.
-        #left_margin = max(0,left_margin*scale_factor-scale_factor)
-        #right_margin = min(orig_cols,right_margin*scale_factor+scale_factor)
-        left_margin = left_margin*scale_factor
-        right_margin = right_margin*scale_factor
+        box = self._text_box()
+        if box is None :
+            return # all white, nothing to zoom to
+        (left_margin, top_row, right_margin, bottom_row) = box
         text_size = right_margin - left_margin + 2
         port_width = self.scroll_area.viewport().width()
         # Set the new zoom factor, after limiting by min/max values
@@ -443,51 +563,17 @@ class ImageDisplay(QWidget):
         # and that completes zoom-to-width
 
     def _zoom_to_height(self):
-        def dark_row(row_start, cols):
-            '''
-            Scan one row of pixels and return True if it contains
-            at least one 3-pixel blob of darkness, or False if not.
-            '''
-            pa, pb = 255, 255
-            for c in range(row_start,row_start+cols):
-                pc = color_table[ bytes_ptr[c] ]
-                if (pa + pb + pc) < 24 : # black or dark gray trio
-                    return True
-                pa, pb = pb, pc
-            return False # row was all-white-ish
-
-        if self.no_image or self.image.isNull() :
+        if self.no_image or (self.image_name is None) :
             return # nothing to do
-        scale_factor = 4
-        orig_rows = self.image.height() # number of pixels high
-        orig_cols = self.image.width() # number of logical pixels across
-        # Scale the image to 1/4 size (1/16 the pixel count) and then force
-        # it to indexed-8 format, one byte per pixel.
-        work_image = self.image.scaled(
-            QSize(int(orig_cols/scale_factor),int(orig_rows/scale_factor)),
-            Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.FastTransformation)
-        work_image = work_image.convertToFormat(QImage.Format.Format_Indexed8,Qt.ImageConversionFlag.ColorOnly)
-        # Get a reduced version of the color table by extracting just the GG
-        # values of each entry, as a dict keyed by the pixel byte value. For
-        # PNG-2, this gives [0,255] but it could have 8, 16, even 256 elements.
-        color_table = { bytes([c]): int((work_image.color(c) >> 8) & 255)
-                         for c in range(work_image.colorCount()) }
-        rows = work_image.height() # number of pixels high
-        cols = work_image.width() # number of logical pixels across
-        stride = (cols + 3) & (-4) # scan-line width in bytes
-        bytes_ptr = work_image.bits() # uchar * a_bunch_o_pixels
-        bytes_ptr.setsize(stride * rows) # make the pointer indexable
-        # Scan the image rows from the top down looking for one with darkness
-        for top_row in range(rows):
-            if dark_row(top_row*stride, cols): break
-        if top_row > (rows/2) : # too much white, skip it
+        box = self._text_box()
+        if box is None :
+            return # all white, nothing to zoom to
+        (left_margin, top_row, right_margin, bottom_row) = box
+        full_height = self.pix_map.height() * 100 / self.last_shown[1]
+        if top_row > (full_height/2) : # too much white, skip it
             return
-        for bottom_row in range(rows-1, top_row, -1):
-            if dark_row(bottom_row*stride, cols) : break
         # bottom_row has to be >= top_row. if they are too close together
         # set_zoom_real will limit the zoom to 200%.
-        top_row = top_row*scale_factor
-        bottom_row = bottom_row*scale_factor
         text_height = bottom_row - top_row + 1
         port_height = self.scroll_area.viewport().height()
         self._set_zoom_real(port_height/text_height)
@@ -495,6 +581,73 @@ class ImageDisplay(QWidget):
                          int( top_row * self.zoom_factor ) )
         # and that completes zoom-to-height
 
+    '''
+    Slot for the Analyze button. Run imagecache.analyze_file() over every
+    image in the folder. The work is mostly decoding and scanning pixels, so
+    it is spread over a pool of processes, one per CPU. They are started with
+    the "spawn" method (not "fork", which does not mix with Qt's threads),
+    which is why PPQT2.py starts the app only when it is __main__. Results
+    are collected as they arrive, updating a progress bar. Between results
+    we let the GUI run, so the user can click Cancel; then images not yet
+    begun are dropped, and those already analyzed are kept.
+
+    An image that could not be read, or whose analysis failed, gets no
+    entry. When done, tell the Book its metadata has changed, and tell the
+    Pages panel to show blank pages.
+    '''
+    def analyze_all(self):
+        if self.no_image : return
+        names = self.image_cache.names()
+        progress = utilities.make_progress(
+            _TR('Title of image analysis progress bar',
+                'Analyzing page images'), self,
+            _TR('Image analysis progress bar button', 'Cancel') )
+        progress.setMaximum( len(names) )
+        done = 0
+        cancelled = False
+        with concurrent.futures.ProcessPoolExecutor(
+                mp_context=multiprocessing.get_context('spawn') ) as pool :
+            futures = { pool.submit( imagecache.analyze_file, self.image_cache.path(im_name) ) : im_name
+                        for im_name in names }
+            pending = set( futures )
+            while pending :
+                ( finished, pending ) = concurrent.futures.wait(
+                    pending, timeout=ANALYSIS_POLL_SECONDS,
+                    return_when=concurrent.futures.FIRST_COMPLETED )
+                for future in finished :
+                    done += 1
+                    try :
+                        result = future.result()
+                    except Exception as error_object :
+                        imageview_logger.error( 'Analysis of {} failed: {}'.format(
+                            futures[future], str(error_object) ) )
+                        continue
+                    if result is not None :
+                        self.analysis[ futures[future] ] = result
+                progress.setValue( done )
+                QCoreApplication.processEvents()
+                if progress.wasCanceled() and not cancelled :
+                    '''
+                    Drop what has not begun and finish what has. wait() never
+                    counts a future cancelled this way as done, so forget them.
+                    '''
+                    cancelled = True
+                    pool.shutdown( cancel_futures=True )
+                    pending = { future for future in pending if not future.cancelled() }
+        progress.reset()
+        imageview_logger.info( 'Analyzed {} of {} page images'.format( done, len(names) ) )
+        self.metamgr.mark_dirty(C.MD_IA)
+        self.my_book.metadata_modified(True, C.MD_MOD_FLAG)
+        self.AnalysisUpdated.emit()
+
+    '''
+    For the Pages panel: True when the analysis found the image to be blank
+    or nearly so. Pages not analyzed are not blank.
+    '''
+    def is_blank(self, im_name):
+        result = self.analysis.get(im_name, None)
+        return result is not None and result[1]
+
     # Two tiny slots to receive the "toggled(bool)" signal of the grippy
     # hands icons. All we do is swap out the tooltip text to reflect
     # what they are set to do. Note that during __init__ there is a
@@ -542,6 +695,8 @@ class ImageDisplay(QWidget):
         ''' Create a gray field to use when no image is available. '''
         self.gray_image = QPixmap(700,900)
         self.gray_image.fill(QColor("gray"))
+        self.gray_thumb = QPixmap(THUMB_WIDTH, imagecache.THUMB_HEIGHT)
+        self.gray_thumb.fill(QColor("gray"))
 
         '''
         Build the QLabel that displays the image pixmap. It gets all
@@ -644,13 +799,40 @@ class ImageDisplay(QWidget):
         self.zoom_to_height.setMinimumWidth(w)
         self.zoom_to_width.setMinimumWidth(w)
         '''
-        Create an HBox for the top of the panel which contains only
-        the cursor-to-image link button.
+        Create the thumbnail strip, a list of icons in a single row, which
+        does not take the keyboard focus from the panel.
+        '''
+        self.thumb_strip = QListWidget()
+        self.thumb_strip.setViewMode(QListView.ViewMode.IconMode)
+        self.thumb_strip.setFlow(QListView.Flow.LeftToRight)
+        self.thumb_strip.setWrapping(False)
+        self.thumb_strip.setMovement(QListView.Movement.Static)
+        self.thumb_strip.setIconSize(QSize(THUMB_WIDTH, imagecache.THUMB_HEIGHT))
+        self.thumb_strip.setFixedHeight(
+            imagecache.THUMB_HEIGHT + 2 * self.thumb_strip.fontMetrics().height() )
+        self.thumb_strip.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.thumb_strip.itemClicked.connect(self._thumb_clicked)
+        '''
+        Create the Analyze button.
+        '''
+        self.analyze_button = QPushButton(
+            _TR('Imageview analyze button name','Analyze')
+            )
+        self.analyze_button.setToolTip(
+            _TR('Imageview analyze button tooltip',
+                'Find the text area of every page image, and note blank pages.')
+            )
+        self.analyze_button.clicked.connect(self.analyze_all)
+        '''
+        Create an HBox for the top of the panel which contains
+        the cursor-to-image link button at the left and the
+        Analyze button at the right.
         '''
         tophbox = QHBoxLayout()
         tophbox.setContentsMargins(0,0,0,0)
         tophbox.addWidget(self.cursor_to_image,0)
         tophbox.addStretch() # left-align the button
+        tophbox.addWidget(self.analyze_button,0)
         '''
         Create an HBox layout to contain the above controls, using
         spacers left and right to center them and a spacers between
@@ -676,6 +858,7 @@ class ImageDisplay(QWidget):
         vbox.setContentsMargins(0,0,0,0)
         vbox.addLayout(tophbox,0)
         vbox.addWidget(self.scroll_area,2)
+        vbox.addWidget(self.thumb_strip,0)
         vbox.addLayout(zhbox,0)
         self.setLayout(vbox)
         # And that completes the UI setup.
\ No newline at end of file
@@ -0,0 +1,313 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "2.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2013, 2014, 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+
+'''
+                          journal.py
+
+The class defined here keeps an edit journal for one book, so that edits
+made since the last save can be recovered after a crash. Saving the whole
+book is too slow on a big book to do every few seconds; the journal costs
+almost nothing per keystroke.
+
+The journal is a text file beside the book, named book.txt.journal, of one
+JSON value to a line. The first line is a header, either
+
+    {"base": [algorithm, hex digest]}  the journal applies to the saved
+                        text whose DOCHASH is that, see book._write_book();
+
+    {"checkpoint": [algorithm, hex digest], "text": "..."}  the journal
+                        applies to the text given, whose hash is that.
+
+The other lines are records of edits, [position, removed, "inserted text"],
+exactly as reported by the document's contentsChange signal, with the text
+that was inserted. After each batch of records is a line {"length": n}
+giving the length of the text after that batch.
+
+Recording an edit on the GUI thread is no more than appending a tuple to a
+list. Every FLUSH_MS a QTimer hands the records not yet written to the one
+WRITER thread, which encodes them and appends them to the file. After
+COMPACT_RECORDS records the journal is compacted: the whole journal is
+replaced by a checkpoint of the current text.
+
+When a save begins, Book.save_book() calls mark(path), and when it
+succeeds, restart(mark, base). The journal is then rewritten with a base
+header for the newly saved text, followed by the records of any edits made
+while the save was being written. A save to a new path (Save As) moves the
+journal there only when it succeeds, deleting the journal of the old path,
+which no longer has edits to recover; until then, and after a failed save,
+the journal stays with the book it was. When the user closes the book, saved or
+not, close() deletes the journal. So a journal is found at File>Open only
+after a crash, and then read_journal() replays it: over the saved text if
+its base matches the DOCHASH of the book just opened, or over its
+checkpoint text if the hash of that is right. Records are applied a batch
+at a time, and the text after each batch must have the length recorded for
+it; a batch torn by the crash is dropped.
+
+The interface is:
+
+    Journal(document)   a journal of edits to document, not yet recording.
+
+    start(path, base)   begin a journal for the book opened from path,
+                        whose text has the hash base, (algorithm, digest).
+
+    mark(path)          note that a save to path has begun, return a mark.
+
+    restart(mark, base) the save that returned mark succeeded and the saved
+                        text has the hash base.
+
+    forget(mark)        the save that returned mark failed.
+
+    close()             stop recording and delete the journal.
+
+    read_journal(path, base_text, base) the text after replaying the
+                        journal at path, or None if there is nothing
+                        usable to replay.
+'''
+import concurrent.futures
+import hashlib
+import json
+import os
+
+from PyQt6.QtCore import QObject, QTimer
+from PyQt6.QtGui import QTextCursor
+
+import constants as C
+import logging
+journal_logger = logging.getLogger(name='journal')
+
+FLUSH_MS = 2000
+COMPACT_RECORDS = 5000
+WRITER = concurrent.futures.ThreadPoolExecutor( 1 )
+
+'''
+The functions run on the WRITER thread. Errors are logged, not raised:
+the journal is a safety net and its failure must not disturb editing.
+'''
+def _encode(records, length):
+    lines = [ json.dumps(record) for record in records ]
+    lines.append( json.dumps( { 'length' : length } ) )
+    return '\n'.join(lines) + '\n'
+
+def _append(path, records, length):
+    try :
+        with open( path, 'a', encoding='UTF-8' ) as journal_file :
+            journal_file.write( _encode(records, length) )
+            journal_file.flush()
+            os.fsync( journal_file.fileno() )
+    except OSError as error_object :
+        journal_logger.error( 'Cannot append to journal {}: {}'.format(path, str(error_object)) )
+
+def _rewrite(path, header, records, length):
+    temp_path = path + '.tmp'
+    try :
+        with open( temp_path, 'w', encoding='UTF-8' ) as journal_file :
+            journal_file.write( json.dumps(header) + '\n' )
+            journal_file.write( _encode(records, length) )
+            journal_file.flush()
+            os.fsync( journal_file.fileno() )
+        os.replace( temp_path, path )
+    except OSError as error_object :
+        journal_logger.error( 'Cannot write journal {}: {}'.format(path, str(error_object)) )
+
+def _checkpoint(path, text, hash_name):
+    digest = hashlib.new( hash_name, text.encode('UTF-8') ).hexdigest()
+    _rewrite( path, { 'checkpoint' : [hash_name, digest], 'text' : text }, [], len(text) )
+
+def _remove(path):
+    try :
+        os.remove( path )
+    except FileNotFoundError :
+        pass
+    except OSError as error_object :
+        journal_logger.error( 'Cannot delete journal {}: {}'.format(path, str(error_object)) )
+
+'''
+Replay the journal at path, given the text of the book as opened and its
+hash base, (algorithm, digest bytes). Return the text as it was after the
+last complete batch of records, or None if there is no journal, or it does
+not apply to this text, or it records no edits.
+'''
+def read_journal(path, base_text, base):
+    try :
+        with open( path, 'r', encoding='UTF-8' ) as journal_file :
+            lines = journal_file.read().split('\n')
+        header = json.loads( lines[0] )
+        if 'base' in header :
+            if header['base'] != [ base[0], base[1].hex() ] :
+                journal_logger.info( 'Journal {} is for another version of the book'.format(path) )
+                return None
+            text = base_text
+        else :
+            (hash_name, digest) = header['checkpoint']
+            text = header['text']
+            if hashlib.new( hash_name, text.encode('UTF-8') ).hexdigest() != digest :
+                journal_logger.error( 'Journal {} checkpoint is damaged'.format(path) )
+                return None
+    except (OSError, ValueError, KeyError, TypeError) as error_object :
+        if not isinstance(error_object, FileNotFoundError) :
+            journal_logger.error( 'Cannot read journal {}: {}'.format(path, str(error_object)) )
+        return None
+    good_text = text
+    for line in lines[1:] :
+        try :
+            record = json.loads( line )
+            if isinstance(record, dict) :
+                if len(text) != record['length'] :
+                    journal_logger.error( 'Journal {} does not replay correctly'.format(path) )
+                    break
+                good_text = text
+            else :
+                (pos, removed, inserted) = record
+                text = text[:pos] + inserted + text[pos+removed:]
+        except (ValueError, KeyError, TypeError) :
+            break # the line torn by a crash, or damage
+    return None if good_text is base_text else good_text
+
+class Journal(QObject):
+    def __init__(self, document):
+        super().__init__(document)
+        self.document = document
+        ''' The journal file path, and whether we are writing it '''
+        self.path = None
+        self.active = False
+        '''
+        The records not yet dropped, which are recent[0] with number
+        recent_from through the latest, number count-1; the number of the
+        first not yet handed to the WRITER; and the marks of saves begun
+        but not finished, whose records must be kept for restart(). A mark
+        is the number of the first record after it, and the journal path
+        of the book being saved.
+        '''
+        self.recent = []
+        self.recent_from = 0
+        self.count = 0
+        self.flushed_to = 0
+        self.marks = []
+        self.since_checkpoint = 0
+        self.timer = QTimer(self)
+        self.timer.setInterval( FLUSH_MS )
+        self.timer.timeout.connect( self._flush )
+        self.document.contentsChange.connect( self._doc_change )
+
+    '''
+    Slot for the contentsChange signal. Note the edit if we are recording,
+    which is when the journal is active or a save is under way. Qt may
+    report a change reaching past the end of the text, so clip it.
+    '''
+    def _doc_change(self, pos, removed, added):
+        if self.active or self.marks :
+            inserted = ''
+            if added :
+                end = min( pos + added, self.document.characterCount() - 1 )
+                tc = QTextCursor( self.document )
+                tc.setPosition( pos )
+                tc.setPosition( end, QTextCursor.MoveMode.KeepAnchor )
+                inserted = tc.selectedText().replace( C.UNICODE_LINE_DELIM, '\n' )
+            self.recent.append( (pos, removed, inserted) )
+            self.count += 1
+
+    ''' The length of the text as full_text() would return it '''
+    def _length(self):
+        return self.document.characterCount() - 1
+
+    '''
+    Drop the records nobody can want: those written, unless a pending save
+    will need them.
+    '''
+    def _trim(self):
+        keep_from = min( [ count for (count, path) in self.marks ]
+                         + [ self.flushed_to if self.active else self.count ] )
+        if keep_from > self.recent_from :
+            del self.recent[ : keep_from - self.recent_from ]
+            self.recent_from = keep_from
+
+    '''
+    Slot for the timer: hand the records not yet written to the WRITER, or
+    after COMPACT_RECORDS of them, a checkpoint of the whole text.
+    '''
+    def _flush(self):
+        if not self.active or self.flushed_to == self.count :
+            return
+        if self.since_checkpoint + self.count - self.flushed_to > COMPACT_RECORDS :
+            WRITER.submit( _checkpoint, self.path, self.document.full_text(), self.hash_name )
+            self.since_checkpoint = 0
+        else :
+            WRITER.submit( _append, self.path,
+                           self.recent[ self.flushed_to - self.recent_from : ],
+                           self._length() )
+            self.since_checkpoint += self.count - self.flushed_to
+        self.flushed_to = self.count
+        self._trim()
+
+    '''
+    Begin journaling a book just opened from path, whose text has the hash
+    base. Any journal left there has been replayed or refused by now.
+    '''
+    def start(self, path, base):
+        self.restart( self.mark(path), base )
+
+    def mark(self, path):
+        mark = ( self.count, path + '.' + C.JOURNAL_SUFFIX )
+        self.marks.append( mark )
+        return mark
+
+    '''
+    A save has succeeded. If we still have every record since it began,
+    start the journal afresh from the saved text; else a checkpoint has
+    been made since, and the journal already stands without the saved text,
+    though if the save was to a new path the checkpoint must be written
+    there. Then the journal of any old path goes.
+    '''
+    def restart(self, mark, base):
+        self.marks.remove( mark )
+        (count, path) = mark
+        (self.hash_name, digest) = base
+        if count >= self.recent_from :
+            WRITER.submit( _rewrite, path,
+                           { 'base' : [ self.hash_name, digest.hex() ] },
+                           self.recent[ count - self.recent_from : ], self._length() )
+            self.flushed_to = self.count
+            self.since_checkpoint = self.count - count
+        elif path != self.path :
+            WRITER.submit( _checkpoint, path, self.document.full_text(), self.hash_name )
+            self.flushed_to = self.count
+            self.since_checkpoint = 0
+        if self.path is not None and path != self.path :
+            WRITER.submit( _remove, self.path )
+        self.path = path
+        self.active = True
+        self.timer.start()
+        self._trim()
+
+    def forget(self, mark):
+        self.marks.remove( mark )
+        self._trim()
+
+    def close(self):
+        self.timer.stop()
+        if self.path is not None :
+            WRITER.submit( _remove, self.path )
+        self.active = False
+        self.marks = []
+        self._trim()
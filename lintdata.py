@@ -0,0 +1,206 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "2.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2013, 2014, 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+
+'''
+                          lintdata.py
+
+The class defined here checks the markup structure of one book as it is
+edited: /Q, /P, /T and the other blocks, [Footnote ...], [Illustration
+...] and [Sidenote ...] groups, footnote zones and headings, by the same
+grammar as a Translator uses, see translators.py. The errors are shown as
+marks in the margin of the edit view and listed in the Markup panel,
+lintview.py.
+
+The check is a translators.DocParse that keeps no units, fed one line at a
+time. Its state between lines is saved at checkpoints, every CHECK_LINES
+lines or so. After an edit, the check starts again from the last
+checkpoint at or before the first line changed, and goes on until its
+state is the same as that saved at a later checkpoint past the edit; from
+there on nothing can have changed. So a keystroke costs the scan of a few
+dozen lines, however big the book.
+
+The checkpoints and errors are kept as sorted lists of line (textblock)
+numbers; an edit that adds or removes lines moves those after it, and
+drops those in the lines it replaced. The lines from which the check must
+start again are kept in a sorted list, starts. Checking is done by a
+QTimer in slices of at most SLICE_LINES lines, so that loading a big book,
+or an edit that upsets the structure of the rest of it, does not freeze
+the window. A slice that is cut short leaves a checkpoint where it stopped,
+to start again from.
+
+The interface is:
+
+    MarkupLint(document) check the structure of document as it changes.
+
+    changed             signal emitted when the errors have changed.
+
+    errors              list of ( line number, message ) for the errors,
+                        in order, with origin-0 line (textblock) numbers.
+
+    line_message(line)  the message for an error on line, or None.
+'''
+import bisect
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+import translators
+import logging
+lintdata_logger = logging.getLogger(name='lintdata')
+
+CHECK_LINES = 64
+SLICE_LINES = 4000
+
+class MarkupLint(QObject):
+    changed = pyqtSignal()
+
+    def __init__(self, document):
+        super().__init__(document)
+        self.document = document
+        ''' The check, restored to a checkpoint for each slice '''
+        self.parse = translators.DocParse( '', keep_units=False )
+        '''
+        The checkpoints, as a sorted list of line numbers and a parallel
+        list of the states before those lines. There is always one at line
+        0, the state before the first line.
+        '''
+        self.marks = [ 0 ]
+        self.states = [ self.parse.state() ]
+        self.errors = []
+        self.messages = dict()
+        self.starts = [ 0 ]
+        self.line_count = document.blockCount()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect( self._check )
+        self.document.contentsChange.connect( self._doc_change )
+        self.timer.start()
+
+    def line_message(self, line):
+        return self.messages.get( line )
+
+    '''
+    Slot for the contentsChange signal. The lines from first to last (as
+    numbered now) are new; they replace old lines first to old_last. Move
+    or drop the checkpoints, errors and starts after first to suit, and
+    start again from the last checkpoint at or before first.
+    '''
+    def _doc_change(self, pos, removed, added):
+        count = self.document.blockCount()
+        delta = count - self.line_count
+        self.line_count = count
+        first = self.document.findBlock( pos ).blockNumber()
+        last = self.document.findBlock( pos + added ).blockNumber()
+        if last < first : # the change reaches past the end of the text
+            last = count - 1
+        old_last = last - delta
+        j = bisect.bisect_right( self.marks, first )
+        k = bisect.bisect_right( self.marks, old_last, j )
+        del self.marks[ j : k ]
+        del self.states[ j : k ]
+        if delta :
+            for i in range( j, len( self.marks ) ) :
+                self.marks[i] += delta
+        j = bisect.bisect_left( self.errors, ( first, ) )
+        k = bisect.bisect_left( self.errors, ( old_last + 1, ), j )
+        errors = self.errors[ : j ] + [ ( line + delta, message )
+                                        for ( line, message ) in self.errors[ k : ] ]
+        j = bisect.bisect_right( self.starts, first )
+        k = bisect.bisect_right( self.starts, old_last, j )
+        starts = self.starts[ : j ] + [ start + delta for start in self.starts[ k : ] ]
+        bisect.insort( starts, self.marks[ bisect.bisect_right( self.marks, first ) - 1 ] )
+        self.starts = sorted( set( starts ) )
+        if errors != self.errors :
+            self._set_errors( errors )
+        self.timer.start()
+
+    def _set_errors(self, errors):
+        self.errors = errors
+        self.messages = dict()
+        for ( line, message ) in reversed( errors ) :
+            self.messages[ line ] = message
+        self.changed.emit()
+
+    '''
+    Slot for the timer: check one slice of lines, from the first start,
+    until the state agrees with a checkpoint, or the end of the document,
+    or SLICE_LINES have been done. Update the checkpoints on the way, and
+    replace the errors in the lines checked.
+    '''
+    def _check(self):
+        if not self.starts :
+            return
+        start = self.starts.pop(0)
+        j = bisect.bisect_left( self.marks, start )
+        parse = self.parse
+        parse.restore( self.states[ j ], start )
+        j += 1
+        block = self.document.findBlockByNumber( start )
+        found = []
+        line = start
+        since = 0
+        stop = start + SLICE_LINES
+        at_end = False
+        while True :
+            if line >= self.line_count :
+                parse.check_end()
+                if not self.document.isEmpty() : # an empty book is no error
+                    found.extend( ( self.line_count - 1, message ) for ( number, message ) in parse.errors )
+                parse.errors = []
+                del self.marks[ j : ]
+                del self.states[ j : ]
+                at_end = True
+                break
+            at_mark = j < len( self.marks ) and self.marks[ j ] == line
+            if at_mark or since >= CHECK_LINES or line >= stop :
+                state = parse.state()
+                if at_mark :
+                    if state == self.states[ j ] :
+                        break # converged: the rest is as it was
+                    self.states[ j ] = state
+                else :
+                    self.marks.insert( j, line )
+                    self.states.insert( j, state )
+                j += 1
+                since = 0
+                if line >= stop :
+                    bisect.insort( self.starts, line )
+                    break
+            parse.check_line( block.text() )
+            if parse.errors :
+                found.extend( ( number - 1, message ) for ( number, message ) in parse.errors )
+                parse.errors = []
+            block = block.next()
+            line += 1
+            since += 1
+        # the starts passed over have been checked
+        k = bisect.bisect_left( self.starts, line )
+        if at_end : k = len( self.starts )
+        del self.starts[ : k ]
+        j = bisect.bisect_left( self.errors, ( start, ) )
+        k = len( self.errors ) if at_end else bisect.bisect_left( self.errors, ( line, ), j )
+        if found or j != k :
+            self._set_errors( self.errors[ : j ] + found + self.errors[ k : ] )
+        if self.starts :
+            self.timer.start()
@@ -0,0 +1,143 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "2.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2013, 2014, 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+'''
+                          lintview.py
+
+Define a class to implement the Markup panel, the View corresponding to
+the data model of lintdata.py. It lists the errors of markup structure in
+the book, and stays up to date as the book is edited; there is nothing to
+refresh. At the top is a count of the errors. Below it is a two-column
+table of
+
+    Line    Problem
+
+Clicking a row puts the edit cursor at the start of that line.
+'''
+
+from PyQt6.QtCore import (
+    Qt,
+    QAbstractTableModel,
+    QCoreApplication
+    )
+_TR = QCoreApplication.translate
+
+from PyQt6.QtWidgets import (
+    QHeaderView,
+    QLabel,
+    QTableView,
+    QVBoxLayout,
+    QWidget
+    )
+import logging
+lintview_logger = logging.getLogger(name='lintview')
+
+COL_HEADS = {
+    0 : _TR('Markup table column head', 'Line' ),
+    1 : _TR('Markup table column head', 'Problem' )
+    }
+COL_TOOLTIPS = {
+    0 : _TR('Markup table column tooltip', 'Line number where the problem was found'),
+    1 : _TR('Markup table column tooltip', 'The markup being read, and what was found there')
+    }
+COL_ALIGNMENT = {
+    0 : (Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter),
+    1 : (Qt.AlignmentFlag.AlignLeft  | Qt.AlignmentFlag.AlignVCenter)
+    }
+
+'''
+The table model serves the errors list of the MarkupLint, which is
+replaced whenever it changes, so the model is reset on every change.
+'''
+class LintTableModel(QAbstractTableModel):
+    def __init__(self, lint, parent):
+        super().__init__(parent)
+        self.lint = lint
+    def columnCount(self,index):
+        if index.isValid() : return 0 # we don't have a tree here
+        return len(COL_HEADS)
+    def flags(self,index):
+        return Qt.ItemFlag.ItemIsEnabled
+    def rowCount(self,index):
+        if index.isValid() : return 0 # we don't have a tree here
+        return len(self.lint.errors)
+    def headerData(self, column, axis, role):
+        if ( axis == Qt.Orientation.Horizontal ) and ( column >= 0 ):
+            if role == Qt.ItemDataRole.DisplayRole :
+                return COL_HEADS[column]
+            if (role == Qt.ItemDataRole.ToolTipRole) or (role == Qt.ItemDataRole.StatusTipRole) :
+                return COL_TOOLTIPS[column]
+        return None
+    def data(self, index, role ):
+        row = index.row()
+        col = index.column()
+        if row >= len(self.lint.errors) :
+            return None
+        if role == Qt.ItemDataRole.DisplayRole :
+            ( line, message ) = self.lint.errors[row]
+            return line + 1 if col == 0 else message
+        elif role == Qt.ItemDataRole.TextAlignmentRole :
+            return COL_ALIGNMENT[col]
+        elif (role == Qt.ItemDataRole.ToolTipRole) \
+          or (role == Qt.ItemDataRole.StatusTipRole) :
+            return COL_TOOLTIPS[col]
+        return None
+    def reset(self):
+        self.beginResetModel()
+        self.endResetModel()
+
+class LintPanel(QWidget):
+    def __init__(self, my_book) :
+        super().__init__(None) # parentage supplied by tab bar
+        self.lint = my_book.get_lint_model()
+        self.edit_view = my_book.get_edit_view()
+        self.table_model = LintTableModel(self.lint, self)
+        self._uic()
+        self.view.clicked.connect(self.table_click)
+        self.lint.changed.connect(self.lint_changed)
+        self.lint_changed()
+
+    def lint_changed(self):
+        self.table_model.reset()
+        self.count_label.setText(
+            _TR('Markup panel', 'Markup problems: {}').format( len(self.lint.errors) ) )
+
+    def table_click(self, index):
+        if index.row() < len(self.lint.errors) :
+            self.edit_view.go_to_line( self.lint.errors[ index.row() ][0] )
+
+    def _uic(self):
+        vbox = QVBoxLayout()
+        self.setLayout(vbox)
+        self.count_label = QLabel()
+        self.count_label.setToolTip(
+            _TR('Markup panel', 'Errors of markup structure, as a Translator would find them') )
+        vbox.addWidget(self.count_label, 0)
+        self.view = QTableView()
+        self.view.setCornerButtonEnabled(False)
+        self.view.setWordWrap(False)
+        self.view.setAlternatingRowColors(False)
+        self.view.setSortingEnabled(False)
+        self.view.setModel(self.table_model)
+        self.view.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        vbox.addWidget(self.view, 1)
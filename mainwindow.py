@@ -223,8 +223,9 @@ PANEL_DICT = {
     'Chars':None,
     'Words':None,
     'Fnote':None,
+    'Markup':None,
     'Loupe':None,
-    'default' : ['Images','Notes','Find','Words','Chars','Pages','Fnote','Loupe'],
+    'default' : ['Images','Notes','Find','Words','Chars','Pages','Fnote','Markup','Loupe'],
     'tab_list' : None, # supplied in Book, updated in focus_me
     'current' : 0
     }
@@ -396,6 +397,13 @@ class MainWindow(QMainWindow):
         self._new()
         return self.open_books[self.focus_book]
 
+    '''
+    For use from the Find panel when searching all open books, return a
+    list of the open Books in the sequence they were opened.
+    '''
+    def get_all_books(self) :
+        return [ self.open_books[seq] for seq in sorted(self.open_books) ]
+
     '''
     Quick check to see if a file path is already open. Called from _open
     and from _build_recent (menu). Returned value is the sequence number
@@ -528,36 +536,19 @@ class MainWindow(QMainWindow):
 
     '''
     Save the book that is currently in focus under its present name, if it is
-    modified. Return True if the save completed, else False. If the active
-    book is a New one, force a Save-As action instead.
+    modified. The Book writes it in the background; return True if the save
+    was begun, else False. With wait=True, as when closing, wait for the
+    write and return True only if it completed. If the active book is a New
+    one, force a Save-As action instead.
     '''
-    def _save(self):
+    def _save(self, wait=False):
         active_book = self.open_books[self.focus_book]
         if active_book.get_save_needed() :
             ''' It has been modified, do a save '''
             if active_book.get_book_name().startswith('Untitled-'):
-                return self._save_as()
-            '''
-            Create the output FileBasedTextStreams for the book and the metadata.
-            If they can't be created, tell the user and return.
-            '''
-            doc_stream = utilities.path_to_output( active_book.get_book_full_path() )
-            if doc_stream : # successfully opened for output
-                meta_stream = utilities.related_output(doc_stream,C.METAFILE_SUFFIX)
-                if not meta_stream:
-                    utilities.warning_msg(
-                        _TR('File:Save', 'Unable to open metadata file for writing.'),
-                        _TR('File:Save', 'Use loglevel=error for details.'),
-                        parent=self )
-                    return False
-            else:
-                utilities.warning_msg(
-                    _TR('File:Save', 'Unable to open book file for writing.'),
-                    _TR('File:Save', 'Use loglevel=error for details.'),
-                    parent=self )
-                return False
-            ''' Send the two streams to the Book to perform the actual output '''
-            return active_book.save_book(doc_stream, meta_stream)
+                return self._save_as(wait)
+            ''' The Book performs the actual output, reporting any error '''
+            return active_book.save_book(wait)
 
     '''
     
@@ -565,10 +556,10 @@ class MainWindow(QMainWindow):
     the book's original folder, if any. The result is an output
     FileBasedTextStream. Call the book to rename itself with that filename
     (which makes it modified, if it wasn't already). Change the text in the
-    edit tab to the filename. Discard the FBTS and call _save which will make
-    another one.
+    edit tab to the filename. Discard the FBTS and call _save which will write
+    the book to its new path.
     '''
-    def _save_as(self):
+    def _save_as(self, wait=False):
         active_book = self.open_books[self.focus_book]
         fbts = utilities.ask_saving_file(
             _TR('File:Save As dialog',
@@ -584,7 +575,7 @@ class MainWindow(QMainWindow):
                 active_book.get_book_folder() )
             self._add_to_recent(fbts.fullpath())
             fbts = None # discard that object
-            return self._save()
+            return self._save(wait)
         else:
             return False
 
@@ -595,6 +586,7 @@ class MainWindow(QMainWindow):
     def _close(self):
         target_index = self.focus_book # active edit tab is to close
         target_book = self.open_books[target_index]
+        keep_journal = False
         if target_book.get_save_needed() :
             '''
             Compose message of translated parts because _TR does not
@@ -611,7 +603,8 @@ class MainWindow(QMainWindow):
             if ret is None : # Cancel
                 return
             if ret : # True==Save
-                self._save()
+                keep_journal = not self._save(wait=True)
+        target_book.close_book(keep_journal)
         '''
         The active Book wasn't modified, or has been saved. Now, get rid of it in 3 steps,
         
@@ -930,6 +923,7 @@ class MainWindow(QMainWindow):
         saved. If the answer is yes, try to do so.
         '''
         unsaved = []
+        unsaved_kept = []
         for (seq, book_object) in self.open_books.items() :
             if book_object.get_save_needed() :
                 unsaved.append(seq)
@@ -951,11 +945,15 @@ class MainWindow(QMainWindow):
                 For all named items this will occur silently. For
                 "Untitled-n" documents, it will open a save-as dialog. We
                 ignore the return from this because we cannot distinguish
-                between a cancelled file-open dialog and a file write error.
+                between a cancelled file-open dialog and a file write error,
+                except to keep the edit journal of a book not saved.
                 '''
                 for seq in unsaved :
                     self.focus_me(seq)
-                    self._save()
+                    if not self._save(wait=True) :
+                        unsaved_kept.append(seq)
+        for (seq, book_object) in self.open_books.items() :
+            book_object.close_book( seq in unsaved_kept )
         ''' Clear the settings so that old values don't hang around '''
         self.settings.clear()
         ''' Tell the submodules to save their current global values. '''
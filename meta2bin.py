@@ -38,6 +38,9 @@ bookmarks are not written.
 
 If you edit the book and save it, the metadata changes, and you need to
 make a new .bin file.
+
+This reads only JSON metadata. If you have converted the metadata to a
+compact container, convert a copy of it back with metaconvert.py --json.
 '''
 
 import logging
@@ -0,0 +1,146 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "1.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+DOCSTRING = '''
+This program converts the metadata of a book saved by PPQT 2 between the
+normal JSON form and the compact container form. Example:
+
+    python3 metaconvert.py very_good_book.utf.ppqt
+
+If very_good_book.utf.ppqt is JSON, it is rewritten as a compact container,
+which is a fraction of the size and quicker to load and save. If it is a
+container, it is rewritten as JSON, which you can read and edit. PPQT
+saves a book's metadata in the form it was in when the book was opened.
+
+To be sure of the form you get, give --json or --compact before the file
+name. To leave the file alone and write the result elsewhere, give an
+output file name after it:
+
+    python3 metaconvert.py --json very_good_book.utf.ppqt copy.ppqt
+
+Every section is copied, including any that PPQT would not recognize.
+'''
+
+import logging
+my_logger = logging.getLogger()
+import sys
+import os
+import json
+
+from PyQt6.QtCore import QBuffer, QIODevice, QTextStream
+
+import constants as C
+import metadata
+
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+#
+# Write a brief help message to stdout
+
+def help():
+    print( DOCSTRING )
+
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+#
+# Get the names of the sections in the metadata, so we can register a
+# reader and writer for each one. The reader just keeps the value and the
+# writer returns it.
+
+def section_names( data ) :
+    if data.startswith( metadata.CONTAINER_MAGIC ) :
+        return [ name for ( name, encoding, payload ) in metadata.read_container( data ) ]
+    return list( json.loads( data.decode( 'UTF-8' ) ).keys() )
+
+def make_manager( names, values ) :
+    mgr = metadata.MetaMgr()
+    for name in names :
+        if name != C.MD_V :
+            mgr.register( name,
+                          lambda section, value, version : values.__setitem__( section, value ),
+                          lambda section : values[section] )
+    return mgr
+
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+#
+# Convert the bytes of a metadata file to the bytes of the other form, or
+# of the form asked for. Load and write with the same MetaMgr that PPQT
+# uses, through streams on memory buffers.
+
+def convert( data, compact = None ) :
+    values = dict()
+    mgr = make_manager( section_names( data ), values )
+    in_buffer = QBuffer()
+    in_buffer.setData( data )
+    in_buffer.open( QIODevice.OpenModeFlag.ReadOnly )
+    error = mgr.load_meta( QTextStream( in_buffer ) )
+    if error :
+        raise ValueError( error )
+    mgr.compact = ( not mgr.compact ) if compact is None else compact
+    out_buffer = QBuffer()
+    out_buffer.open( QIODevice.OpenModeFlag.WriteOnly )
+    out_stream = QTextStream( out_buffer )
+    mgr.write_meta( out_stream )
+    out_stream.flush()
+    return bytes( out_buffer.data() )
+
+def main( argv ):
+
+    args = argv[1:]
+    compact = None
+    if args and args[0] in ( '--json', '--compact' ) :
+        compact = ( args.pop(0) == '--compact' )
+
+    # we need the input file name and perhaps an output file name
+
+    if len(args) < 1 or len(args) > 2 :
+        help()
+        return
+
+    meta_name = args[0]
+    out_name = args[1] if len(args) == 2 else meta_name
+
+    if not ( os.path.isfile( meta_name ) ) or not ( os.access( meta_name, os.R_OK ) ) :
+        my_logger.error( 'Cannot access metadata file {} to read it'.format( meta_name ) )
+        help()
+        return
+
+    with open( meta_name, 'rb' ) as meta_file :
+        data = meta_file.read()
+    try :
+        output = convert( data, compact )
+    except ValueError as error_object :
+        my_logger.error( 'Cannot convert {0}: {1}'.format( meta_name, str(error_object) ) )
+        return
+
+    # write a temporary file and rename it, so the input is never left
+    # half-written
+
+    temp_name = out_name + '.tmp'
+    with open( temp_name, 'wb' ) as out_file :
+        out_file.write( output )
+    os.replace( temp_name, out_name )
+    print( 'Wrote {0} as {1}, {2} bytes'.format(
+        out_name, 'compact container' if output.startswith( metadata.CONTAINER_MAGIC ) else 'JSON',
+        len( output ) ) )
+
+if __name__ == '__main__' :
+    main( sys.argv )
@@ -62,10 +62,44 @@ In MetaMgr.load_meta(), we read the entire metadata file and give it to JSON
 to decode. The result is a dict with a key for each section name. We call the
 reader that was registered for each section name, passing the decoded value.
 
-In MetaMgr.save_meta() we go through the keys of section_dict, calling each
-registered writer in turn. The writer returns a single Python value. We build
-a temporary dict with keys of section names and values as returned by the
-writers, and dump the JSON encoding of that dict to the output file.
+In MetaMgr.write_meta() we go through the keys of section_dict, calling each
+registered writer in turn. The writer returns a single Python value. We
+write the JSON encoding of each section to the output stream as soon as we
+have it, so that only one section at a time is held as a Python value and
+as a string. The result is the same single JSON object that load_meta()
+reads. See write_meta() for the layout.
+
+A few sections are big and costly to read, chiefly WORDCENSUS, whose reader
+validates and spell-checks every word. The module that owns such a section
+can register it with lazy=True. Then load_meta() does not decode it but only
+finds where its value lies in the file, and saves that text. The owner calls
+load_deferred(section) before it first needs the data, for example when its
+panel is first displayed, and only then is the value decoded and the reader
+called. A section that is still deferred when the book is saved is written
+back as the text that was read, without calling its writer.
+
+Instead of JSON, the metadata can be kept in a compact binary container, see
+"The compact container" below. It holds the same sections with the same
+values, but each section is compressed, and a big table such as WORDCENSUS,
+PAGETABLE or FOOTNOTES is stored by columns. load_meta() recognizes a
+container by its first bytes, and write_meta() writes the book's metadata in
+the form it was read, so a book only uses the container after the user
+converts its metadata file with metaconvert.py, which also converts it back
+to JSON for editing by hand. A container has a VERSION of "3".
+
+Writing a big section costs much more than writing the small ones, and most
+saves come after the user has only edited the text or moved the cursor. So
+a section can also be registered with tracked=True. Its owner promises to
+call mark_dirty(section) whenever its data changes, and MetaMgr keeps the
+text (or container payload) it last wrote for that section. A save writes
+that again without calling the writer unless the section has been marked
+dirty since. A section is also dirty when it has been read from a file.
+
+A Book saves in the background. On the GUI thread, MetaMgr.snapshot() calls
+the writers and keeps the text (or payloads) they produce; then the module
+function write_snapshot() writes that to a file on a worker thread. A
+section whose value can only be known at the time of writing, such as the
+hash of the saved text, is named "late" and its value is supplied then.
 
 The signature of a reader is:  rdr(section, value, version), where
     * section is the section name string,
@@ -103,6 +137,10 @@ metadata_logger = logging.getLogger(name='metadata')
 import constants as C
 import types # for FunctionType validation in register
 import json
+import regex
+import struct
+import zlib
+import itertools
 
 '''
 The JSON objects don't retain any state between uses, and PPQT is
@@ -145,6 +183,199 @@ class _Extended_Encoder(json.JSONEncoder):
             return { '<SET>' : list(obj) }
         return super().default(obj)
 
+'''
+Encoding one section value for write_meta(). Most sections are small and are
+dumped with indent=2, as the whole file used to be. A list, dict or set of
+more than COMPACT_ITEMS items, such as WORDCENSUS or PAGETABLE, is written
+one item to a line, each item encoded without any indenting or spaces.
+That keeps big sections a fraction of the size but still one line per word
+or page for the user who must edit the file. The items of a big section are
+written WRITE_BATCH at a time, so not even the encoding of one section is
+held as a single string.
+'''
+COMPACT_ITEMS = 50
+WRITE_BATCH = 1000
+_compact_encoder = _Extended_Encoder( separators=(',',':') )
+_indent_encoder = _Extended_Encoder( indent=2 )
+
+def _write_items(qts, open_mark, items, close_mark):
+    qts << open_mark
+    delimiter = ''
+    batch = []
+    for item in items :
+        batch.append( item )
+        if len(batch) == WRITE_BATCH :
+            qts << delimiter + ',\n'.join(batch)
+            delimiter = ',\n'
+            batch = []
+    if batch :
+        qts << delimiter + ',\n'.join(batch)
+    qts << close_mark
+
+class _Recorder(object):
+    '''
+    Stand-in for the output stream while writing a tracked section, which
+    writes through to the stream (if any) and keeps what was written, see
+    MetaMgr._write_section_value() and MetaMgr.snapshot().
+    '''
+    def __init__(self, qts):
+        self.qts = qts
+        self.parts = []
+    def __lshift__(self, text):
+        if self.qts is not None :
+            self.qts << text
+        self.parts.append( text )
+        return self
+
+def _write_value(qts, value):
+    if isinstance(value, (list, set, dict)) and len(value) > COMPACT_ITEMS :
+        if isinstance(value, dict) :
+            _write_items( qts, '{\n',
+                ( '    ' + json.dumps(str(key)) + ':' + _compact_encoder.encode(item)
+                  for (key, item) in value.items() ), '\n  }' )
+        else :
+            (open_mark, close_mark) = ('{"<SET>":[\n', '\n  ]}') \
+                if isinstance(value, set) else ('[\n', '\n  ]')
+            _write_items( qts, open_mark,
+                ( '    ' + _compact_encoder.encode(item) for item in value ), close_mark )
+    else :
+        qts << _indent_encoder.encode(value).replace('\n', '\n  ')
+
+'''
+Finding the sections of a metadata file without decoding them, for
+load_meta(). Both write_meta() and the json.dumps(indent=2) of older
+versions put each section name at the start of a line, indented by exactly
+two spaces, and every value within a section is indented farther. So
+RE_MEMBER finds the start of each section, and its value is the text up to
+the next one, less the comma between them. The last value ends before the
+closing brace of the file.
+
+If anything is not as expected, _split_sections() returns None and the
+caller decodes the file as a whole. A user could have edited the file so as
+to put a line that looks like a section inside a value, which would cut
+that value short. That would be found when it fails to decode, except in a
+deferred section; so the value of a section to be deferred must at least
+have as many closing brackets as opening ones, outside of strings.
+'''
+RE_MEMBER = regex.compile( r'^  ("(?:[^"\\\n]|\\.)*")\s*:\s*', regex.MULTILINE )
+RE_STRING = regex.compile( r'"(?:[^"\\]|\\.)*"' )
+
+def _split_sections(json_string):
+    members = list( RE_MEMBER.finditer( json_string ) )
+    if 0 == len(members) or json_string[ : members[0].start() ].strip() != '{' :
+        return None
+    last_end = json_string.rstrip()
+    if not last_end.endswith('}') :
+        return None
+    ends = [ m.start() for m in members[1:] ] + [ len(last_end) - 1 ]
+    sections = []
+    for (member, end) in zip( members, ends ) :
+        text = json_string[ member.end() : end ].rstrip()
+        if end != ends[-1] :
+            if not text.endswith(',') :
+                return None
+            text = text[:-1].rstrip()
+        sections.append( ( json.loads( member.group(1) ), text ) )
+    return sections
+
+def _balanced(text):
+    if not text or text[0] not in '[{' :
+        return False
+    bare = RE_STRING.sub( '', text )
+    return bare.count('[') + bare.count('{') == bare.count(']') + bare.count('}')
+
+'''
+                    The compact container
+
+A container file begins with CONTAINER_MAGIC, which no JSON file can, and
+then holds the sections one after another, VERSION first. Each section is a
+SECTION_HEAD of three little-endian numbers: the length of the name, how the
+value is encoded, and the length of the payload; then the name in UTF-8;
+then the payload, the zlib-compressed UTF-8 encoding of a compact JSON
+value. The JSON is decoded with _json_object_hook, so sets and bytes are as
+in the JSON file.
+
+The value of ENCODE_JSON is just the section value. A list of more than
+COMPACT_ITEMS rows that are all lists of the same length, which is how the
+big sections are written, is encoded as ENCODE_COLUMNS: a list of columns,
+each the list of one item from every row. A column of nothing but integers
+is stored as differences {"<DELTA>":[first, second-first, ...]}, which for
+the ascending positions of PAGETABLE and FOOTNOTES are small numbers. Like
+values side by side compress much better than the rows did.
+
+Sections are read with read_container(), which returns a list of (name,
+encoding, payload), and the payload is only decompressed and decoded by
+decode_payload(). So a lazy section is deferred still compressed.
+'''
+CONTAINER_MAGIC = b'PPQT\x89MD\n'
+CONTAINER_VERSION = '3'
+SECTION_HEAD = struct.Struct( '<HBI' )
+ENCODE_JSON = 0
+ENCODE_COLUMNS = 1
+
+def _is_table(value):
+    if not isinstance(value, list) or len(value) <= COMPACT_ITEMS :
+        return False
+    if not isinstance(value[0], list) :
+        return False
+    width = len(value[0])
+    return width > 0 and all( isinstance(row, list) and len(row) == width for row in value )
+
+def _is_int_column(column):
+    return all( type(item) is int for item in column )
+
+def encode_value(value):
+    if _is_table(value) :
+        columns = []
+        for column in zip( *value ) :
+            if _is_int_column(column) :
+                deltas = [ column[0] ] + [ b - a for (a, b) in zip( column, column[1:] ) ]
+                columns.append( { '<DELTA>' : deltas } )
+            else :
+                columns.append( list(column) )
+        (encoding, value) = (ENCODE_COLUMNS, columns)
+    else :
+        encoding = ENCODE_JSON
+    payload = zlib.compress( _compact_encoder.encode(value).encode('UTF-8') )
+    return (encoding, payload)
+
+def decode_payload(encoding, payload):
+    value = json.loads( zlib.decompress(payload).decode('UTF-8'),
+                        object_hook=_json_object_hook )
+    if encoding == ENCODE_COLUMNS :
+        columns = []
+        for column in value :
+            if isinstance(column, dict) :
+                column = list( itertools.accumulate( column['<DELTA>'] ) )
+            columns.append( column )
+        value = [ list(row) for row in zip( *columns ) ]
+    elif encoding != ENCODE_JSON :
+        raise ValueError( 'unknown section encoding {}'.format(encoding) )
+    return value
+
+def read_container(data):
+    if not data.startswith( CONTAINER_MAGIC ) :
+        raise ValueError( 'not a metadata container' )
+    sections = []
+    pos = len( CONTAINER_MAGIC )
+    while pos < len(data) :
+        (name_size, encoding, payload_size) = SECTION_HEAD.unpack_from( data, pos )
+        pos += SECTION_HEAD.size
+        name = data[ pos : pos + name_size ].decode('UTF-8')
+        pos += name_size
+        payload = data[ pos : pos + payload_size ]
+        pos += payload_size
+        if len(payload) != payload_size :
+            raise ValueError( 'metadata container is truncated in {}'.format(name) )
+        sections.append( ( name, encoding, payload ) )
+    return sections
+
+def _write_section_head(device, name, encoding, payload):
+    name = name.encode('UTF-8')
+    device.write( SECTION_HEAD.pack( len(name), encoding, len(payload) ) )
+    device.write( name )
+    device.write( payload )
+
 '''
 Each instance of the MetaMgr class encapsulates what is known about the
 metadata of a single book. The book creates one of these and all of the
@@ -166,6 +397,25 @@ class MetaMgr(object):
         reader and writer pre-registered in it.
         '''
         self.section_dict = {C.MD_V : [self._v_reader, self._v_writer]}
+        '''
+        Sections registered as lazy, and the undecoded value text of those
+        that have been read but not yet loaded, see load_deferred().
+        '''
+        self.lazy_sections = set()
+        self.deferred = dict()
+        '''
+        True when the metadata was read from a compact container, so that
+        write_meta() writes one back.
+        '''
+        self.compact = False
+        '''
+        Sections registered as tracked. For each section, the count of
+        calls to mark_dirty(), and the (compact, count, text or payload)
+        last written for it; see _cached().
+        '''
+        self.tracked_sections = set()
+        self.dirty_count = dict()
+        self.written = dict()
         # End of __init__
 
     ''' The reader and writer methods for the {"VERSION":n} section. '''
@@ -181,7 +431,7 @@ class MetaMgr(object):
             self.version_read = '2'
 
     def _v_writer(self, section) :
-        return self.version_write
+        return CONTAINER_VERSION if self.compact else self.version_write
 
     def version(self):
         return self.version_read
@@ -189,13 +439,20 @@ class MetaMgr(object):
     '''
     Members of the Book's fleet of objects, while initializing themselves,
     call this method to register to read and write a section of metadata.
+    Pass lazy=True for a big section whose reading can wait until the
+    registrant calls load_deferred(), and tracked=True for one whose
+    registrant calls mark_dirty() whenever its value changes.
     '''
-    def register(self, section, rdr, wtr):
+    def register(self, section, rdr, wtr, lazy=False, tracked=False):
         if isinstance(rdr, self._rdr_wtr_types) \
         and isinstance(wtr, self._rdr_wtr_types) :
             if isinstance(section,str) :
                 if section not in self.section_dict :
                     self.section_dict[section] = [rdr, wtr]
+                    if lazy :
+                        self.lazy_sections.add(section)
+                    if tracked :
+                        self.tracked_sections.add(section)
                     metadata_logger.debug('Registered reader/writer for '+section)
                 else :
                     metadata_logger.warn('Duplicate metadata registration ignored for '+section)
@@ -211,25 +468,37 @@ class MetaMgr(object):
     '''
 
     def load_meta(self, qts) :
-        global _json_object_hook
         '''
-        Get the whole stream of encodes as a single string value. JSON then
-        decodes it all into a single dict whose keys are the section names
-        and values the section values (possibly large).
-        
+        Get a dict whose keys are the section names and values the section
+        values (possibly large), and a dict of the deferred lazy sections,
+        from the container or JSON file, whichever the stream holds.
+
         Pass each section value to the registered reader (section_dict[section][0])
         
         Thanks Frank Zago for shortening this code.
         
         Pull the VERSION section and process it first if it is present.
         '''
-        json_string = qts.readAll()
+        device = qts.device()
+        is_container = device is not None and \
+            bytes( device.peek( len(CONTAINER_MAGIC) ) ) == CONTAINER_MAGIC
         try:
-            bookconf = json.loads( json_string, object_hook=_json_object_hook )
-        except ValueError as json_error_object :
-            json_error_str = str(json_error_object)
-            metadata_logger.error('JSON error:'+json_error_str)
-            return json_error_str
+            if is_container :
+                (bookconf, new_deferred) = self._read_container( device )
+            else :
+                (bookconf, new_deferred) = self._read_json( qts )
+        except ( ValueError, zlib.error, struct.error ) as error_object :
+            error_str = str(error_object)
+            metadata_logger.error('{0} error:{1}'.format(
+                'Container' if is_container else 'JSON', error_str) )
+            return error_str
+        '''
+        A whole metadata file has a VERSION, and its form is the form we
+        will save. A single section, as moved by the translators, doesn't
+        change that.
+        '''
+        if is_container or C.MD_V in bookconf :
+            self.compact = is_container
 
         received_sections = [ _s for _s in bookconf.keys() ]
         if C.MD_V in received_sections :
@@ -237,8 +506,13 @@ class MetaMgr(object):
             received_sections.remove(C.MD_V)
             received_sections.insert(0,C.MD_V)
         for section in received_sections:
-            if section in self.section_dict :
+            if section in new_deferred :
+                metadata_logger.debug('deferring metadata section '+section)
+                self.deferred[section] = new_deferred[section]
+            elif section in self.section_dict :
                 metadata_logger.debug('loading metadata section '+section)
+                self.deferred.pop(section, None)
+                self.mark_dirty(section)
                 self.section_dict[section][0](section, bookconf[section], self.version_read)
             else:
                 '''
@@ -248,27 +522,222 @@ class MetaMgr(object):
                 metadata_logger.error(
                     'No reader registered for {}, ignoring it'.format(section))
 
+    '''
+    Get the whole stream of encodes as a single string value. Split it into
+    sections and decode each, except that the text of a lazy section is
+    only kept in new_deferred. If the file can't be split, or a section
+    fails to decode, JSON decodes it all as one object, so that any error
+    message is the same as it would be for the whole file.
+    '''
+    def _read_json(self, qts) :
+        global _json_object_hook
+        json_string = qts.readAll()
+        split = _split_sections( json_string )
+        if split is not None :
+            try:
+                bookconf = dict()
+                new_deferred = dict()
+                for (section, text) in split :
+                    if section in self.lazy_sections and _balanced(text) :
+                        new_deferred[section] = text
+                        bookconf[section] = None
+                    else :
+                        new_deferred.pop(section, None)
+                        bookconf[section] = json.loads( text, object_hook=_json_object_hook )
+                return (bookconf, new_deferred)
+            except ValueError :
+                pass
+        return ( json.loads( json_string, object_hook=_json_object_hook ), dict() )
+
+    '''
+    Read a container from the device under the stream, in binary. Decode
+    each section but a lazy one, whose (encoding, payload) is deferred.
+    '''
+    def _read_container(self, device) :
+        device.setTextModeEnabled(False)
+        bookconf = dict()
+        new_deferred = dict()
+        for (section, encoding, payload) in read_container( bytes( device.readAll() ) ) :
+            if section in self.lazy_sections :
+                new_deferred[section] = (encoding, payload)
+                bookconf[section] = None
+            else :
+                bookconf[section] = decode_payload( encoding, payload )
+        return (bookconf, new_deferred)
+
+    '''
+    Decode a deferred section, which is the text of a JSON value, or the
+    (encoding, payload) of a container section.
+    '''
+    def _decode_deferred(self, section) :
+        entry = self.deferred[section]
+        if isinstance(entry, str) :
+            return json.loads( entry, object_hook=_json_object_hook )
+        return decode_payload( *entry )
+
+    '''
+    Load a lazy section whose reading load_meta() deferred. Its owner calls
+    this before it first needs the data, and calls it as often as it likes,
+    as it does nothing unless the section is still waiting. The text is
+    dropped before the reader is called, so the reader may itself use
+    methods that call this.
+    '''
+    def load_deferred(self, section) :
+        if section in self.deferred :
+            try:
+                value = self._decode_deferred(section)
+            except ( ValueError, zlib.error ) as error_object :
+                metadata_logger.error('Error decoding {0}, ignoring it: {1}'.format(
+                    section, str(error_object) ) )
+                return
+            finally:
+                del self.deferred[section]
+            metadata_logger.debug('loading deferred metadata section '+section)
+            self.mark_dirty(section)
+            self.section_dict[section][0](section, value, self.version_read)
+
+    '''
+    The owner of a tracked section calls this whenever its value changes,
+    so the next save will call its writer.
+    '''
+    def mark_dirty(self, section) :
+        self.dirty_count[section] = self.dirty_count.get(section, 0) + 1
+
+    '''
+    Return what was last written for a tracked section in the form (JSON
+    or container) now wanted, if the section has not been dirtied since,
+    else None.
+    '''
+    def _cached(self, section, compact) :
+        if section in self.tracked_sections and section in self.written :
+            (was_compact, count, data) = self.written[section]
+            if was_compact == compact and count == self.dirty_count.get(section, 0) :
+                return data
+        return None
+
     '''
     Write the contents of a metadata file by calling the writer for each
-    registered section, saving each value returned in a dict keyed by
-    section-name. Dump that whole dict via JSON as the metadata file.
-    Argument qts is an output file stream.
+    registered section, and writing its JSON encoding as a member of the one
+    JSON object. A section still deferred is written as the text we read.
+    Argument qts is an output file stream. If the metadata was read from a
+    container, write a container instead.
     '''
     def write_meta(self, qts) :
-        global _Extended_Encoder
-        bookconf = dict()
-        for section in self.section_dict.keys():
-            metadata_logger.debug('collecting metadata section {}'.format(section) )
-            # make a one-entry dict of section : value
-            bookconf[section] = self.section_dict[section][1](section)
-        qts << json.dumps(bookconf, indent=2, cls=_Extended_Encoder )
+        if self.compact :
+            self._write_container( qts )
+        else :
+            self._write_sections( qts, list( self.section_dict.keys() ) )
+
+    def _write_sections(self, qts, sections) :
+        qts << '{'
+        delimiter = '\n'
+        for section in sections:
+            metadata_logger.debug('writing metadata section {}'.format(section) )
+            qts << delimiter
+            qts << '  ' + json.dumps(section) + ': '
+            self._write_section_value( qts, section )
+            delimiter = ',\n'
+        qts << '\n}'
+
+    def _write_section_value(self, qts, section) :
+        if isinstance( self.deferred.get(section), str ) :
+            qts << self.deferred[section]
+        elif section in self.deferred :
+            _write_value( qts, self._decode_deferred(section) )
+        elif self._cached(section, False) is not None :
+            qts << self._cached(section, False)
+        elif section in self.tracked_sections :
+            count = self.dirty_count.get(section, 0)
+            recorder = _Recorder(qts)
+            _write_value( recorder, self.section_dict[section][1](section) )
+            self.written[section] = (False, count, ''.join(recorder.parts))
+        else :
+            _write_value( qts, self.section_dict[section][1](section) )
+
+    '''
+    Write every registered section to a container, in binary on the device
+    under the stream. VERSION was registered first, so it goes first. A
+    section still deferred from a container is written as it was read.
+    '''
+    def _write_container(self, qts) :
+        qts.flush()
+        device = qts.device()
+        device.setTextModeEnabled(False)
+        device.write( CONTAINER_MAGIC )
+        for section in self.section_dict :
+            metadata_logger.debug('writing metadata section {}'.format(section) )
+            (encoding, payload) = self._section_payload( section )
+            _write_section_head( device, section, encoding, payload )
+
+    def _section_payload(self, section) :
+        entry = self.deferred.get(section)
+        if isinstance( entry, tuple ) :
+            return entry
+        if entry is not None :
+            return encode_value( self._decode_deferred(section) )
+        if self._cached(section, True) is not None :
+            return self._cached(section, True)
+        count = self.dirty_count.get(section, 0)
+        (encoding, payload) = encode_value( self.section_dict[section][1](section) )
+        if section in self.tracked_sections :
+            self.written[section] = (True, count, (encoding, payload))
+        return (encoding, payload)
+
+    '''
+    For a save in the background: call the writers now, and return what
+    they wrote as a snapshot that no later change to the book can affect,
+    to be written by write_snapshot() on another thread. Sections named in
+    late are not written now; write_snapshot() is given their values. The
+    snapshot is (compact, [(section, data)...]) where data is the JSON text
+    or the container (encoding, payload) of the section, or None if late.
+    '''
+    def snapshot(self, late=()) :
+        parts = []
+        for section in self.section_dict :
+            if section in late :
+                parts.append( (section, None) )
+            elif self.compact :
+                parts.append( (section, self._section_payload(section)) )
+            else :
+                recorder = _Recorder(None)
+                self._write_section_value( recorder, section )
+                parts.append( (section, ''.join(recorder.parts)) )
+        return (self.compact, parts)
 
     '''
     Primarily for the use of the translator code, write the contents of a
     a single section by name.
     '''
     def write_section( self, qts, section ) :
-        global _Extended_Encoder
         if section in self.section_dict :
-            out = { section : self.section_dict[section][1](section) }
-            qts << json.dumps(out, indent=2, cls=_Extended_Encoder )
+            self._write_sections( qts, [section] )
+
+'''
+Write a snapshot made by MetaMgr.snapshot() to the file at path, using
+values[section] for each late section. This touches nothing but its
+arguments, so it can run on a thread other than the one that made the
+snapshot. The file is written as write_meta() would write it: JSON in text
+mode, or a container in binary. Errors are raised as OSError.
+'''
+def write_snapshot(snapshot, values, path) :
+    (compact, parts) = snapshot
+    if compact :
+        with open( path, 'wb' ) as device :
+            device.write( CONTAINER_MAGIC )
+            for (section, data) in parts :
+                (encoding, payload) = encode_value( values[section] ) if data is None else data
+                _write_section_head( device, section, encoding, payload )
+    else :
+        with open( path, 'w', encoding='UTF-8' ) as text_file :
+            qts = _Recorder(None)
+            delimiter = '{\n'
+            for (section, data) in parts :
+                qts << delimiter + '  ' + json.dumps(section) + ': '
+                if data is None :
+                    _write_value( qts, values[section] )
+                else :
+                    qts << data
+                text_file.write( ''.join(qts.parts) )
+                qts.parts = []
+                delimiter = ',\n'
+            text_file.write( '\n}' if parts else '{\n}' )
@@ -49,11 +49,17 @@ metadata file), the metadata manager calls the registered read_pages method to
 take the page info from the metadata file and initialize the data store.
 
 If the main window tells the Book to load a new file, one with no metadata,
-the Book calls the scan_pages() method. This uses the editdata module
-all_blocks iterator to scan the document and extract the info from any page
-separator lines. When the book is later saved, these data are saved in the
-metadata file for next time, so page boundary lines are checked only the
-first time a file is opened.
+the Book calls the scan_pages() method. This makes one regex search over
+the full text of the document to extract the info from any page separator
+lines. When the book is later saved, these data are saved in the metadata
+file for next time, so page boundary lines are checked only the first time
+a file is opened.
+
+During the scan we note anomalies in the separators: a filename that
+appears more than once, and a numeric filename that is not greater than the
+numeric filename before it (a page out of sequence, or missing pages
+re-inserted in the wrong place). These are logged as warnings and kept in a
+list returned by anomalies().
 
     Save Process
 
@@ -65,9 +71,9 @@ loaded when the file is next opened.
 
 This "data model" has 6 items to store about each scan page:
 
-  * The page start offset in the document. This is stored as a QTextCursor so
-  that Qt will update it continuously as the document is edited -- usually!
-  See the note on Page Boundary Cursors below.
+  * The page start offset in the document. This is stored in a
+  PositionTracker (see editdata.py) that updates it continuously as the
+  document is edited. See the note on Page Boundary Maintenance below.
 
   * The filename of the scan image, usually a number like "002" or "0075" but
   sometimes alphanumeric.
@@ -86,7 +92,8 @@ This "data model" has 6 items to store about each scan page:
 In effect this is a 6-column table indexed by row number. However in memory,
 the data is in lists indexed by row number:
 
-  * cursor_list is a list of QTextCursor objects
+  * page_starts is a PositionTracker with one slot per page, plus a final
+    slot at the end of the document
 
   * filename_list is a list of filename strings
 
@@ -96,6 +103,18 @@ the data is in lists indexed by row number:
   * proofer_list is a list of lists containing proofer names, e.g.
     [ "", "Frau Sma", "", "fsmwalb", "Scribe" ].
 
+Three more items are derived from those, so that the lookups made on every
+cursor move and every paint of the page table take constant time:
+
+  * name_dict is a dict {filename:row} for name_index()
+
+  * explicit_formats is a sorted list of the rows whose folio format is
+    not "Same", searched with bisect by folio_format()
+
+  * folio_strings is a list of the display form of each folio, as returned
+    by folio_string(). It is built when the data is loaded and thereafter
+    updated by set_folios(), only for the rows that a change affects.
+
                       Public Methods
 
 pagedata has three clients:
@@ -126,48 +145,49 @@ pagedata has three clients:
     proofers(R) returns the list of proofer name strings for row R.
     
     folio_info(R)   returns the list [rule,format,number] for page R.
+
+    anomalies() returns a list of (R, message) for the separator anomalies
+                found by the last scan_pages().
     
     set_folios(R, rule, fmt, number) update the folio values for page R,
-        with None meaning no-change.
-
-
-    Page Boundary Cursor Maintenance
-
-We rely on Qt to keep the page-start cursors accurate under editing. This
-does not always happen. Under some types of edit, the start-offset of a
-page can be misplaced.
-
-Specifically, if the user selects a span of text that includes one or more
-page boundaries, and deletes or replaces that span of text, the cursor(s)
-that mark(s) the start(s) of those page(s) move to the end of the changed or
-deleted span. This part is inevitable (what else could the editor do?), but
-it does mean that if a span of text covering two or more pages is
-deleted/replaced, the affected page boundaries all end up pointing to the
-same position at the end of the replaced span.
-
-The bug (bugreports.qt-project.org/browse/QTBUG-32689) is that if you UNDO
-such an edit change -- as in "OMG did I really just delete three pages?
-Quick, control-z!" -- the cursors are NOT restored to their former positions
-but remain pointing to the end of the now-restored section of text. So Undo
-fails to restore the page boundary positions once they are moved.
-
-This is highly unlikely to occur under normal post-process editing. The book
-for post-processing is largely complete and doesn't need big chunks of text
-moved around. (In version 1 of PPQT we supported reflowing text, and the user
-might reflow a large section or the whole book, and then undo that action,
-which would produce the bug. However in the version we do not support reflow
-at all.)
+        with None meaning no-change. Returns (R, hi), the range of rows
+        whose folio strings were recomputed, or None if R is invalid.
+
+
+    Page Boundary Maintenance
+
+We originally kept a QTextCursor for each page start and relied on Qt to
+keep them accurate under editing. A book can have over a thousand pages,
+and Qt adjusts every cursor on every keystroke. The page starts are now
+kept in a PositionTracker, which the document updates from the same
+information, but in a way that costs almost nothing while the user types
+in one place.
+
+If the user selects a span of text that includes one or more page
+boundaries, and deletes or replaces that span of text, the starts of those
+pages move to the end of the changed or deleted span. This part is
+inevitable (what else could the editor do?), but it does mean that if a
+span of text covering two or more pages is deleted/replaced, the affected
+page boundaries all end up pointing to the same position at the end of the
+replaced span.
+
+With QTextCursors, if you UNDO such an edit change -- as in "OMG did I
+really just delete three pages? Quick, control-z!" -- the cursors are NOT
+restored to their former positions but remain pointing to the end of the
+now-restored section of text (bugreports.qt-project.org/browse/QTBUG-32689).
+The PositionTracker records the positions it collapses and restores them
+when the change is undone.
 
 '''
 import logging
 pagedata_logger = logging.getLogger(name='pagedata')
 
 import regex
+import bisect
 import utilities # for to_roman
 import constants as C
 import metadata
 import editdata
-from PyQt6.QtGui import QTextBlock, QTextCursor
 from PyQt6.QtCore import QObject, pyqtSignal
 
 '''
@@ -189,12 +209,20 @@ Regardless, the regex below handles either alternative and captures:
 
 The compiled regex can be a global because in use, it creates a match
 object that is private to the calling instance of PageData.
+
+re_line_sep matches a single line. re_text_sep is the same, except that
+no part of it can match a newline, and with MULTILINE, so that finditer
+over the whole document text finds every separator line in one pass.
 '''
 
 re_line_sep = regex.compile(
     '^-+File:\\s+([^\\.]+)\\.png(-+((\\\\[^\\\\]*)*)\\\\)?-*'
     ,regex.IGNORECASE)
 
+re_text_sep = regex.compile(
+    '^-+File:[^\\S\\n]+([^\\.\\n]+)\\.png(-+((\\\\[^\\\\\\n]*)*)\\\\)?-*'
+    ,regex.IGNORECASE | regex.MULTILINE)
+
 class PageData(QObject):
     ''' define the signal we emit on reading metadata '''
     PagesUpdated = pyqtSignal()
@@ -205,11 +233,13 @@ class PageData(QObject):
         ''' Save reference to the metamanager '''
         self.metamgr = my_book.get_meta_manager()
         ''' Register to read and write metadata '''
-        self.metamgr.register(C.MD_PT, self.read_pages, self.write_pages)
+        self.metamgr.register(C.MD_PT, self.read_pages, self.write_pages, tracked=True)
         ''' Save a reference to the edited document '''
         self.document = my_book.get_edit_model()
+        ''' Any edit may move the page starts, so our metadata needs writing '''
+        self.document.contentsChange.connect(self._doc_change)
         ''' Set up the lists that comprise our database '''
-        self.cursor_list = []
+        self.page_starts = self.document.make_tracker()
         self.filename_list = []
         self.folio_list = []
         self.proofers_list = []
@@ -218,73 +248,139 @@ class PageData(QObject):
         ''' Last-returned position and row: see page_index() below '''
         self.prior_P = None
         self.prior_R = 0
-        ''' Set of rows having an explicit folio format, as opposed to "same" '''
-        self.explicit_formats = set()
+        ''' Sorted list of rows having an explicit folio format, as opposed to "same" '''
+        self.explicit_formats = []
+        ''' Derived lookup tables, see _build_tables() '''
+        self.name_dict = {}
+        self.folio_strings = []
+        ''' Separator anomalies found by scan_pages '''
+        self.anomaly_list = []
+    '''
+    Slot for the contentsChange signal of the document. PAGETABLE is a
+    tracked metadata section, and an edit anywhere above a page start
+    moves it.
+    '''
+    def _doc_change(self, pos, removed, added):
+        if self._active :
+            self.metamgr.mark_dirty(C.MD_PT)
     '''
     Clear our lists prior to reading metadata. This is for convenience
     of the unit test. It is not expected that there will be multiple
     calls to read_pages in normal use.
     '''
     def clear(self):
-        self.cursor_list = []
+        self.metamgr.mark_dirty(C.MD_PT)
+        self.page_starts.set_positions([])
         self.filename_list = []
         self.folio_list = []
         self.proofers_list = []
         self._active = False
         self.prior_P = None
         self.prior_R = 0
-        self.explicit_formats = set()
+        self.explicit_formats = []
+        self.name_dict = {}
+        self.folio_strings = []
     '''
-    Scan all lines of a new document (one with no metadata) and create page
-    sep info. We fetch QTextBlocks, not just content strings, because we need
-    to get the .position() of the matching lines.
+    Scan a new document (one with no metadata) and create page sep info.
+    Rather than fetch each QTextBlock and match its text, we run re_text_sep
+    over the full text of the document, so the start of each match is the
+    document position of the separator line.
     
     Set all folios to Arabic, Add 1, and the sequence number. This
     operation creates new data, so we set metadata_modified.
+    
+    In the same pass, note anomalies: a repeated filename, or a numeric
+    filename that does not exceed the last numeric filename.
     '''
     def scan_pages(self):
-        global re_line_sep
         # first page is Arabic starting at 1
         rule = C.FolioRuleSet
         fmt = C.FolioFormatArabic
         nbr = 1
-        self.explicit_formats = {0}
-        for qtb in self.document.all_blocks() :
-            m = re_line_sep.match(qtb.text())
-            if m :
-                # capture the image filename
-                fname = m.group(1)
-                if m.group(3) is not None :
-                    # record proofers as a list, omitting the
-                    # null element caused by the leading '\'
-                    plist = m.group(3).split('\\')[1:]
-                else :
-                    # sep. line with no proofers, minimal list
-                    plist = ['']
-                qtc = QTextCursor(self.document)
-                qtc.setPosition(qtb.position())
-                self.cursor_list.append(qtc)
-                self.filename_list.append(fname)
-                self.folio_list.append( [rule,fmt,nbr] )
-                self.proofers_list.append(plist)
-                # remaining pages are ditto, add 1, next number
-                rule = C.FolioRuleAdd1
-                fmt = C.FolioFormatSame
-                nbr += 1
-        if 0 < len(self.cursor_list) : # we found at least 1
+        self.explicit_formats = [0]
+        self.anomaly_list = []
+        positions = []
+        rows_by_name = {}
+        prior_number = None
+        for m in re_text_sep.finditer( self.document.full_text() ) :
+            # capture the image filename
+            fname = m.group(1)
+            if m.group(3) is not None :
+                # record proofers as a list, omitting the
+                # null element caused by the leading '\'
+                plist = m.group(3).split('\\')[1:]
+            else :
+                # sep. line with no proofers, minimal list
+                plist = ['']
+            R = len(positions)
+            if fname in rows_by_name :
+                self.anomaly_list.append( (R,
+                    'Page {0} repeats the filename {1} of page {2}'.format(
+                        R, fname, rows_by_name[fname]) ) )
+            else :
+                rows_by_name[fname] = R
+            if fname.isdigit() :
+                number = int(fname)
+                if prior_number is not None and number <= prior_number :
+                    self.anomaly_list.append( (R,
+                        'Page {0} filename {1} is out of sequence'.format(R, fname) ) )
+                prior_number = number
+            positions.append(m.start())
+            self.filename_list.append(fname)
+            self.folio_list.append( [rule,fmt,nbr] )
+            self.proofers_list.append(plist)
+            # remaining pages are ditto, add 1, next number
+            rule = C.FolioRuleAdd1
+            fmt = C.FolioFormatSame
+            nbr += 1
+        for (R, message) in self.anomaly_list :
+            pagedata_logger.warning(message)
+        if 0 < len(positions) : # we found at least 1
             self.my_book.metadata_modified(True, C.MD_MOD_FLAG)
             self._active = True
-            self._add_stopper()
+            self._set_starts(positions)
             self.PagesUpdated.emit()
 
     '''
-    Common to scan_pages and read_pages, add a search-stopper
-    sentinel to the list of cursors - see page_at() below for use.
+    Common to scan_pages and read_pages, store the page start positions
+    with a search-stopper sentinel just past the end of the document -- see
+    page_index() below for use. It is past the last position a cursor can
+    have, so that a cursor at the very end is still on the last page.
+    '''
+    def _set_starts(self, positions) :
+        self.metamgr.mark_dirty(C.MD_PT)
+        positions.append( self.document.characterCount() )
+        self.page_starts.set_positions(positions)
+        self._build_tables()
+
     '''
-    def _add_stopper(self) :
-        qtc = QTextCursor(self.document)
-        qtc.setPosition( self.document.characterCount()-1 )
-        self.cursor_list.append(qtc)
+    Also common to scan_pages and read_pages, build the filename index and
+    the folio string table. Where a filename is repeated, name_index() has
+    always found the first, so keep the first row for each name.
+    '''
+    def _build_tables(self) :
+        self.name_dict = {}
+        for (R, fname) in enumerate(self.filename_list) :
+            self.name_dict.setdefault(fname, R)
+        self.folio_strings = [''] * len(self.folio_list)
+        self._set_folio_strings(0, len(self.folio_list))
+
+    '''
+    Recompute the folio strings for rows lo to hi-1, carrying the actual
+    format down from row to row rather than looking it up for each.
+    '''
+    def _set_folio_strings(self, lo, hi) :
+        actual_fmt = self.folio_format(lo)
+        for R in range(lo, hi) :
+            [rule, fmt, number] = self.folio_list[R]
+            if fmt != C.FolioFormatSame :
+                actual_fmt = fmt
+            if rule == C.FolioRuleSkip :
+                self.folio_strings[R] = ''
+            elif actual_fmt == C.FolioFormatArabic :
+                self.folio_strings[R] = str(number)
+            else :
+                self.folio_strings[R] = utilities.to_roman(number, actual_fmt == C.FolioFormatLCRom)
 
     '''
     Metadata output: collect our data into a single Python object.
@@ -295,7 +391,7 @@ class PageData(QObject):
         if not self._active : return # don't write an empty section
         table = []
         for R in range(len(self.filename_list)):
-            posn = self.cursor_list[R].position()
+            posn = self.page_starts.position(R)
             fname = self.filename_list[R]
             plist = self.proofers_list[R]
             # proofer string with leading and delimiting backslash
@@ -314,6 +410,8 @@ class PageData(QObject):
         valid_fmt = {C.FolioFormatArabic,C.FolioFormatLCRom,C.FolioFormatUCRom,C.FolioFormatSame}
         last_fmt = C.FolioFormatArabic
         last_pos = -1 # ensure monotonically increasing positions
+        doc_size = self.document.characterCount()
+        positions = []
         self.clear()
         if not isinstance(value, list) :
             pagedata_logger.error('{} metadata must be a list of lists, ignoring it'.format(C.MD_PT))
@@ -323,9 +421,7 @@ class PageData(QObject):
                 # throws exception if not exactly 6 items
                 [P, fn, pfrs, rule, fmt, nbr] = row
                 P = int(P) # exception if not valid numeric
-                tc = QTextCursor(self.document)
-                tc.setPosition(P) # no effect if P negative or too big
-                if (tc.position() != P) or (P < last_pos) :
+                if (P < 0) or (P >= doc_size) or (P < last_pos) :
                     raise ValueError("Invalid document position")
                 last_pos = P
                 rule = int(rule) # exceptions if not numeric
@@ -334,11 +430,11 @@ class PageData(QObject):
                 if not ( (rule in valid_rule) and (fmt in valid_fmt) and (nbr >= 0) ) :
                     raise ValueError("Invalid folio info")
                 ''' All looks good, do permanent things '''
-                self.cursor_list.append(tc)
+                positions.append(P)
                 self.filename_list.append(fn)
                 self.folio_list.append( [rule, fmt, nbr] )
                 if fmt != C.FolioFormatSame :
-                    self.explicit_formats.add(len(self.folio_list)-1)
+                    self.explicit_formats.append(len(self.folio_list)-1)
                 '''
                 Get list of proofer strings, dropping opening null string
                 due to leading backslash. If it is only '\\' the result
@@ -351,13 +447,16 @@ class PageData(QObject):
                 pagedata_logger.error('  ignoring {}'.format(row))
         if 0 < len(self.filename_list) :
             self._active = True
-            self._add_stopper()
+            self._set_starts(positions)
             self.PagesUpdated.emit()
 
     def active(self) :
         return self._active
+
+    def anomalies(self) :
+        return self.anomaly_list
     ''' For page_count, use filename_list as the official length;
-    cursor_list has an extra row for the sentinel. '''
+    page_starts has an extra slot for the sentinel. '''
     def page_count(self) :
         return len(self.filename_list)
 
@@ -369,7 +468,7 @@ class PageData(QObject):
     
     imageview and editview call this every time the user moves the cursor, so
     it needs to be quick. Use binary search to find the cursor in the
-    cursor_list with the highest position less than or equal to the given
+    page_starts with the highest position less than or equal to the given
     offset. Speed the search with heuristics based on these assumptions:
     
     * we get called from multiple widgets for any one cursor move
@@ -381,9 +480,9 @@ class PageData(QObject):
     prior_R of the last-returned page.
     
         If P == prior_P : return prior_R
-        If P > cursor_list[prior_R].position(),
+        If P > page_starts.position(prior_R),
             # forward: we are on the same or higher page
-            if P < cursor_list[prior_R+1].position():
+            if P < page_starts.position(prior_R+1):
                 return prior_R # still on same page
             check if P is in page R+1
             else setup binary search between R and max
@@ -401,15 +500,16 @@ class PageData(QObject):
         ''' Cursor moved to a new position from prior_P '''
         self.prior_P = P # save for next time
         R = self.prior_R # save Python several dict lookups
+        start = self.page_starts.position
         ''' Have we moved upward or downward in the document? '''
-        if P >= self.cursor_list[R].position() :
+        if P >= start(R) :
             '''
-            Maybe we are still on the same page, i.e. still between cursor R
-            and cursor R+1? Note that the final cursor in the list is a
+            Maybe we are still on the same page, i.e. still between start R
+            and start R+1? Note that the final start in the list is a
             sentinel set to the end of the document, so this test is safe
             even if P is on or beyond the last known page
             '''
-            if P < self.cursor_list[R+1].position() :
+            if P < start(R+1) :
                 ''' still in the range of the previous page '''
                 return R # which is still == self.prior_R
             '''
@@ -417,21 +517,21 @@ class PageData(QObject):
             R+1 before doing the binary search. We know there exists a row
             R+1 because the preceding test succeeds for P in the last page.
             '''
-            if P < self.cursor_list[R+2].position() :
+            if P < start(R+2) :
                 self.prior_R = R+1 # no can't use := here
                 return self.prior_R
             '''
             Moved down past R+1, do binary search in the bottom part of
             the list
             '''
-            hi = len(self.cursor_list) - 1
+            hi = len(self.page_starts) - 1
             lo = R+1
         else :
             '''
             Moved upward in the document. Check if the user has gone off
             into text preceding the known page 1.
             '''
-            if P < self.cursor_list[0].position() :
+            if P < start(0) :
                 self.prior_R = 0 # must keep a valid row
                 return None
             '''
@@ -440,7 +540,7 @@ class PageData(QObject):
             page 0 or above it, one of the preceding tests would have
             caught it.
             '''
-            if P >= self.cursor_list[R-1].position() :
+            if P >= start(R-1) :
                 self.prior_R = R-1
                 return self.prior_R
             ''' OK, sigh, search the upper range of the list '''
@@ -449,7 +549,7 @@ class PageData(QObject):
         ''' Classic binary search for the page containing position P '''
         while lo < hi :
             mid = (lo + hi)//2
-            if P < self.cursor_list[mid].position() :
+            if P < start(mid) :
                 hi = mid
             else :
                 lo = mid + 1
@@ -462,18 +562,13 @@ class PageData(QObject):
     There is NO constraint on image filenames. Although they are
     conventionally just numbers, 0005.png, 099.png, etc., there is no
     requirement that they be numeric, or ascending: frontispiece.png,
-    indexA.png, all ok. Here we are just doing a linear search of the list.
-    
-    If linear search should become a performance problem, then during reading
-    or scanning of the page metadata we could store an inverse dict of
-    {name:row#} so we could do a quick hash lookup of any fname.
+    indexA.png, all ok. We look the name up in name_dict, built when the
+    page data was loaded.
     '''
     def name_index(self, fname):
         if self.active() :
-            for j in range(len(self.filename_list)):
-                if fname == self.filename_list[j] :
-                    return j
-        return None # no data, or fname not found
+            return self.name_dict.get(fname, None)
+        return None # no data
 
     '''
     Return page values for display by pageview. Note that returning a
@@ -491,14 +586,15 @@ class PageData(QObject):
 
     def position(self, R):
         try :
-            return self.cursor_list[R].position()
+            return self.page_starts.position(R)
         except IndexError:
             pagedata_logger.error('Invalid index {0} to position'.format(R))
             return 0
 
     def set_position(self, R, pos):
+        self.metamgr.mark_dirty(C.MD_PT)
         try :
-            self.cursor_list[R].setPosition(pos)
+            self.page_starts.set_position(R, pos)
         except :
             pagedata_logger.error('Problem setting position of page {} to {}'.format(R,pos))
 
@@ -522,21 +618,13 @@ class PageData(QObject):
 
     '''
     Return the display form of the folio number based on its value and
-    explicit format. Note we are computing folio strings from numeric on
-    demand. If this is a performance problem, they could be precomputed and
-    kept in the database -- with some extra trouble.
+    explicit format. The editview calls this on every cursor move and the
+    page table for every row it paints, so the strings are precomputed in
+    folio_strings, see _set_folio_strings() and set_folios().
     '''
     def folio_string(self, R):
         try :
-            [rule, fmt, number] = self.folio_list[R]
-            if rule == C.FolioRuleSkip :
-                return ''
-            if fmt == C.FolioFormatSame :
-                fmt = self.folio_format(R) # get actual format
-            ''' at this point format is either Arabic or roman '''
-            if fmt == C.FolioFormatArabic :
-                return str(number)
-            return utilities.to_roman(number, fmt == C.FolioFormatLCRom)
+            return self.folio_strings[R]
         except IndexError:
             pagedata_logger.error('Invalid index {0} to folio_string'.format(R))
             return ''
@@ -548,38 +636,50 @@ class PageData(QObject):
     format changes, e.g. lowercase roman at the start of the front matter,
     then arabic at the start of the body, and most other pages are "ditto".
     
-    For this reason we cache a set of the row numbers where explicit formats
-    are given, expecting them to be very few. Here we look through that set
-    for the row that is nearest above the given row. Sets are not ordered so
-    we have to look at all the items of the set. If this became a performance
-    issue there are other ways to handle it.
+    For this reason we keep a sorted list of the row numbers where explicit
+    formats are given, and find the one nearest above the given row with a
+    binary search. Row 0 is always treated as explicit.
     '''
     def folio_format(self, R):
         try :
             fmt = self.folio_list[R][1]
             if fmt == C.FolioFormatSame :
-                nearest_explicit = 0
-                for an_index in self.explicit_formats:
-                    if (an_index >= nearest_explicit) and (an_index < R) :
-                        nearest_explicit = an_index
+                j = bisect.bisect_left(self.explicit_formats, R)
+                nearest_explicit = self.explicit_formats[j-1] if j else 0
                 fmt = self.folio_list[nearest_explicit][1]
             return fmt
         except IndexError:
             pagedata_logger.error('Invalid index {0} to folio_format'.format(R))
             return C.FolioFormatArabic
 
+    '''
+    Update the folio values of row R, and the folio strings they affect: a
+    new rule or number affects only row R, but a new format affects every
+    row down to the next explicit format. Return that range of rows as
+    (R, hi) so the view can repaint it.
+    '''
     def set_folios(self, R, rule = None, fmt = None, number = None ):
         try:
+            folio = self.folio_list[R] # IndexError if R invalid
+            R = R % len(self.folio_list) # allow for R<0, as list indexes do
+            hi = R + 1
             if rule is not None :
-                self.folio_list[R][0] = rule
+                folio[0] = rule
             if fmt is not None :
-                self.folio_list[R][1] = fmt
+                folio[1] = fmt
+                j = bisect.bisect_left(self.explicit_formats, R)
+                is_explicit = j < len(self.explicit_formats) and self.explicit_formats[j] == R
                 if fmt == C.FolioFormatSame :
-                    self.explicit_formats.discard(R)
-                else :
-                    self.explicit_formats.add(R)
-            if number is not None : self.folio_list[R][2] = number
+                    if is_explicit : del self.explicit_formats[j]
+                elif not is_explicit :
+                    self.explicit_formats.insert(j, R)
+                k = bisect.bisect_right(self.explicit_formats, R)
+                hi = self.explicit_formats[k] if k < len(self.explicit_formats) else len(self.folio_list)
+            if number is not None : folio[2] = number
+            self._set_folio_strings(R, hi)
+            self.metamgr.mark_dirty(C.MD_PT)
             self.my_book.metadata_modified(True, C.MD_MOD_FLAG)
+            return (R, hi)
         except IndexError:
             pagedata_logger.error('Invalid index {0} to set_folios'.format(R))
-            pass
+            return None
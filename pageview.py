@@ -52,6 +52,10 @@ Below the top row is a table with these columns:
 Unlike tables in other panels this one cannot be sorted, it is built
 in sequence and stays that way.
 
+When the Images panel has analyzed the scan images (its Analyze button),
+the filename of a page whose scan looks blank is shown in gray, with a
+tooltip that says so.
+
 Class PageModel(QAbstractTableModel) has the usual table model method
 overrides to supply data for display (drawn from the PageData object passed
 to its __init__) and to supply column headers, row counts and so on.
@@ -76,6 +80,8 @@ from PyQt6.QtCore import (
     )
 _TR = QCoreApplication.translate
 
+from PyQt6.QtGui import QBrush
+
 from PyQt6.QtWidgets import (
     QComboBox,
     QHBoxLayout, QVBoxLayout,
@@ -127,6 +133,12 @@ Displayed names for the format codes, in sequence by C.FolioFormat*
 Not translating these, intentionally.
 '''
 FORMAT_NAMES = [ 'Arabic', 'ROMAN', 'roman', '(same)' ]
+'''
+Tooltip and color for the filename of a page with a blank scan.
+'''
+BLANK_TOOLTIP = _TR('page data table column tooltip',
+                    'The scan image of this page appears to be blank')
+BLANK_BRUSH = QBrush(Qt.GlobalColor.gray)
 # Names for the format actions, in sequence by 
 '''
 Displayed names for the folio format actions, see C.FolioRule*
@@ -140,9 +152,13 @@ data from the pagedata module. A reference to pagedata is obtained by the
 PagePanel widged and passed in to init here.
 '''
 class PageTableModel(QAbstractTableModel):
-    def __init__(self, pdata, parent=None):
+    def __init__(self, pdata, imagev, parent=None):
         super().__init__(parent)
         self.pdata = pdata # Save reference to the pagedata database
+        self.imagev = imagev # and to the Images panel, for is_blank()
+
+    def _blank(self, r):
+        return self.pdata.active() and self.imagev.is_blank(self.pdata.filename(r))
 
     def columnCount(self,index):
         global COL_ALIGNMENT # just for its length
@@ -192,10 +208,16 @@ class PageTableModel(QAbstractTableModel):
         c = index.column()
         if (role == Qt.ItemDataRole.TextAlignmentRole) :
             return COL_ALIGNMENT[c]
+        r = index.row()
         if (role == Qt.ItemDataRole.ToolTipRole) \
            or (role == Qt.ItemDataRole.StatusTipRole) :
+            if c == 0 and self._blank(r) :
+                return BLANK_TOOLTIP
             return COL_TOOLTIPS[c]
-        r = index.row()
+        if (role == Qt.ItemDataRole.ForegroundRole) :
+            if c == 0 and self._blank(r) :
+                return BLANK_BRUSH
+            return None
         if role == Qt.ItemDataRole.DisplayRole : # wants actual data
             if self.pdata.active() :
                 '''
@@ -243,24 +265,42 @@ class PageTableModel(QAbstractTableModel):
     Run through the page table and reset folio values based on the folio
     rules. This changes the numeric codes and values in the database.
     
-    The call to begin/endResetModel causes the Qt code to re-fetch displayed
-    items via data() above.
+    Only rows whose number actually changes are passed to set_folios, which
+    updates the folio string of just that row. Then the dataChanged signal
+    causes the Qt code to re-fetch the folio column of the rows between the
+    first and last changed ones via data() above.
     '''
     def update_folios(self):
-        self.beginResetModel()
         folio = 0
+        first_changed = None
+        last_changed = None
         for r in range(self.pdata.page_count()) :
             [rule,fmt,val] = self.pdata.folio_info(r)
             if rule == C.FolioRuleAdd1 :
                 folio += 1
-                self.pdata.set_folios(r, number=folio)
             elif rule == C.FolioRuleSet :
                 folio = val
-                self.pdata.set_folios(r, number=folio)
             else : # FolioRuleSkip
                 assert rule == C.FolioRuleSkip
-                # nothing to do
-        self.endResetModel()
+                continue # nothing to do
+            if folio != val :
+                self.pdata.set_folios(r, number=folio)
+                if first_changed is None : first_changed = r
+                last_changed = r
+        if first_changed is not None :
+            self.dataChanged.emit( self.index(first_changed, 3), self.index(last_changed, 3) )
+
+    '''
+    Called by the custom delegates below to store an edited value. A new
+    format changes the folio strings of every row down to the next explicit
+    format, so emit dataChanged over all the rows set_folios recomputed,
+    from the edited column through the folio column.
+    '''
+    def set_folios(self, index, **values):
+        changed = self.pdata.set_folios(index.row(), **values)
+        if changed is not None :
+            (lo, hi) = changed
+            self.dataChanged.emit( self.index(lo, index.column()), self.index(hi - 1, 3) )
 
 '''
 
@@ -309,11 +349,11 @@ class FormatDelegate(QStyledItemDelegate):
         cb.setCurrentIndex(fmt)
     '''
     Return key on combobox; data may (or may not) be changed. We are
-    helpfully given access to our data model. Reach in and use its pdata
-    reference to pagedata to set the fmt value.
+    helpfully given access to our data model. Use its set_folios() to set
+    the fmt value in pagedata and repaint the rows it affects.
     '''
     def setModelData(self,cb,model,index):
-        model.pdata.set_folios(index.row(), fmt = cb.currentIndex())
+        model.set_folios(index, fmt = cb.currentIndex())
 
 '''
 Custom delegate for column 2, folio action rule. The editor is a combobox
@@ -330,7 +370,7 @@ class RuleDelegate(QStyledItemDelegate):
         rule = index.data(Qt.ItemDataRole.UserRole) # get numeric code
         cb.setCurrentIndex(rule) # make that row active
     def setModelData(self,cb,model,index):
-        model.pdata.set_folios(index.row(), rule = cb.currentIndex())
+        model.set_folios(index, rule = cb.currentIndex())
 
 '''
 Custom delegate for column 3, the folio value. Our editor widget is a
@@ -347,7 +387,7 @@ class FolioDelegate(QStyledItemDelegate):
     def setEditorData(self,sb,index):
         sb.setValue(index.data(Qt.ItemDataRole.UserRole))
     def setModelData(self,sb,model,index):
-        model.pdata.set_folios(index.row(), number = sb.value())
+        model.set_folios(index, number = sb.value())
 
 '''
 Define the table view. The __init__ method disables word wrap and sorting,
@@ -418,6 +458,8 @@ class PagePanel(QWidget):
         self.refresh_button.clicked.connect(self.do_refresh)
         ''' Connect the actual page model's signal on metadata-read '''
         self.pdata.PagesUpdated.connect(self.do_update)
+        ''' and the Images panel's signal on new image analysis '''
+        self.my_book.get_image_view().AnalysisUpdated.connect(self.do_update)
         ''' Connect the insert button to our do_insert method '''
         self.insert_button.clicked.connect(self.do_insert)
         ''' Ask the fonts module to tell us if the mono font changes '''
@@ -504,38 +546,22 @@ class PagePanel(QWidget):
                 "OK to insert the following string into %n pages?", n=n),
             ins_text, self)
         if ok :
-            ''' get a cursor on the edit document. '''
-            tc = self.my_book.get_edit_view().get_cursor()
-            ''' Start a single undo-able operation on that cursor '''
-            tc.beginEditBlock()
             '''
-            Working from the end of the document backward, go to the
-            top of each page and insert the string.
+            Make a list of edits, each inserting the string at the top of
+            one page, with %f replaced by this folio and %i by the image
+            filename. The document applies them all as one undo-able
+            operation, and leaves each page start ahead of its inserted
+            text, so the insert begins this page, not ends the prior one.
             '''
-            for i in reversed( range( self.pdata.page_count() ) ) :
+            edits = []
+            for i in range( self.pdata.page_count() ) :
                 [rule, fmt, val] = self.pdata.folio_info(i)
                 if rule != C.FolioRuleSkip :
-                    ''' Note the page's start position and set our work cursor to it '''
                     pos = self.pdata.position(i)
-                    tc.setPosition(pos)
-                    '''
-                    Copy the insert string, replacing %f with this folio
-                    and %i with the image filename.
-                    '''
                     f_str = self.pdata.folio_string(i)
                     i_str = self.pdata.filename(i)
-                    temp = ins_text.replace('%f',f_str).replace('%i',i_str)
-                    ''' Insert that text at the position of the start of this page. '''
-                    tc.insertText(temp)
-                    '''
-                    The insertion goes in ahead of the saved cursor position,
-                    so the cursor now points after the inserted string --
-                    effectively, the insert has gone to the end of the prior
-                    page not the start of this one. Put the cursor for this
-                    page back where it was, thus preceding the inserted text.                    
-                    '''
-                    self.pdata.set_position(i, pos)
-            tc.endEditBlock() # wrap up the undo op
+                    edits.append( (pos, pos, ins_text.replace('%f',f_str).replace('%i',i_str)) )
+            self.my_book.get_edit_model().apply_edits(edits)
 
     def _uic(self):
         vbox = QVBoxLayout() # main layout
@@ -566,7 +592,7 @@ class PagePanel(QWidget):
         hbox.addWidget(self.insert_text,1) # text gets all available stretch
         hbox.addWidget(self.insert_button,0)
         vbox.addLayout(hbox, 0)
-        self.model = PageTableModel(self.pdata,self)
+        self.model = PageTableModel(self.pdata,self.my_book.get_image_view(),self)
         self.view = PageTableView(self)
         self.view.setModel(self.model)
         vbox.addWidget(self.view, 1)
@@ -0,0 +1,152 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "2.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2013, 2014, 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+'''
+Timing driver for the document parse in translators.py. Not a unit test;
+run it directly (it needs yapps2 for the old parser):
+
+    python docparse_bench.py [chapter_count]
+
+Builds a synthetic book of chapter_count chapters (default 500), each with
+a heading, paragraphs, a quote holding a poem, a table, an illustration, a
+sidenote and a footnote zone. Times the work units made by the YAPPS
+parser dpdocsyntax.DPDOC, driven through a DocParse for its actions as
+translators.py used to, against DocParse.units(), and checks they match.
+Then damages one chapter in fifty and reports the errors each one finds:
+DPDOC stops at the first.
+'''
+import sys
+import os
+import time
+my_path = os.path.realpath(__file__)
+test_path = os.path.dirname(my_path)
+ppqt_path = os.path.dirname(test_path)
+sys.path.append(ppqt_path)
+
+import translators
+import dpdocsyntax
+
+chapter_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+CHAPTER = '''
+
+
+
+CHAPTER {0}
+
+
+The opening paragraph of chapter {0}, which
+runs on for three lines of text as paragraphs
+do in a book of this kind.
+
+A second paragraph[{0}] with a footnote anchor.
+
+/Q
+A quoted paragraph.
+
+/P
+A little poem
+   in a quote
+P/
+
+Q/
+
+/T
+cell one | cell two | cell three
+cell four | cell five | cell six
+T/
+
+[Illustration:fig{0}.png A figure]
+
+[Sidenote: A sidenote]
+
+A closing paragraph.
+
+/F
+[Footnote {0}: The footnote text.]
+
+F/
+'''
+text = 'A first paragraph.\n' + ''.join( CHAPTER.format(n) for n in range(chapter_count) )
+
+'''
+Feed DPDOC the tokens from DocScanner, the way DPDOCScanner was overridden
+before DocParse ran its own tables. Every unit stays in doc_parse.pending.
+'''
+class YappsScanner( dpdocsyntax.DPDOCScanner ) :
+    def __init__( self, doc_parse ) :
+        self.doc_parse = doc_parse
+        super().__init__('')
+    def grab_input( self ) :
+        if self.pos < len( self.input ) :
+            return
+        self.pos = 0
+        try :
+            line = next( self.doc_parse.lines )
+        except StopIteration :
+            self.input = self.doc_parse.scanner.scan_end()
+            return
+        self.input = self.doc_parse.scanner.scan_line( line )
+    def get_pos( self ) :
+        return ( '', 1, self.doc_parse.scanner.line_number )
+
+def yapps_units( text ) :
+    doc_parse = translators.DocParse( text )
+    parser = dpdocsyntax.DPDOC( YappsScanner( doc_parse ) )
+    parser.doc_parse = doc_parse
+    try :
+        parser.goal()
+    except dpdocsyntax.runtime.SyntaxError as s :
+        return [ s.pos[2] ]
+    return doc_parse.pending
+
+def table_units( text ) :
+    try :
+        return list( translators.DocParse( text ).units() )
+    except translators.DocumentError as e :
+        return e.args[1].split('\n')
+
+def summary( units ) :
+    return [ ( u.lnum, u.tok, u.text, u.stuff ) for u in units ]
+
+print( '{0} chapters, {1} lines'.format( chapter_count, text.count('\n') ) )
+for ( label, parse ) in ( ( 'DPDOC', yapps_units ), ( 'DocParse', table_units ) ) :
+    t0 = time.perf_counter()
+    units = parse( text )
+    t1 = time.perf_counter()
+    print( '{0:9}: {1:.3f} seconds, {2} units'.format( label, t1 - t0, len(units) ) )
+    if label == 'DPDOC' :
+        expected = summary( units )
+    else :
+        assert summary( units ) == expected
+
+chapters = [ CHAPTER.format(n) for n in range(chapter_count) ]
+for n in range( 0, chapter_count, 50 ) :
+    chapters[n] = chapters[n].replace( 'P/\n', 'P/\n/X\n' ) # an unclosed /X
+bad_text = 'A first paragraph.\n' + ''.join( chapters )
+for ( label, parse ) in ( ( 'DPDOC', yapps_units ), ( 'DocParse', table_units ) ) :
+    t0 = time.perf_counter()
+    errors = parse( bad_text )
+    t1 = time.perf_counter()
+    print( '{0:9}: {1:.3f} seconds, {2} errors, first {3}'.format(
+        label, t1 - t0, len(errors), errors[0] ) )
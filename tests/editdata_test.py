@@ -118,3 +118,72 @@ j = 1
 for tb in the_doc.a_to_z_blocks(1,2):
     assert tb.text() == test_lines[j]
     j += 1
+
+# the table of line starts agrees with line_starts() and follows edits
+table = the_doc.line_start_table()
+assert table == [ the_doc.line_starts(a) for a in range(1, 4) ] == [0, 4, 8]
+assert the_doc.line_start_table() is table
+assert the_doc.line_starts(4) == -1
+tc = QTextCursor(the_doc)
+tc.setPosition(4)
+tc.insertText('new\n')
+assert the_doc.line_start_table() == [0, 4, 8, 12]
+the_doc.undo(tc)
+assert the_doc.line_start_table() == [0, 4, 8]
+
+# position tracker: follows edits like QTextCursors, restores on undo
+the_doc.setPlainText('0123456789\nabcdefghij\nklmnopqrst')
+tracker = the_doc.make_tracker()
+tracker.set_positions([22, 0, 11, 15])
+assert tracker.get_positions() == [22, 0, 11, 15]
+tc = QTextCursor(the_doc)
+tc.setPosition(11)
+tc.insertText('XY') # position at the insert point follows the new text
+assert tracker.get_positions() == [24, 0, 13, 17]
+tc.setPosition(5)
+tc.setPosition(20, QTextCursor.MoveMode.KeepAnchor)
+tc.removeSelectedText() # collapses 13 and 17 to 5
+assert tracker.get_positions() == [9, 0, 5, 5]
+the_doc.undo()
+assert tracker.get_positions() == [24, 0, 13, 17]
+the_doc.redo()
+assert tracker.get_positions() == [9, 0, 5, 5]
+the_doc.undo()
+tm = tracker.cursor(2)
+assert tm.selectedText() == 'abcd'
+tracker.set_position(0, 3) # out of order, re-sorts
+assert tracker.get_positions() == [3, 0, 13, 17]
+assert tm.anchor() == 13 and tm.position() == 17
+
+# typing where text was deleted, after an edit ahead of it, is not an undo
+the_doc.setPlainText('x' * 300)
+tracker.set_positions([10, 97, 102, 200])
+tc = QTextCursor(the_doc)
+tc.setPosition(100)
+tc.setPosition(105, QTextCursor.MoveMode.KeepAnchor)
+tc.removeSelectedText() # collapses 102 to 100
+tc.setPosition(50)
+tc.insertText('0123456789')
+tc.setPosition(100)
+for char in 'abcde' :
+    tc.insertText(char)
+assert tracker.get_positions() == [10, 112, 115, 210]
+the_doc.undo() # the typing
+the_doc.undo() # the insert
+the_doc.undo() # the delete, restoring 102
+assert tracker.get_positions() == [10, 97, 102, 200]
+
+# inserting text as long as a deletion, where it was, is not an undo either
+the_doc.setPlainText('x' * 100)
+tracker.set_positions([9, 18, 40])
+tc.setPosition(5)
+tc.setPosition(22, QTextCursor.MoveMode.KeepAnchor)
+tc.removeSelectedText() # collapses 9 and 18 to 5
+tc.setPosition(5)
+tc.insertText('y' * 17)
+assert tracker.get_positions() == [22, 22, 40]
+the_doc.undo() # the insert
+the_doc.undo() # the delete, restoring 9 and 18
+assert tracker.get_positions() == [9, 18, 40]
+the_doc.redo()
+assert tracker.get_positions() == [5, 5, 23]
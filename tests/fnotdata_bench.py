@@ -0,0 +1,118 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "2.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2013, 2014, 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+'''
+Timing driver for fnotdata.py. Not a unit test; run it directly:
+
+    python fnotdata_bench.py [note_count]
+
+Builds a synthetic book with note_count footnotes (default 5000) in
+chapters of 20, keyed mostly by number with a few repeated A and B keys
+some nested notes and a few unmatched anchors, and times FnoteData.refresh() on it.
+'''
+import sys
+import os
+import time
+my_path = os.path.realpath(__file__)
+test_path = os.path.dirname(my_path)
+ppqt_path = os.path.dirname(test_path)
+sys.path.append(ppqt_path)
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QSettings
+app = QApplication(sys.argv)
+app.setOrganizationName("PGDP")
+app.setOrganizationDomain("pgdp.net")
+app.setApplicationName("PPQT2")
+settings = QSettings()
+settings.clear()
+
+from mainwindow import MainWindow
+main = MainWindow(settings)
+main._new()
+book = main.open_books[main.focus_book]
+
+'''
+Make a book of note_count notes. Each chapter has a paragraph with 20
+anchors, one per line, followed by a /F..F/ zone holding the 20 notes.
+Every tenth note is keyed A and every tenth-plus-one is keyed B so that
+duplicate keys occur. Every fiftieth note contains an anchor for a nested
+note, and one note in 250 is left out to make an unmatched anchor.
+'''
+def make_book(note_count):
+    lines = []
+    n = 0
+    while n < note_count :
+        keys = []
+        for j in range( min(20, note_count - n) ) :
+            k = n + j
+            keys.append( 'A' if k % 10 == 0 else 'B' if k % 10 == 1 else str(k % 9000 + 1) )
+        lines.append('')
+        for key in keys :
+            lines.append( 'Some text of the chapter with an anchor[{0}] in it'.format(key) )
+        lines.append('')
+        lines.append('/F')
+        for (j, key) in enumerate(keys) :
+            if (n + j) % 250 == 125 :
+                continue # leave this anchor unmatched
+            lines.append('')
+            if (n + j) % 50 == 49 :
+                lines.append( '[Footnote {0}: A note with its own anchor[Z].]'.format(key) )
+                lines.append('')
+                lines.append( '[Footnote Z: The nested note.]' )
+            else :
+                lines.append( '[Footnote {0}: The text of a note which is'.format(key) )
+                lines.append( 'two lines long.]' )
+        lines.append('')
+        lines.append('F/')
+        n += len(keys)
+    return '\n'.join(lines)
+
+'''
+Stand-in for the QProgressDialog that fnotview passes to refresh.
+'''
+class Progress(object):
+    def setMaximum(self, m): pass
+    def setValue(self, v): pass
+    def reset(self): pass
+
+note_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+book.get_edit_model().setPlainText( make_book(note_count) )
+fnotm = book.get_fnot_model()
+
+t0 = time.perf_counter()
+rows = fnotm.refresh( Progress() )
+t1 = time.perf_counter()
+print( 'refresh of {0} notes: {1} rows, {2} mismatches, {3:.3f} seconds'.format(
+    note_count, rows, fnotm.mismatches(), t1 - t0 ) )
+
+t0 = time.perf_counter()
+for n in range(rows) :
+    fnotm.key(n)
+    fnotm.key_class(n)
+    fnotm.anchor_line(n)
+    fnotm.note_line(n)
+    fnotm.note_size(n)
+    fnotm.note_text(n, 40)
+t1 = time.perf_counter()
+print( 'query of all {0} rows: {1:.3f} seconds'.format( rows, t1 - t0 ) )
@@ -24,4 +24,72 @@ __email__ = "tallforasmurf@yahoo.com"
 '''
 Unit test for fnotdata.py
 '''
-assert 'implemented' == 'not yet'
+import sys
+import os
+my_path = os.path.realpath(__file__)
+test_path = os.path.dirname(my_path)
+ppqt_path = os.path.dirname(test_path)
+sys.path.append(ppqt_path)
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QSettings
+app = QApplication(sys.argv)
+app.setOrganizationName("PGDP")
+app.setOrganizationDomain("pgdp.net")
+app.setApplicationName("PPQT2")
+settings = QSettings()
+settings.clear()
+
+from mainwindow import MainWindow
+main = MainWindow(settings)
+main._new()
+book = main.open_books[main.focus_book]
+doc = book.get_edit_model()
+fnotm = book.get_fnot_model()
+
+'''
+Stand-in for the QProgressDialog that fnotview passes to refresh.
+'''
+class Progress(object):
+    def setMaximum(self, m): pass
+    def setValue(self, v): pass
+    def reset(self): pass
+
+# matched anchors and notes
+doc.setPlainText( '\n'.join( [
+    'text with an anchor[A] and[1]', '',
+    '[Footnote A: a note]', '',
+    '[Footnote 1: another', 'note of two lines]' ] ) )
+assert fnotm.refresh( Progress() ) == 2
+assert fnotm.mismatches() == 0
+assert fnotm.key(0) == 'A' and fnotm.key(1) == '1'
+assert fnotm.anchor_line(1) == 0 and fnotm.note_line(1) == 4
+assert fnotm.note_size(1) == 2
+
+# cached rows stay right through many edits, and the edit log stays short
+from PyQt6.QtGui import QTextCursor
+import fnotdata
+assert fnotm.note_text(1) == '[Footnote 1: another\u2029note of two lines]'
+tc = QTextCursor( doc )
+for n in range( 3 * fnotdata.EDIT_LOG_SIZE ) :
+    tc.movePosition( QTextCursor.MoveOperation.End )
+    tc.insertText( 'x' )
+assert len( fnotm.edit_log ) == fnotdata.EDIT_LOG_SIZE
+assert fnotm.note_line(1) == 4
+tc.setPosition( 0 )
+tc.insertText( 'new line\n' )
+assert fnotm.anchor_line(0) == 1 and fnotm.note_line(1) == 5
+tc.setPosition( doc.findBlockByNumber(6).position() )
+tc.insertText( 'now three\n' )
+assert fnotm.note_size(1) == 3
+
+# an unterminated note is not a note, but anchors after it still count
+doc.setPlainText( '\n'.join( [
+    'anchor[1] and anchor[2]', '',
+    '[Footnote 1: never closed', '',
+    'anchor[3] and', 'anchor[4] here', '',
+    '[Footnote 3: inside the unclosed one]?' ] ) )
+assert fnotm.refresh( Progress() ) == 4
+assert fnotm.mismatches() == 4
+assert [ fnotm.key(n) for n in range(4) ] == [ '1', '2', '3', '4' ]
+assert fnotm.anchor_line(3) == 5
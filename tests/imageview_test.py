@@ -117,6 +117,14 @@ load_header(mm,C.MD_IX,'')
 check_log('Invalid IMAGELINKING',logging.ERROR)
 load_header(mm,C.MD_IX,'4')
 check_log('Invalid IMAGELINKING',logging.ERROR)
+load_header(mm,C.MD_IA,'{"0001":[[1,2],false]}')
+check_log('Invalid IMAGEANALYSIS',logging.ERROR)
+load_header(mm,C.MD_IA,'{"0001":[[1,2,3,4],false],"0002":[null,true]}')
+assert iv.is_blank('0002') and not iv.is_blank('0001') and not iv.is_blank('0003')
+# one bad entry drops only itself
+load_header(mm,C.MD_IA,'{"0001":5,"0002":[null,true],"0003":[[1,2,"x",4],true]}')
+check_log('Invalid IMAGEANALYSIS entry for 0001',logging.ERROR)
+assert iv.is_blank('0002') and not iv.is_blank('0003')
 
 
 # Load the book with our test book
@@ -0,0 +1,108 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "2.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2013, 2014, 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+'''
+Typing-latency driver for journal.Journal. Not a unit test; run it
+directly:
+
+    python journal_bench.py [line_count]
+
+Builds a document of line_count lines (default 20000) and times single
+keystrokes, typed in runs of 20 at random places, with the book's journal
+idle and then recording into a journal in a temporary folder. Flushes the
+journal, replays it over the starting text, and checks the result is the
+text of the document.
+'''
+import sys
+import os
+import time
+import random
+import tempfile
+import hashlib
+my_path = os.path.realpath(__file__)
+test_path = os.path.dirname(my_path)
+ppqt_path = os.path.dirname(test_path)
+sys.path.append(ppqt_path)
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QSettings
+from PyQt6.QtGui import QTextCursor
+app = QApplication(sys.argv)
+app.setOrganizationName("PGDP")
+app.setOrganizationDomain("pgdp.net")
+app.setApplicationName("PPQT2")
+settings = QSettings()
+settings.clear()
+
+from mainwindow import MainWindow
+import journal
+main = MainWindow(settings)
+main._new()
+book = main.open_books[main.focus_book]
+doc = book.get_edit_model()
+
+line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+KEYS = 2000
+
+doc.setPlainText( '\n'.join(
+    [ 'line {0} of the book, with some words on it'.format(j)
+      for j in range(line_count) ] ) )
+
+'''
+Type KEYS single characters, in runs of 20 at random places, and return
+the mean time per keystroke in microseconds.
+'''
+def type_keys():
+    random.seed(1)
+    tc = QTextCursor(doc)
+    t0 = time.perf_counter()
+    for k in range(KEYS) :
+        if k % 20 == 0 :
+            tc.setPosition( random.randrange(doc.characterCount()) )
+        tc.insertText('x')
+    t1 = time.perf_counter()
+    return 1e6 * (t1 - t0) / KEYS
+
+print( 'journal idle:      {0:.1f} usec per key'.format( type_keys() ) )
+
+folder = tempfile.TemporaryDirectory()
+book_path = os.path.join( folder.name, 'book.txt' )
+start_text = doc.full_text()
+base = ( 'sha1', hashlib.sha1( start_text.encode() ).digest() )
+book.journal.start( book_path, base )
+print( 'journal recording: {0:.1f} usec per key'.format( type_keys() ) )
+
+t0 = time.perf_counter()
+book.journal._flush()
+journal.WRITER.submit( lambda : None ).result()
+t1 = time.perf_counter()
+print( 'flush of {0} records: {1:.1f} msec'.format( KEYS, 1e3 * (t1 - t0) ) )
+
+t0 = time.perf_counter()
+replayed = journal.read_journal( book_path + '.journal', start_text, base )
+t1 = time.perf_counter()
+print( 'replay:            {0:.1f} msec'.format( 1e3 * (t1 - t0) ) )
+if replayed != doc.full_text() :
+    print( 'replayed journal does not match the document!' )
+book.journal.close()
+journal.WRITER.submit( lambda : None ).result()
@@ -0,0 +1,154 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "2.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2013, 2014, 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+'''
+Unit test for journal.py: replaying journals written by its writer
+functions, and where a Journal keeps its file across saves.
+'''
+# -=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# Unit test module boilerplate stuff
+#
+# set up logging to a stream
+import io
+log_stream = io.StringIO()
+import logging
+logging.basicConfig(stream=log_stream,level=logging.INFO)
+def check_log(text, level):
+    '''check that the log_stream contains the given text at the given level,
+       and rewind the log, then return T/F'''
+    global log_stream
+    level_dict = {logging.DEBUG:'DEBUG',
+                  logging.INFO:'INFO',
+                  logging.WARN:'WARN',
+                  logging.ERROR:'ERROR',
+                  logging.CRITICAL:'CRITICAL'}
+    log_data = log_stream.getvalue()
+    x = log_stream.seek(0)
+    x = log_stream.truncate()
+    return (-1 < log_data.find(text)) & (-1 < log_data.find(level_dict[level]))
+
+# add .. dir to sys.path so we can import ppqt modules which
+# are up one directory level
+import sys
+import os
+path = os.path.realpath(__file__)
+path = os.path.dirname(path)
+path = os.path.dirname(path)
+sys.path.append(path)
+# -=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+import hashlib
+import tempfile
+import journal
+
+base_text = 'line one\nline two\nline three'
+base = ( 'sha1', hashlib.sha1( base_text.encode() ).digest() )
+folder = tempfile.TemporaryDirectory()
+jpath = os.path.join( folder.name, 'book.txt.journal' )
+
+# no journal, no recovery, no complaint
+assert journal.read_journal( jpath, base_text, base ) is None
+assert log_stream.getvalue() == ''
+
+# a base journal with two batches
+header = { 'base' : [ 'sha1', base[1].hex() ] }
+journal._rewrite( jpath, header, [ (5, 3, 'ONE') ], len(base_text) )
+journal._append( jpath, [ (0, 0, 'first ') , (15, 0, 'X') ], len(base_text) + 7 )
+expected = 'first line ONE\nXline two\nline three'
+assert journal.read_journal( jpath, base_text, base ) == expected
+
+# a torn last batch is dropped
+with open( jpath, 'a', encoding='UTF-8' ) as jf :
+    jf.write( '[0, 5, "gar' )
+assert journal.read_journal( jpath, base_text, base ) == expected
+
+# a batch whose length is wrong stops the replay at the batch before it
+journal._rewrite( jpath, header, [ (5, 3, 'ONE') ], len(base_text) )
+journal._append( jpath, [ (0, 0, 'first ') ], 9999 )
+assert journal.read_journal( jpath, base_text, base ) == 'line ONE\nline two\nline three'
+assert check_log( 'does not replay correctly', logging.ERROR )
+
+# a journal for some other text is refused
+other = ( 'sha1', hashlib.sha1( b'other' ).digest() )
+assert journal.read_journal( jpath, base_text, other ) is None
+assert check_log( 'another version', logging.INFO )
+
+# a checkpoint journal stands alone, but its hash is checked
+journal._checkpoint( jpath, 'checkpoint text', 'blake2b' )
+journal._append( jpath, [ (0, 10, 'new') ], 8 )
+assert journal.read_journal( jpath, base_text, other ) == 'new text'
+with open( jpath, 'r', encoding='UTF-8' ) as jf :
+    damaged = jf.read().replace( 'checkpoint text', 'checkpoint test' )
+with open( jpath, 'w', encoding='UTF-8' ) as jf :
+    jf.write( damaged )
+assert journal.read_journal( jpath, base_text, other ) is None
+assert check_log( 'checkpoint is damaged', logging.ERROR )
+
+# a journal with no edits recovers nothing
+journal._rewrite( jpath, header, [], len(base_text) )
+assert journal.read_journal( jpath, base_text, base ) is None
+journal._remove( jpath )
+assert not os.path.exists( jpath )
+
+# A Journal moves to a new path only when a save there succeeds
+from PyQt6.QtWidgets import QApplication
+app = QApplication(sys.argv)
+from PyQt6.QtGui import QTextCursor, QTextDocument
+from PyQt6.QtWidgets import QPlainTextDocumentLayout
+def drain():
+    journal.WRITER.submit( lambda : None ).result()
+document = QTextDocument()
+document.setDocumentLayout( QPlainTextDocumentLayout( document ) )
+document.setPlainText( base_text )
+document.full_text = document.toPlainText
+old_book = os.path.join( folder.name, 'old.txt' )
+new_book = os.path.join( folder.name, 'new.txt' )
+old_journal = old_book + '.journal'
+new_journal = new_book + '.journal'
+the_journal = journal.Journal( document )
+the_journal.start( old_book, base )
+tc = QTextCursor( document )
+tc.insertText( 'A' )
+the_journal._flush()
+drain()
+assert journal.read_journal( old_journal, base_text, base ) == 'A' + base_text
+# a failed Save As leaves the journal where it was, still recording
+mark = the_journal.mark( new_book )
+tc.insertText( 'B' )
+the_journal.forget( mark )
+the_journal._flush()
+drain()
+assert journal.read_journal( old_journal, base_text, base ) == 'AB' + base_text
+assert not os.path.exists( new_journal )
+# a good Save As moves it, and the old book has nothing to recover
+saved = 'AB' + base_text
+new_base = ( 'sha1', hashlib.sha1( saved.encode() ).digest() )
+mark = the_journal.mark( new_book )
+tc.insertText( 'C' )
+the_journal.restart( mark, new_base )
+drain()
+assert not os.path.exists( old_journal )
+assert journal.read_journal( new_journal, saved, new_base ) == 'ABC' + base_text
+the_journal.close()
+drain()
+assert not os.path.exists( new_journal )
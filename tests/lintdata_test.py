@@ -0,0 +1,109 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "2.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2013, 2014, 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+'''
+Unit test for lintdata.py: after any edits, the incremental check finds
+the same errors as a check of the whole text. The timer is not run; the
+test calls the timer slot until there is nothing left to check.
+'''
+import sys
+import os
+import random
+path = os.path.realpath(__file__)
+path = os.path.dirname(path)
+path = os.path.dirname(path)
+sys.path.append(path)
+
+from PyQt6.QtWidgets import QApplication
+app = QApplication( sys.argv )
+from PyQt6.QtGui import QTextCursor, QTextDocument
+from PyQt6.QtWidgets import QPlainTextDocumentLayout
+
+import lintdata
+
+def settle( lint ):
+    while lint.starts :
+        lint._check()
+
+'''
+A QTextDocument without a layout never emits contentsChange, so give each
+one the layout the editor would.
+'''
+def make_document( text ):
+    document = QTextDocument()
+    document.setDocumentLayout( QPlainTextDocumentLayout( document ) )
+    document.setPlainText( text )
+    return document
+
+def check( text ):
+    document = make_document( text )
+    lint = lintdata.MarkupLint( document )
+    settle( lint )
+    return lint.errors
+
+def edit( document, pos, removed, inserted ):
+    tc = QTextCursor( document )
+    tc.setPosition( pos )
+    tc.setPosition( pos + removed, QTextCursor.MoveMode.KeepAnchor )
+    tc.insertText( inserted )
+
+# a good document, an empty one, and a mistake
+good = '\n'.join( [ 'Para one', '', '/Q', 'quoted', 'Q/', '', '[Footnote 1: a note]', '' ] )
+assert check( good ) == []
+assert check( '' ) == []
+errors = check( good.replace( 'Q/', 'P/' ) )
+assert errors and errors[0][0] == 4 and 'PCLOSE' in errors[0][1]
+
+# edits: open a /Q and close it again, in a document long enough to have
+# many checkpoints
+document = make_document( '\n\n'.join( [ 'line {}'.format( n ) for n in range( 1000 ) ] ) )
+lint = lintdata.MarkupLint( document )
+settle( lint )
+assert lint.errors == []
+assert len( lint.marks ) > 1000 // lintdata.CHECK_LINES
+edit( document, document.findBlockByNumber( 500 ).position(), 0, '/Q\n' )
+settle( lint )
+assert lint.errors and lint.errors[0][0] > 500
+edit( document, document.findBlockByNumber( 600 ).position(), 0, 'Q/\n\n' )
+settle( lint )
+assert lint.errors == []
+assert lint.line_message( 500 ) is None
+
+# random edits agree with a fresh check
+random.seed( 1 )
+pieces = [ 'text', '', '', '/Q', 'Q/', '/P', 'P/', '/U', 'U/', ']', '/F', 'F/',
+           '[Footnote 1: a', '[Illustration: b]', '[Sidenote c', '/T', 'T/', '<tb>' ]
+for trial in range( 50 ) :
+    document = make_document( '\n'.join( random.choice( pieces ) for n in range( 300 ) ) )
+    lint = lintdata.MarkupLint( document )
+    settle( lint )
+    for n in range( 10 ) :
+        length = document.characterCount() - 1
+        pos = random.randint( 0, length )
+        removed = random.randint( 0, min( 30, length - pos ) )
+        inserted = '\n'.join( random.choice( pieces ) for n in range( random.randint( 0, 3 ) ) )
+        edit( document, pos, removed, inserted )
+        if random.random() < 0.5 :
+            settle( lint )
+    settle( lint )
+    assert lint.errors == check( document.toPlainText() )
@@ -0,0 +1,131 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "2.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2013, 2014, 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+'''
+Timing driver for metadata.py. Not a unit test; run it directly:
+
+    python metadata_bench.py [word_count]
+
+Registers writers for synthetic sections the size of a big book's: a
+WORDCENSUS of word_count words (default 30000), a PAGETABLE of 1500 pages,
+a FOOTNOTES of 2000 notes and a few small sections. Writes them to a file
+with MetaMgr.write_meta(), as JSON and as a compact container, and for
+comparison with the single json.dumps of the whole dict that write_meta()
+used to do. Reports the time, the peak memory allocated during the write
+(from tracemalloc) and the file size, then times reading the file back with
+load_meta() and checks the sections. Finally times load_meta() of each file
+with WORDCENSUS registered lazy, and the load_deferred() that finally reads it.
+'''
+import sys
+import os
+import time
+import json
+import tempfile
+import tracemalloc
+my_path = os.path.realpath(__file__)
+test_path = os.path.dirname(my_path)
+ppqt_path = os.path.dirname(test_path)
+sys.path.append(ppqt_path)
+
+from PyQt6.QtCore import QFile, QIODevice
+import utilities
+import metadata
+import constants as C
+
+word_count = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+
+sections = {
+    C.MD_VL : [ [ 'word{}'.format(n), n % 97 + 1, '', [1, 4] if n % 3 else [2] ]
+                for n in range(word_count) ],
+    C.MD_PT : [ [ n * 2000, '{:04}'.format(n), '\\\\Proofer\\\\Other', 0, 3, n ]
+                for n in range(1500) ],
+    C.MD_FN : [ [ 'N{}'.format(n), n * 900, n * 900 + 10, n * 910, n * 910 + 300 ]
+                for n in range(2000) ],
+    C.MD_CU : [ 1234, 1240 ],
+    C.MD_BI : { 'Title' : 'A Very Good Book', 'Author' : 'Someone' },
+    C.MD_GW : set( 'good{}'.format(n) for n in range(200) )
+}
+mgr = metadata.MetaMgr()
+for (section, value) in sections.items() :
+    mgr.register( section, lambda s, v, n : sections_read.__setitem__(s, v),
+                  lambda s : sections[s] )
+
+def old_write_meta(qts):
+    bookconf = { section : mgr.section_dict[section][1](section) for section in mgr.section_dict }
+    qts << json.dumps( bookconf, indent=2, cls=metadata._Extended_Encoder )
+
+def container_write_meta(qts):
+    mgr.compact = True
+    mgr.write_meta(qts)
+
+WRITERS = ( ('json.dumps of all', old_write_meta), ('write_meta', mgr.write_meta),
+            ('container', container_write_meta) )
+
+def timed_write(writer, path):
+    qfile = QFile(path)
+    qfile.open( QIODevice.OpenModeFlag.WriteOnly )
+    stream = utilities.FileBasedTextStream(qfile)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    writer(stream)
+    stream.flush()
+    t1 = time.perf_counter()
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    qfile.close()
+    return ( t1 - t0, peak, os.path.getsize(path) )
+
+folder = tempfile.mkdtemp()
+for (label, writer) in WRITERS :
+    path = os.path.join( folder, label.replace(' ','_') + '.ppqt' )
+    (secs, peak, size) = timed_write( writer, path )
+    print( '{0:18}: {1:.3f} seconds, peak {2:.1f} MB, file {3:.1f} MB'.format(
+        label, secs, peak / 2**20, size / 2**20 ) )
+    sections_read = dict()
+    qfile = QFile(path)
+    qfile.open( QIODevice.OpenModeFlag.ReadOnly )
+    t0 = time.perf_counter()
+    assert mgr.load_meta( utilities.FileBasedTextStream(qfile) ) is None
+    t1 = time.perf_counter()
+    print( '{0:18}  load {1:.3f} seconds'.format( '', t1 - t0 ) )
+    for (section, value) in sections.items() :
+        assert sections_read[section] == value
+
+lazy_mgr = metadata.MetaMgr()
+for section in sections :
+    lazy_mgr.register( section, lambda s, v, n : sections_read.__setitem__(s, v),
+                       lambda s : sections[s], lazy=(section == C.MD_VL) )
+for (label, writer) in WRITERS :
+    path = os.path.join( folder, label.replace(' ','_') + '.ppqt' )
+    sections_read = dict()
+    qfile = QFile(path)
+    qfile.open( QIODevice.OpenModeFlag.ReadOnly )
+    t0 = time.perf_counter()
+    assert lazy_mgr.load_meta( utilities.FileBasedTextStream(qfile) ) is None
+    t1 = time.perf_counter()
+    assert C.MD_VL not in sections_read
+    lazy_mgr.load_deferred( C.MD_VL )
+    t2 = time.perf_counter()
+    assert sections_read[C.MD_VL] == sections[C.MD_VL]
+    print( 'lazy load of {0}: {1:.3f} seconds, then {2} {3:.3f} seconds'.format(
+        label, t1 - t0, C.MD_VL, t2 - t1 ) )
@@ -135,10 +135,10 @@ assert pagem.folio_info(3)[0] == C.FolioRuleAdd1
 assert pagem.folio_info(3)[2] == 4
 assert pagem.folio_format(3) == C.FolioFormatArabic
 assert pagem.folio_string(3) == '4'
-pagem.set_folios(3,rule=C.FolioRuleSet,number=9)
+assert pagem.set_folios(3,rule=C.FolioRuleSet,number=9) == (3,4)
 assert pagem.folio_info(3)[0] == C.FolioRuleSet
 assert pagem.folio_string(3) == '9'
-pagem.set_folios(2,fmt=C.FolioFormatUCRom)
+assert pagem.set_folios(2,fmt=C.FolioFormatUCRom) == (2,4)
 assert pagem.folio_format(3) == C.FolioFormatUCRom
 assert pagem.folio_string(3) == 'IX'
 assert pagem.folio_info(2) == [C.FolioRuleAdd1,C.FolioFormatUCRom,3]
@@ -149,6 +149,15 @@ line_list = '''0 A \pf0\pf1\pf\u2002A\pf3\pf4 1 0 1
 20 C \pf0\pf1\pf\u2002C\pf3\pf4 0 1 3
 30 D \ 1 3 9'''.split('\n')
 check_section(mm, C.MD_PT, line_list)
+# folio strings follow changes of format in rows above
+pagem.set_folios(2,fmt=C.FolioFormatSame)
+assert pagem.folio_string(2) == '3'
+assert pagem.folio_string(3) == '9'
+assert pagem.set_folios(0,fmt=C.FolioFormatLCRom) == (0,4)
+assert pagem.folio_string(1) == 'ii'
+assert pagem.folio_string(3) == 'ix'
+pagem.set_folios(3,rule=C.FolioRuleSkip)
+assert pagem.folio_string(3) == ''
 # force various errors in read_pages and check logging
 # wrong number of items
 load_section(mm, C.MD_PT, ['0 A \pf0\pf1\pf\u2002A\pf3\pf4 1 0'])
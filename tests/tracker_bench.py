@@ -0,0 +1,103 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "2.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2013, 2014, 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+'''
+Typing-latency driver for editdata.PositionTracker. Not a unit test; run
+it directly:
+
+    python tracker_bench.py [position_count]
+
+Builds a document of position_count lines (default 5000) and times single
+keystrokes, typed in runs of 20 at random places, with no positions being
+tracked, with a QTextCursor at every line start, and with a PositionTracker
+holding every line start. Also checks that the tracker and the cursors
+agree afterward.
+'''
+import sys
+import os
+import time
+import random
+my_path = os.path.realpath(__file__)
+test_path = os.path.dirname(my_path)
+ppqt_path = os.path.dirname(test_path)
+sys.path.append(ppqt_path)
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QSettings
+from PyQt6.QtGui import QTextCursor
+app = QApplication(sys.argv)
+app.setOrganizationName("PGDP")
+app.setOrganizationDomain("pgdp.net")
+app.setApplicationName("PPQT2")
+settings = QSettings()
+settings.clear()
+
+from mainwindow import MainWindow
+main = MainWindow(settings)
+main._new()
+book = main.open_books[main.focus_book]
+doc = book.get_edit_model()
+
+position_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+KEYS = 2000
+
+def new_text():
+    doc.setPlainText( '\n'.join(
+        [ 'line {0} of the book, with some words on it'.format(j)
+          for j in range(position_count) ] ) )
+    return [ tb.position() for tb in doc.all_blocks() ]
+
+'''
+Type KEYS single characters, in runs of 20 at random places, and return
+the mean time per keystroke in microseconds.
+'''
+def type_keys():
+    random.seed(1)
+    tc = QTextCursor(doc)
+    t0 = time.perf_counter()
+    for k in range(KEYS) :
+        if k % 20 == 0 :
+            tc.setPosition( random.randrange(doc.characterCount()) )
+        tc.insertText('x')
+    t1 = time.perf_counter()
+    return 1e6 * (t1 - t0) / KEYS
+
+new_text()
+print( 'no positions:      {0:.1f} usec per key'.format( type_keys() ) )
+
+cursors = []
+for pos in new_text() :
+    qtc = QTextCursor(doc)
+    qtc.setPosition(pos)
+    cursors.append(qtc)
+print( '{0} QTextCursors: {1:.1f} usec per key'.format( position_count, type_keys() ) )
+
+tracker = doc.make_tracker()
+tracker.set_positions( [ qtc.position() for qtc in cursors ] )
+type_keys()
+if tracker.get_positions() != [ qtc.position() for qtc in cursors ] :
+    print( 'tracker and cursors disagree!' )
+cursors = []
+
+tracker.set_positions( new_text() )
+print( '{0} tracked:      {1:.1f} usec per key'.format( position_count, type_keys() ) )
@@ -0,0 +1,63 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "1.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+'''
+Unit test for the command-line handling of xltbatch.py. Translating
+itself is exercised by running it on the books in tests/Files.
+'''
+import sys
+import os
+path = os.path.realpath(__file__)
+path = os.path.dirname(path)
+path = os.path.dirname(path)
+sys.path.append(path)
+
+import xltbatch
+
+# not enough to go on
+assert xltbatch.parse_args( [] ) is None
+assert xltbatch.parse_args( [ '--translate', 'HTML' ] ) is None
+assert xltbatch.parse_args( [ 'book.txt' ] ) is None
+assert xltbatch.parse_args( [ '--translate' ] ) is None
+assert xltbatch.parse_args( [ '--translate', 'HTML', 'a.txt', '-j', 'x' ] ) is None
+
+( menu_name, options, books, out_path, jobs ) = xltbatch.parse_args(
+    [ '--translate', 'ASCII', '--options', 'max_line=70', 'Bold=omit',
+      'a.txt', '-O', 'title=A=B', 'b.txt', '-j', '3' ] )
+assert menu_name == 'ASCII'
+assert options == { 'max_line' : '70', 'Bold' : 'omit', 'title' : 'A=B' }
+assert books == [ 'a.txt', 'b.txt' ]
+assert out_path is None
+assert jobs == 3
+
+( menu_name, options, books, out_path, jobs ) = xltbatch.parse_args(
+    [ '--translate', 'HTML', 'book.txt', '-o', 'out.html' ] )
+assert books == [ 'book.txt' ] and out_path == 'out.html' and options == {}
+
+# output names
+folder = os.path.join( 'some', 'folder' )
+assert xltbatch.output_path( os.path.join( folder, 'book.txt' ), 'HTML', None, False ) \
+    == os.path.join( folder, 'book.html' )
+assert xltbatch.output_path( 'book.txt', 'HTML', 'out.htm', False ) == 'out.htm'
+assert xltbatch.output_path( os.path.join( folder, 'book.txt' ), 'ASCII', 'outs', True ) \
+    == os.path.join( 'outs', 'book.ascii' )
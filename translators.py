@@ -68,6 +68,29 @@ The methods available are:
         Book object is returned with the translated contents. If it fails,
         None is returned.
 
+For translating without the main window, see xltbatch.py, there are also:
+
+    find_translators()
+
+        Load and check all the Translators, returning their namespaces.
+
+    set_options( xlt_namespace, options )
+
+        Set the results of a Translator's OPTION_DIALOG items from a dict
+        of name=value strings, as from a command line.
+
+    load_translator( path )
+
+        Load and check the one Translator in the file at path.
+
+    run_translator( xlt_namespace, book, report, progress=None )
+
+        Parse the book and run the Translator over it, returning its output
+        streams, or None after passing any error messages to report().
+        If given, progress(done, total) is called as the Translator works
+        through the book, and if it returns False, translation stops and
+        None is returned.
+
 '''
 
 import logging
@@ -76,10 +99,15 @@ xlt_logger = logging.getLogger(name='Translator Support')
 from PyQt6.QtCore import QCoreApplication
 _TR = QCoreApplication.translate
 
+import bisect
 import os
 import types
 import regex
 import json
+import multiprocessing
+import queue
+import threading
+import time
 import paths
 import utilities
 import xlate_utils as XU
@@ -132,6 +160,33 @@ def build_xlt_menu( mainwindow, slot ):
              'Available Translators in extras/Translators folder' ) )
     submenu.setEnabled( False )
 
+    for xlt_namespace in find_translators() :
+        ''' OK, we are going to trust it. Save the namespace for use later. '''
+        xlt_index = len( _XLT_NAMESPACES )
+        _XLT_NAMESPACES.append( xlt_namespace )
+
+        ''' Build the menu action with the given name and an optional tooltip. '''
+        action = submenu.addAction( xlt_namespace.MENU_NAME )
+        action.setToolTip( getattr( xlt_namespace, 'TOOLTIP', '' ) )
+
+        ''' Save the index to the namespace as the menu action's data() '''
+        action.setData( xlt_index )
+
+        ''' Connect the action to the slot provided '''
+        action.triggered.connect( slot )
+
+        ''' The menu is not going to be empty, so make it enabled '''
+        submenu.setEnabled( True )
+
+    return submenu
+
+'''
+Load and check every Translator in extras/Translators, as described above,
+and return a list of the namespaces that pass. Used for the menu, and by
+xltbatch.py to find a Translator by its MENU_NAME.
+'''
+def find_translators( ):
+    translators = []
     '''
     Form the path to extras/Translators and try to get a list of all files in
     it. If it doesn't exist or isn't a dir, we get an error.
@@ -158,73 +213,70 @@ def build_xlt_menu( mainwindow, slot ):
         ''' Is it a python source? (Not supporting .pyc just now) '''
         if not candidate.endswith('.py') : continue
 
-        ''' Create a loader object - this throws no exceptions '''
-        xlt_logger.info( 'Loading translator module '+candidate )
-        xlt_loader = importlib.machinery.SourceFileLoader(
-            os.path.splitext( candidate )[0], candidate_path )
-
-        '''
-        Try the actual load, which executes the code and can throw exceptions
-        either directly from the loader, or uncaught exceptions thrown by the
-        loaded code. If any exceptions, skip it.
-        '''
-        xlt_logger.info( 'Executing translator into namespace '+candidate )
-        try:
-            xlt_namespace = xlt_loader.load_module()
-        except Exception as E :
-            ''' This error is only logged. It is of interest only to the
-            coder of a Translator wondering why it doesn't appear. '''
-            xlt_logger.error( 'Error loading or executing Translator {}:'.format(candidate) )
-            xlt_logger.error( str(E) )
-            continue
-
-        ''' The loaded module should have a MENU_NAME which is a string '''
-        xlt_name = getattr( xlt_namespace, 'MENU_NAME', False )
-        if not isinstance(xlt_name, str) :
-            xlt_logger.error('Translator {} has no MENU_NAME string'.format(candidate) )
-            continue
+        xlt_namespace = load_translator( candidate_path )
+        if xlt_namespace is not None :
+            translators.append( xlt_namespace )
 
-        ''' The MENU_NAME should be of reasonable length for a menu item '''
-        if ( len( xlt_name ) > 16 ) or ( len( xlt_name ) < 3 ) :
-            xlt_logger.error('Translator {} MENU_NAME too long or too short'.format(candidate) )
-            continue
-
-        '''
-        The loaded module should offer global functions initialize() and
-        translate(). If not, log an error.
-        '''
-        xlt_fun = getattr( xlt_namespace, 'initialize', False )
-        if not isinstance( xlt_fun, types.FunctionType ):
-            xlt_logger.error('Translator {} lacks initialize() member'.format(candidate) )
-            continue
-        xlt_fun = getattr( xlt_namespace, 'translate', False )
-        if not isinstance( xlt_fun, types.FunctionType ) :
-            xlt_logger.error('Translator {} lacks translate() member'.format(candidate) )
-            continue
-        xlt_fun = getattr( xlt_namespace, 'finalize', False )
-        if not isinstance( xlt_fun, types.FunctionType ) :
-            xlt_logger.error('Translator {} lacks finalize() member'.format(candidate) )
-            continue
-        ''' OK, we are going to trust it. Save the namespace for use later. '''
-        xlt_index = len( _XLT_NAMESPACES )
-        _XLT_NAMESPACES.append( xlt_namespace )
+    # end for candidate in xlt_files
+    return translators
 
-        ''' Build the menu action with the given name and an optional tooltip. '''
-        action = submenu.addAction( xlt_namespace.MENU_NAME )
-        action.setToolTip( getattr( xlt_namespace, 'TOOLTIP', '' ) )
 
-        ''' Save the index to the namespace as the menu action's data() '''
-        action.setData( xlt_index )
+'''
+Load one Translator from its file and check it as described above. Return
+its namespace, or None if it does not pass. Used by find_translators(),
+and in a worker process by xltbatch.py to load the Translator the user
+chose from the menu.
+'''
+def load_translator( candidate_path ):
+    candidate = os.path.basename( candidate_path )
+    ''' Create a loader object - this throws no exceptions '''
+    xlt_logger.info( 'Loading translator module '+candidate )
+    xlt_loader = importlib.machinery.SourceFileLoader(
+        os.path.splitext( candidate )[0], candidate_path )
 
-        ''' Connect the action to the slot provided '''
-        action.triggered.connect( slot )
+    '''
+    Try the actual load, which executes the code and can throw exceptions
+    either directly from the loader, or uncaught exceptions thrown by the
+    loaded code. If any exceptions, skip it.
+    '''
+    xlt_logger.info( 'Executing translator into namespace '+candidate )
+    try:
+        xlt_namespace = xlt_loader.load_module()
+    except Exception as E :
+        ''' This error is only logged. It is of interest only to the
+        coder of a Translator wondering why it doesn't appear. '''
+        xlt_logger.error( 'Error loading or executing Translator {}:'.format(candidate) )
+        xlt_logger.error( str(E) )
+        return None
 
-        ''' The menu is not going to be empty, so make it enabled '''
-        submenu.setEnabled( True )
+    ''' The loaded module should have a MENU_NAME which is a string '''
+    xlt_name = getattr( xlt_namespace, 'MENU_NAME', False )
+    if not isinstance(xlt_name, str) :
+        xlt_logger.error('Translator {} has no MENU_NAME string'.format(candidate) )
+        return None
 
-    # end for candidate in xlt_files
-    return submenu
+    ''' The MENU_NAME should be of reasonable length for a menu item '''
+    if ( len( xlt_name ) > 16 ) or ( len( xlt_name ) < 3 ) :
+        xlt_logger.error('Translator {} MENU_NAME too long or too short'.format(candidate) )
+        return None
 
+    '''
+    The loaded module should offer global functions initialize() and
+    translate(). If not, log an error.
+    '''
+    xlt_fun = getattr( xlt_namespace, 'initialize', False )
+    if not isinstance( xlt_fun, types.FunctionType ):
+        xlt_logger.error('Translator {} lacks initialize() member'.format(candidate) )
+        return None
+    xlt_fun = getattr( xlt_namespace, 'translate', False )
+    if not isinstance( xlt_fun, types.FunctionType ) :
+        xlt_logger.error('Translator {} lacks translate() member'.format(candidate) )
+        return None
+    xlt_fun = getattr( xlt_namespace, 'finalize', False )
+    if not isinstance( xlt_fun, types.FunctionType ) :
+        xlt_logger.error('Translator {} lacks finalize() member'.format(candidate) )
+        return None
+    return xlt_namespace
 
 '''
 
@@ -234,26 +286,39 @@ One, if the selected Translator has an OPTION_DIALOG, build it and display
 it. If the user clicks OK, store the chosen values back into the namespace
 for reference. If CANCEL, return an error.
 
-Two, parse the current document and verify its structure. In the course of
-parsing, build a list of WorkUnit objects to represent the document. If the
-document structure fails the parse, display an error to the user and exit.
-
-Three, call the Translator's initialize() method. We know it exists, but
+Two, call the Translator's initialize() method. We know it exists, but
 we do not know if its signature is appropriate, and anyhow it might have
 a bug, so we call it in a try, and fail the translation on error.
 
-Four, create an iterator over the list of work units and pass it to the
-translate() function to deal with. Again, the signature might be wrong or
-it might throw other exceptions, so guard it in a try.
+Three, start a parse of the current document, which verifies its
+structure. In the course of parsing, it makes WorkUnit objects to
+represent the document.
+
+Four, create an iterator over the work units as the parse makes them and
+pass it to the translate() function to deal with. Again, the signature
+might be wrong or it might throw other exceptions, so guard it in a try.
+If the document structure fails the parse, display an error to the user
+and exit.
 
 Five, call the Translator's finalize() method, guarding as necessary.
 
 Six, complete building a new book from the Translator's output data
 and return it.
+
+Steps two through five can take many seconds on a big book, so they run in
+a worker process, see xltbatch.translate_snapshot(). It gets a snapshot:
+the text, the page table and book facts as JSON, and the option results.
+While it works we show a progress dialog, polling the worker's queue every
+POLL_SECONDS and processing events between. If the user clicks Cancel we
+set an event the worker checks at each progress report, and if it does not
+stop within CANCEL_SECONDS, as when it is still parsing, we terminate it.
+The output comes back as one string that is put in the new book with one
+setPlainText().
 '''
+POLL_SECONDS = 0.05
+CANCEL_SECONDS = 2.0
 
 def xlt_book( source_book, xlt_index, main_window ) :
-    global WORK_UNITS
 
     '''
     Get the namespace of the chosen Translator, based on the index saved in
@@ -275,88 +340,59 @@ def xlt_book( source_book, xlt_index, main_window ) :
             return None
 
     '''
-    Perform the document parse. If it succeeds, the list of work units is
-    ready. If it fails, a message has been shown to the user and we exit.
-    '''
-    WORK_UNITS = []
-    if not _do_parse( source_book, main_window ) :
-        return None
-
-    '''
-    Initialize the translator. Create three streams. Collect the book facts
-    dict. Make a page boundary offset list filled with -1. Pass all that to
-    the initialize function to store.
+    Take the snapshot for the worker. metadata.write_section() gives one
+    section as JSON.
     '''
-    prolog = utilities.MemoryStream()
-    body = utilities.MemoryStream()
-    epilog = utilities.MemoryStream()
-    book_facts = source_book.get_book_facts()
+    source_mgr = source_book.get_meta_manager()
     source_page_model = source_book.get_page_model()
-    page_list = []
-    if source_page_model.active() :
-        page_list = [ -1 for x in range( source_page_model.page_count() ) ]
-
-    try:
-        result = xlt_namespace.initialize( prolog, body, epilog, book_facts, page_list )
-    except Exception as e :
-        m1 = _TR( 'Translator throws exception',
-                  'Unexpected error initializing translator' ) + ' ' + menu_name
-        m2 = str(e)
-        utilities.warning_msg( m1, m2, main_window )
-        xlt_logger.error('Exception from {}.initialize()'.format(menu_name))
-        xlt_logger.error(m2)
-        return None
-    if not result : return None
+    meta_texts = []
+    for section in ( C.MD_PT, C.MD_BI ) :
+        stream = utilities.MemoryStream()
+        source_mgr.write_section( stream, section )
+        stream.rewind()
+        meta_texts.append( stream.readAll() )
+    import xltbatch
+    context = multiprocessing.get_context( 'spawn' )
+    results = context.Queue()
+    cancel = context.Event()
+    worker = context.Process(
+        target=xltbatch.translate_snapshot,
+        args=( xlt_namespace.__file__,
+               [ item.result for item in ( dialog_list or [] ) ],
+               source_book.get_edit_model().full_text(),
+               meta_texts, results, cancel ) )
+    worker.start()
 
     '''
-    The translator is initialized, so call its translate() passing our
-    event_generator(), below.
+    Parse, initialize, translate and finalize happen in the worker. Any
+    error is shown to the user in a warning message. If it succeeds we
+    have the output text.
     '''
-    try:
-        event_iterator = event_generator( source_page_model, source_book.get_edit_model() )
-        result = xlt_namespace.translate( event_iterator )
-    except Exception as e :
-        m1 = _TR( 'Translator throws exception',
-                  'Unexpected error in translate() function of') + ' ' + menu_name
-        m2 = str(e)
-        utilities.warning_msg( m1, m2, main_window )
-        xlt_logger.error('Exception from {}.translate()'.format(menu_name))
-        xlt_logger.error(m2)
+    progress = utilities.make_progress(
+        _TR( 'Title of translation progress bar', 'Translating with' ) + ' ' + menu_name,
+        main_window,
+        _TR( 'Translation progress bar button', 'Cancel' ) )
+    message = _wait_for_worker( worker, results, cancel, progress )
+    progress.reset()
+    if message[0] == 'error' :
+        utilities.warning_msg( message[1], message[2], main_window )
         return None
-    if not result : return None
-
-    ''' Translating done! Finalize it. '''
-    try:
-        result = xlt_namespace.finalize( )
-    except Exception as e :
-        m1 = _TR( 'Translator throws exception',
-                  'Unexpected error in finalize() function of') + ' ' + menu_name
-        m2 = str(e)
-        utilities.warning_msg( m1, m2, main_window )
-        xlt_logger.error('Exception from {}.finalize()'.format(menu_name))
-        xlt_logger.error(m2)
+    if message[0] == 'cancelled' :
+        xlt_logger.info( 'User cancelled translation with {}'.format( menu_name ) )
         return None
-    if not result : return None
+    ( output, page_list ) = message[1:]
 
     '''
     Now put it all together as a Book. First, have mainwindow create a
-    New book and display it.
+    New book and display it. Load the translated text in one step, and
+    mark it modified so the user is asked to save it.
     '''
     new_book = main_window.do_new()
-
-    ''' Get an edit cursor and use it to insert all the translated text. '''
-
-    new_edit_view = new_book.get_edit_view()
-    qtc = new_edit_view.get_cursor()
-    prolog.rewind()
-    qtc.insertText( prolog.readAll() )
-    body.rewind()
-    qtc.insertText( body.readAll() )
-    epilog.rewind()
-    qtc.insertText( epilog.readAll() )
+    new_book.get_edit_model().setPlainText( output )
+    new_book.get_edit_model().setModified( True )
 
     ''' Position the file at the top. '''
-    new_edit_view.go_to_line_number( 1 )
+    new_book.get_edit_view().go_to_line_number( 1 )
 
     '''
     Read relevant metadata sections from the source book and install them
@@ -364,7 +400,6 @@ def xlt_book( source_book, xlt_index, main_window ) :
     metadata.load_meta() doesn't care if the stream is a single section
     or a whole file.
     '''
-    source_mgr = source_book.get_meta_manager()
     new_mgr = new_book.get_meta_manager()
 
     new_book.book_folder = source_book.book_folder # base folder
@@ -402,6 +437,141 @@ def xlt_book( source_book, xlt_index, main_window ) :
         new_mgr.load_meta( stream )
         new_book.hook_images()
 
+'''
+Wait for the translation worker to send its outcome, passing its progress
+reports to the progress dialog. Return the outcome message.
+'''
+def _wait_for_worker( worker, results, cancel, progress ) :
+    cancelled_at = None
+    while True :
+        try :
+            message = results.get( timeout=POLL_SECONDS )
+        except queue.Empty :
+            message = None
+        if message is None :
+            if not worker.is_alive() :
+                ''' it may have ended just after sending its outcome '''
+                try :
+                    message = results.get( timeout=POLL_SECONDS )
+                except queue.Empty :
+                    message = ( 'error',
+                        _TR( 'Translator process fails', 'Translation process ended unexpectedly' ),
+                        'exit code {}'.format( worker.exitcode ) )
+        elif message[0] == 'progress' :
+            progress.setMaximum( message[2] )
+            progress.setValue( message[1] )
+            message = None
+        if message is not None :
+            worker.join()
+            if cancelled_at is not None and message[0] == 'done' :
+                ''' finished before it saw the cancel: the user still said no '''
+                return ( 'cancelled', )
+            return message
+        QCoreApplication.processEvents()
+        if progress.wasCanceled() and cancelled_at is None :
+            cancel.set()
+            cancelled_at = time.monotonic()
+        if cancelled_at is not None and time.monotonic() - cancelled_at > CANCEL_SECONDS :
+            worker.terminate()
+            worker.join()
+            return ( 'cancelled', )
+
+
+'''
+Steps two through five of translating, apart from any dialog or new Book,
+so that xltbatch.py can run them without a main window. The source book
+need only offer get_edit_model(), get_page_model() and get_book_facts().
+Any error is passed to report(m1, m2) as a message and details. Return
+the prolog, body and epilog streams and the page offset list, or None.
+If progress(done, total) is given, event_generator() calls it, and when
+it returns False raises TranslationCancelled to stop the Translator.
+That is a BaseException so that a Translator's own "except Exception"
+cannot swallow it and carry on.
+'''
+class TranslationCancelled( BaseException ) :
+    pass
+
+def run_translator( xlt_namespace, source_book, report, progress=None ) :
+    menu_name = getattr( xlt_namespace, 'MENU_NAME' )
+
+    '''
+    Initialize the translator. Create three streams. Collect the book facts
+    dict. Make a page boundary offset list filled with -1. Pass all that to
+    the initialize function to store.
+    '''
+    prolog = utilities.MemoryStream()
+    body = utilities.MemoryStream()
+    epilog = utilities.MemoryStream()
+    book_facts = source_book.get_book_facts()
+    source_page_model = source_book.get_page_model()
+    page_list = []
+    if source_page_model.active() :
+        page_list = [ -1 for x in range( source_page_model.page_count() ) ]
+
+    try:
+        result = xlt_namespace.initialize( prolog, body, epilog, book_facts, page_list )
+    except Exception as e :
+        m1 = _TR( 'Translator throws exception',
+                  'Unexpected error initializing translator' ) + ' ' + menu_name
+        m2 = str(e)
+        report( m1, m2 )
+        xlt_logger.error('Exception from {}.initialize()'.format(menu_name))
+        xlt_logger.error(m2)
+        return None
+    if not result : return None
+
+    '''
+    The translator is initialized, so call its translate() passing our
+    event_generator(), below, over the work units of a document parse.
+    The parse goes on while the Translator works. If the Translator
+    returns before it has all the events, finish the parse anyway, as a
+    structure error anywhere means the output is no good.
+    '''
+    edit_model = source_book.get_edit_model()
+    doc_parse = DocParse( edit_model.full_text() )
+    units = doc_parse.units()
+    try:
+        event_iterator = event_generator( source_page_model, edit_model, units, progress )
+        result = xlt_namespace.translate( event_iterator )
+        if result :
+            for unit in units : pass
+    except TranslationCancelled :
+        xlt_logger.info('Translation by {} cancelled'.format(menu_name))
+        return None
+    except DocumentError as e :
+        report( *e.args )
+        return None
+    except Exception as e :
+        m1 = _TR( 'Translator throws exception',
+                  'Unexpected error in translate() function of') + ' ' + menu_name
+        m2 = str(e)
+        report( m1, m2 )
+        xlt_logger.error('Exception from {}.translate()'.format(menu_name))
+        xlt_logger.error(m2)
+        return None
+    finally :
+        units.close() # stop the parse if it is still going
+    if doc_parse.error is not None :
+        ''' the Translator caught the DocumentError itself '''
+        report( *doc_parse.error.args )
+        return None
+    if not result : return None
+
+    ''' Translating done! Finalize it. '''
+    try:
+        result = xlt_namespace.finalize( )
+    except Exception as e :
+        m1 = _TR( 'Translator throws exception',
+                  'Unexpected error in finalize() function of') + ' ' + menu_name
+        m2 = str(e)
+        report( m1, m2 )
+        xlt_logger.error('Exception from {}.finalize()'.format(menu_name))
+        xlt_logger.error(m2)
+        return None
+    if not result : return None
+
+    return ( prolog, body, epilog, page_list )
+
 
 ''' Get one section's json from the source, and load it into the target. '''
 
@@ -571,6 +741,54 @@ def _unload_widget( item, widget ) :
     else: # error
         item.result = None
 
+'''
+Without a dialog, as in xltbatch.py, set the result of dialog items from a
+dict of {name : value string}. An item is named by the Translator global it
+is assigned to, with or without a "DI_" prefix, or by its label, in any
+case. A checkbox value is yes/no, true/false, on/off or 1/0; a number is
+an integer; a choice is the label of a choice or its index. Return a list
+of error messages, empty if all went well.
+'''
+def set_options( xlt_namespace, options ) :
+    dialog_list = getattr( xlt_namespace, 'OPTION_DIALOG', None ) or []
+    names = {}
+    for ( global_name, value ) in vars( xlt_namespace ).items() :
+        if isinstance( value, XU.Dialog_Item ) and value in dialog_list :
+            names[ global_name.lower() ] = value
+            if global_name.lower().startswith( 'di_' ) :
+                names[ global_name[3:].lower() ] = value
+    for item in dialog_list :
+        if item.kind != 'error' :
+            names.setdefault( item.label.lower(), item )
+    errors = []
+    for ( key, text ) in options.items() :
+        item = names.get( key.lower() )
+        if item is None :
+            errors.append( 'no option named {}'.format( key ) )
+            continue
+        try :
+            if item.kind == 'checkbox' :
+                if text.lower() not in ( 'yes', 'true', 'on', '1', 'no', 'false', 'off', '0' ) :
+                    raise ValueError
+                item.result = text.lower() in ( 'yes', 'true', 'on', '1' )
+            elif item.kind == 'string' :
+                item.result = text
+            elif item.kind == 'number' :
+                value = int( text )
+                if ( item.minimum is not None and value < item.minimum ) \
+                or ( item.maximum is not None and value > item.maximum ) :
+                    raise ValueError
+                item.result = value
+            else : # choice
+                labels = [ lbl.lower() for ( lbl, tip ) in item.choices ]
+                value = labels.index( text.lower() ) if text.lower() in labels else int( text )
+                if value < 0 or value >= len( item.choices ) :
+                    raise ValueError
+                item.result = value
+        except ValueError :
+            errors.append( 'invalid value {} for option {}'.format( text, key ) )
+    return errors
+
 #         End of option dialog code.
 
 '''
@@ -578,152 +796,491 @@ def _unload_widget( item, widget ) :
 
 The following elaborate and sophisticated (if I do say so) machinery allows
 a formal definition of the structure of a DP document as augmented by my
-rules. The syntax definition is in dpdocsyntax.g. This is processed by the
-YAPPS2 parser generator to produce dpdocsyntax.py, which contains
-DPDOCScanner, a token scanner, and DPDOC, the generated parser.
+rules. The syntax definition is in dpdocsyntax.g. This was processed by the
+YAPPS2 parser generator to produce dpdocsyntax.py, a recursive-descent
+parser, DPDOC. That is too slow for a big book, and stops at the first
+error, so the grammar is now also written out in GRAMMAR, below, as tables
+for a push-down automaton, which DocParse runs in one pass over the tokens
+of the lines. The tables make the same choices as DPDOC, so the two accept
+the same documents and find the first error on the same line. DPDOC is kept
+for reference and for tests/docparse_bench.py, which compares them.
 
 While doing the parse we generate Work Units which will be fed into the
-selected Translator as Events. When the parse succeeds we know the document
-structure is valid with all blocks properly nested and closed.
+selected Translator as Events. One parse is a DocParse object, which holds
+all its state, so that nothing is kept in globals and any number of parses
+can be under way at once.
+
+The parse does not build a list of the whole book. It runs on a thread of
+its own, and hands the Work Units to event_generator() in batches of
+UNIT_BATCH as soon as the parse is done with them, through a queue of at
+most BATCHES_AHEAD batches. A unit is done with once nothing can change it:
+a unit is held while it is the last one (open_para() may insert ahead of
+it), and all units are held while a heading is open (close_head() has yet
+to set its code). So the units in memory at once are a few batches plus
+one heading, however long the book.
+
+After a structure error the parse goes on, to find any more errors, but
+hands on no more units and calls none of the grammar actions. It recovers
+by dropping rules from its stack until one can take the token in error, or
+if none can, skipping that token. One mistake can upset the parse for a
+few lines, so another error is only reported once RECOVER_SHIFTS tokens
+have been taken since the last.
+
+A DocParse made with keep_units False only checks the structure, for
+lintdata.py: it keeps no units but the last, and calls the actions even
+after an error, so that its state between lines depends only on the lines
+before. state() returns that state as a value, and restore() resumes from
+one, so a check can start anywhere it has been before.
+
+Because the Translator starts on the first units while the rest of the book
+is still being parsed, a structure error may be found after it has seen
+some events. Then, at the end of the parse, DocParse.units() raises
+DocumentError, carrying the message and the list of errors, up to
+MAX_ERRORS of them, and run_translator() reports it as before.
 '''
-
-def _do_parse( book, mainwindow ) :
-    global WORK_UNITS
-    import yapps_runtime
-
-    edit_model = book.get_edit_model()
-    scanner = DocScanner( edit_model.all_lines() )
-    parser = dpdocsyntax.DPDOC( scanner )
-    good_parse = False
-    try:
-        x = parser.goal()
-        good_parse = True
-    except yapps_runtime.SyntaxError as s:
-        m1 = _TR('Checking document structure',
-                 'Document structure error around line') + ' {}'
-        m2 = 'Processing {}\n{}'.format( s.context.rule, s.msg )
-        utilities.warning_msg(
-            m1.format(s.pos[2]), info=m2, parent=mainwindow )
-    except Exception as e:
-        m1 = _TR('Checking document structure',
-                 'Unknown error parsing document')
-        m2 = str(e)
-        xlt_logger.error(m1)
-        xlt_logger.error(m2)
-        utilities.warning_msg( m1, info=m2, parent=mainwindow )
-    # whatever, clean up if there is a failure.
-    if not good_parse :
-        WORK_UNITS = []
-    return good_parse
+UNIT_BATCH = 200
+BATCHES_AHEAD = 4
+MAX_ERRORS = 100
+RECOVER_SHIFTS = 3
 
 '''
-Define a WorkUnit. One is created for each non-empty line of the document
-and eventually gets fed to the Translator as an Event.
+The grammar tables. GRAMMAR[rule] is a list of states, and each state is
+a dict from a token, one of the characters in TOKEN_VALUE below, or ']'
+or '$' for the close of a bracket group and END, to a move:
+
+    (SHIFT, state, action)  take the token, then go to state in this rule,
+                            or if state is None, return from this rule.
+    (CALL, rule, state, action) leave the token for rule; when it returns
+                            go to state, or if None, return from this rule.
+    (GOTO, state)           leave the token and go to state.
+    (RETURN,)               leave the token and return from this rule.
+
+An action, if not None, is the name of a DocParse method, with its
+arguments, called after the SHIFT, or when the CALLed rule returns. The
+key ANY is the move for any other token. A token with no move is an error.
 '''
-class WorkUnit( object ) :
-    __slots__ = ['lnum','tok','text','stuff']
-    def __init__ ( self, lnum, tok, text ) :
-        self.lnum = lnum # actual line number in document
-        self.tok = tok   # the parser token or later, event code
-        self.text = text # full text of the line
-        self.stuff = { 'F':0, 'L':0, 'R':0 }
-    def __repr__( self ) :
-        # __repr__ used only in testing
-        return '''WorkUnit( lnum={}, tok="{}", text="{}" )'''.format(
-            self.lnum, self.tok, self.text )
-    def copy( self ) :
-        return WorkUnit(self.lnum, self.tok, '')
+SHIFT = 0
+CALL = 1
+GOTO = 2
+RETURN = 3
+ANY = None
+OPTIONAL_EMPTY = { 'E' : ( SHIFT, None, None ), ANY : ( RETURN, ) }
+FIRST = { 'NOFILL' : 'X', 'RIGHT' : 'R', 'CENTER' : 'C', 'TABLE' : 'T',
+          'POEM' : 'P', 'PARA' : 'L', 'HEAD' : 'E', 'ULIST' : 'U', 'QUOTE' : 'Q',
+          'FIGURE' : 'I', 'SNOTE' : 'S', 'FNOTE' : 'F', 'FZONE' : 'N', 'TBREAK' : '%' }
+
+''' The moves to call any of rules and come back to state, and others. '''
+def _calls( rules, state, **others ) :
+    moves = { FIRST[ rule ] : ( CALL, rule, state, None ) for rule in rules }
+    for ( token, move ) in others.items() :
+        moves[ token.replace( 'BCLOSE', ']' ).replace( 'END', '$' ) ] = move
+    return moves
+
+''' The no-fill blocks: OPEN ( LINE | EMPTY )* CLOSE EMPTY? '''
+def _block( opener, closer ) :
+    return [ { opener : ( SHIFT, 1, None ) },
+             { 'L' : ( SHIFT, 1, None ), 'E' : ( SHIFT, 1, None ),
+               closer : ( SHIFT, 2, None ) },
+             OPTIONAL_EMPTY ]
+
+GOAL_ITEMS = ( 'NOFILL', 'RIGHT', 'CENTER', 'TABLE', 'POEM', 'PARA', 'HEAD',
+               'QUOTE', 'FIGURE', 'SNOTE', 'FNOTE', 'FZONE', 'ULIST', 'TBREAK' )
+QUOTE_ITEMS = ( 'PARA', 'POEM', 'RIGHT', 'CENTER', 'ULIST', 'QUOTE' )
+NOTE_ITEMS = ( 'PARA', 'POEM', 'TABLE', 'QUOTE', 'ULIST' )
+
+GRAMMAR = {
+    'NOFILL' : _block( 'X', 'x' ),
+    'RIGHT' : _block( 'R', 'r' ),
+    'CENTER' : _block( 'C', 'c' ),
+    'TABLE' : _block( 'T', 't' ),
+    'POEM' : _block( 'P', 'p' ),
+    'TBREAK' : [ { '%' : ( SHIFT, 1, None ) }, OPTIONAL_EMPTY ],
+    'PARA' : [ { 'L' : ( SHIFT, 1, ( 'open_para', ) ) },
+               { 'L' : ( SHIFT, 1, None ),
+                 'E' : ( SHIFT, None, ( 'close_para', ) ),
+                 '$' : ( SHIFT, None, ( 'close_para', ) ) } ],
+    'HEAD' : [ { 'E' : ( SHIFT, 1, ( 'open_head', ) ) },
+               { 'L' : ( CALL, 'PARA', None, ( 'close_head', 3 ) ),
+                 'E' : ( SHIFT, 2, None ) },
+               { 'E' : ( SHIFT, 3, None ) },
+               { 'L' : ( CALL, 'PARA', 4, None ) },
+               { 'L' : ( CALL, 'PARA', 4, None ),
+                 'E' : ( SHIFT, None, ( 'close_head', 2 ) ) } ],
+    'ULIST' : [ { 'U' : ( SHIFT, 1, None ) },
+                _calls( [ 'PARA' ], 1, E=( SHIFT, 1, None ), u=( SHIFT, 2, None ) ),
+                OPTIONAL_EMPTY ],
+    'QUOTE' : [ { 'Q' : ( SHIFT, 1, None ) },
+                _calls( QUOTE_ITEMS, 2, E=( SHIFT, 2, None ) ),
+                _calls( QUOTE_ITEMS, 2, E=( SHIFT, 2, None ), q=( SHIFT, 3, None ) ),
+                OPTIONAL_EMPTY ],
+    'FIGURE' : [ { 'I' : ( SHIFT, 1, None ) },
+                 _calls( NOTE_ITEMS, 2, E=( SHIFT, 2, None ) ),
+                 _calls( NOTE_ITEMS, 2, E=( SHIFT, 2, None ), BCLOSE=( SHIFT, 3, ( 'close_note', ) ) ),
+                 OPTIONAL_EMPTY ],
+    'SNOTE' : [ { 'S' : ( SHIFT, 1, None ) },
+                _calls( [ 'PARA' ], 2 ),
+                _calls( [ 'PARA' ], 2, BCLOSE=( SHIFT, 3, ( 'close_note', ) ) ),
+                OPTIONAL_EMPTY ],
+    'FNOTE' : [ { 'F' : ( SHIFT, 1, None ) },
+                _calls( NOTE_ITEMS, 2 ),
+                _calls( NOTE_ITEMS, 2, BCLOSE=( SHIFT, 3, ( 'close_note', ) ) ),
+                OPTIONAL_EMPTY ],
+    'FZONE' : [ { 'N' : ( SHIFT, 1, None ) },
+                { 'E' : ( CALL, 'HEAD', 1, ( 'check_head', ) ),
+                  'F' : ( CALL, 'FNOTE', 1, None ),
+                  'n' : ( SHIFT, 2, None ) },
+                OPTIONAL_EMPTY ],
+    'goal' : [ { 'E' : ( SHIFT, 0, None ), ANY : ( GOTO, 1 ) },
+               _calls( GOAL_ITEMS, 2 ),
+               _calls( GOAL_ITEMS, 2, END=( SHIFT, None, None ) ) ]
+    }
+
+class DocumentError( Exception ) :
+    pass
 
-WORK_UNITS = [] # units appended in the scanner.grab_input()
-HEAD_UNIT = None # last HEAD2/3 unit appended, see check_head below.
+class _ParseStopped( Exception ) :
+    pass
 
 '''
-Small functions called out of the parser at special transitions in the
-parse. These are named in the grammer file dpdocsyntax.g, and so they
-are also named in dpdocsyntax.DPDOC. However they are not available
-in that namespace until we insert them.
+Iterate over the lines of the text, as editdata.all_lines() would over the
+textblocks of the document, without a list of them.
 '''
-def open_para():
-    global WORK_UNITS, HEAD_UNIT
+def _text_lines( text ) :
+    start = 0
+    end = text.find( '\n' )
+    while end >= 0 :
+        yield text[ start : end ]
+        start = end + 1
+        end = text.find( '\n', start )
+    yield text[ start : ]
+
+class DocParse( object ) :
+    def __init__( self, text, keep_units=True ) :
+        self.lines = _text_lines( text )
+        self.keep_units = keep_units # False to only check the structure
+        self.scanner = DocScanner( self )
+        self.stack = [ [ 'goal', 0, None ] ]
+        self.pending = [] # units made but not yet handed on
+        self.head_unit = None # HEAD2/3 unit of a heading being parsed
+        self.last_head = None # the HEAD2/3 unit of the last heading closed
+        self.saved_close = None # QCLOSE/UCLOSE unit deferred by the scanner
+        self.rule = None # the rule being parsed, for error messages
+        self.errors = [] # ( line number, message ) of structure errors
+        self.quiet = 0 # tokens to take before reporting another error
+        self.batches = queue.Queue( BATCHES_AHEAD )
+        self.stopping = False
+        self.error = None # the DocumentError, if the parse failed
+
+    '''
+    Iterate over the Work Units of the document, starting the parse thread
+    on the first call. If the parse fails, raise DocumentError. If the
+    caller stops early, stop the parse and wait for its thread to end.
+    '''
+    def units( self ) :
+        thread = threading.Thread( target=self._run, daemon=True )
+        thread.start()
+        try :
+            while True :
+                batch = self.batches.get()
+                if batch is None :
+                    return
+                if isinstance( batch, DocumentError ) :
+                    self.error = batch
+                    raise batch
+                yield from batch
+        finally :
+            self.stopping = True
+            while thread.is_alive() :
+                try :
+                    self.batches.get( timeout=0.1 )
+                except queue.Empty :
+                    pass
+            thread.join()
+
+    ''' The parse thread: run the parse, pass on units, then an end mark. '''
+    def _run( self ) :
+        try:
+            self.parse()
+        except _ParseStopped :
+            return
+        except Exception as e:
+            m1 = _TR('Checking document structure',
+                     'Unknown error parsing document')
+            m2 = str(e)
+            xlt_logger.error(m1)
+            xlt_logger.error(m2)
+            self._fail( m1, m2 )
+            return
+        if self.errors :
+            m1 = _TR('Checking document structure',
+                     'Document structure error around line') + ' {}'
+            m2 = '\n'.join( 'line {}: {}'.format( *error ) for error in self.errors )
+            self._fail( m1.format( self.errors[0][0] ), m2 )
+        else :
+            self._release( len( self.pending ) )
+            self.batches.put( None )
+
+    def _fail( self, m1, m2 ) :
+        if not self.stopping :
+            self.batches.put( DocumentError( m1, m2 ) )
+
+    '''
+    Run the grammar tables over the tokens of the document, a line at a
+    time. The stack holds a [rule, state, action] for each rule being
+    parsed; action is to be called when the rule it CALLed returns. Each
+    token is pushed through the tables by take() before the next line is
+    scanned, which is when DPDOC would read it, so the units of a line are
+    made after the actions for the tokens before it, as the actions expect.
+    '''
+    def parse( self ) :
+        for line in self.lines :
+            self.check_line( line )
+        self.check_end()
+
+    def check_line( self, line ) :
+        self.next_line()
+        for token in self.scanner.scan_line( line ) :
+            self.take( token )
+
+    def check_end( self ) :
+        while self.stack :
+            self.next_line()
+            self.take( self.scanner.scan_end() )
+
+    '''
+    Make the moves for one token, until it is taken or skipped.
     '''
-    last work unit was a LINE which starts a Paragraph, need to insert a
-    POPEN action ahead of it. If this is also the paragraph that starts
-    a heading, stick a copy of the LINE's text into it.
+    def take( self, token ) :
+        stack = self.stack
+        while stack :
+            frame = stack[-1]
+            self.rule = frame[0]
+            table = GRAMMAR[ frame[0] ][ frame[1] ]
+            move = table[ token ] if token in table else table.get( ANY )
+            if move is None :
+                self._syntax_error( token, table )
+                if not self._recover( stack, token ) :
+                    if token == '$' :
+                        del stack[:]
+                    return # skip it
+                continue
+            kind = move[0]
+            if kind == SHIFT :
+                if self.quiet : self.quiet -= 1
+                if move[2] is not None : self._act( move[2] )
+                if move[1] is None :
+                    self._return( stack )
+                else :
+                    frame[1] = move[1]
+                return
+            elif kind == CALL :
+                frame[1] = move[2]
+                frame[2] = move[3]
+                stack.append( [ move[1], 0, None ] )
+            elif kind == GOTO :
+                frame[1] = move[1]
+            else : # RETURN
+                self._return( stack )
+
     '''
-    unit = WORK_UNITS[-1].copy()
-    unit.tok = XU.Events.OPEN_PARA
-    WORK_UNITS.insert( len(WORK_UNITS)-1, unit)
-    if HEAD_UNIT :
-        if HEAD_UNIT.text == '' :
-            HEAD_UNIT.text = WORK_UNITS[-1].text
-
-SAVED_CLOSE = None
-def close_para():
-    global WORK_UNITS, SAVED_CLOSE
+    The state of the parse between lines, as a value that can be compared
+    and given to restore() to carry on from there: the stack, the scanner's
+    bracket switch, and the codes of the units the actions and the scanner
+    look at. Only a check, keep_units False, can be restored, as the units
+    themselves are not kept.
     '''
-    end of para, append a PCLOSE action.
+    def state( self ) :
+        return ( tuple( tuple( frame ) for frame in self.stack ),
+                 self.scanner.find_bracket,
+                 self.last().tok,
+                 None if self.head_unit is None else self.head_unit.tok,
+                 None if self.last_head is None else self.last_head.tok,
+                 None if self.saved_close is None else self.saved_close.tok,
+                 self.quiet )
+
+    def restore( self, state, line_number ) :
+        ( stack, self.scanner.find_bracket, last_tok, head_tok, last_head_tok,
+          close_tok, self.quiet ) = state
+        self.stack = [ list( frame ) for frame in stack ]
+        self.scanner.line_number = line_number
+        self.pending = [ WorkUnit( line_number, last_tok, '' ) ] if last_tok else []
+        self.head_unit = None if head_tok is None else WorkUnit( line_number, head_tok, '' )
+        self.last_head = None if last_head_tok is None else WorkUnit( line_number, last_head_tok, '' )
+        self.saved_close = None if close_tok is None else WorkUnit( line_number, close_tok, '' )
+        self.errors = []
+
     '''
-    unit = WORK_UNITS[-1].copy()
-    unit.tok = XU.Events.CLOSE_PARA
-    WORK_UNITS.append(unit)
-    if SAVED_CLOSE :
-        WORK_UNITS.append(SAVED_CLOSE)
-        SAVED_CLOSE = None
-
-def open_head():
-    global WORK_UNITS, HEAD_UNIT
+    Pop the rule that has ended, and any that end with it, calling the
+    actions waiting for them.
     '''
-    an EMPTY has been scanned, a head will be recognized.
-    add an empty work unit as a place-holder.
+    def _return( self, stack ) :
+        stack.pop()
+        while stack :
+            frame = stack[-1]
+            if frame[2] is not None :
+                self.rule = frame[0]
+                self._act( frame[2] )
+                frame[2] = None
+            if frame[1] is not None :
+                break
+            stack.pop()
+
+    def _act( self, action ) :
+        if not ( self.keep_units and self.errors ) :
+            getattr( self, action[0] )( *action[1:] )
+
     '''
-    unit = WORK_UNITS[-1].copy()
-    WORK_UNITS.append(unit)
-    HEAD_UNIT = unit
+    After an error, drop rules from the stack until one can take the token,
+    and return True; or False if none can.
+    '''
+    def _recover( self, stack, token ) :
+        for depth in range( len( stack ) - 1, -1, -1 ) :
+            ( rule, state, action ) = stack[ depth ]
+            if state is not None and token in GRAMMAR[ rule ][ state ] :
+                del stack[ depth+1 : ]
+                stack[ depth ][2] = None
+                return True
+        return False
+
+    def _error( self, message ) :
+        if len( self.errors ) < MAX_ERRORS :
+            self.errors.append( ( self.scanner.line_number,
+                                  'processing {}, {}'.format( self.rule, message ) ) )
+
+    def _syntax_error( self, token, table ) :
+        if self.quiet :
+            return
+        self.quiet = RECOVER_SHIFTS
+        expected = sorted( _token_name( tok ) for tok in table if tok is not ANY )
+        self._error( 'found {} where {} expected'.format(
+            _token_name( token ), ' or '.join( expected ) ) )
 
-def close_head(level):
-    global WORK_UNITS, HEAD_UNIT
     '''
-    modify the work unit created by open_head() to reflect the type of head
-    just scanned, HEAD2 or HEAD3; and append a close-head unit.
+    Hand on the first count pending units. Called with the pending units
+    that are done with, see above, or all of them at the end. Waits while
+    the consumer is BATCHES_AHEAD batches behind.
     '''
-    HEAD_UNIT.tok = str(level)
-    unit = HEAD_UNIT.copy()
-    unit.tok = str(level+2)
-    WORK_UNITS.append(unit)
-    HEAD_UNIT = None
-
-def check_head() :
-    global WORK_UNITS
+    def _release( self, count ) :
+        if count :
+            self.batches.put( self.pending[ : count ] )
+            del self.pending[ : count ]
+
     '''
-    a HEAD2/3 has just closed in the context of a footnote
-    landing zone. If it was a Head2 (Chapter) throw an
-    exception; that is a no-no.
+    Called as the scanner starts each line: stop if the consumer has gone
+    away, and hand on a batch of units if one is ready. After an error,
+    units are only kept for the scanner to look at the last one, and
+    likewise always in a check.
     '''
-    if HEAD_UNIT.tok != '3' :
-        raise SyntaxError
+    def next_line( self ) :
+        if self.stopping :
+            raise _ParseStopped
+        if not self.keep_units :
+            del self.pending[ : -1 ]
+        elif len( self.pending ) > UNIT_BATCH :
+            if self.errors :
+                del self.pending[ : -1 ]
+            elif self.head_unit is None :
+                self._release( len( self.pending ) - 1 )
+
+    def append( self, unit ) :
+        self.pending.append( unit )
+
+    def last( self ) :
+        return self.pending[-1] if self.pending else WorkUnit( 0, '', '' )
 
-def close_note() :
-    global WORK_UNITS
     '''
-    A "]" has been parsed ending a Sidenote, Footnote or Illustration.
-    Push a work unit to that effect. Get the line number from the
-    previous work unit. If it has already happened, don't repeat it.
+    Small functions called out of the parser at special transitions in the
+    parse. These are named in the grammar file dpdocsyntax.g, which calls
+    them as self.doc_parse.open_para() and so on, and in GRAMMAR.
     '''
-    if WORK_UNITS[-1].tok != ']' :
-        unit = WorkUnit( WORK_UNITS[-1].lnum, ']', '' )
-        WORK_UNITS.append( unit )
+    def open_para( self ):
+        '''
+        last work unit was a LINE which starts a Paragraph, need to insert a
+        POPEN action ahead of it. If this is also the paragraph that starts
+        a heading, stick a copy of the LINE's text into it.
+        '''
+        unit = self.pending[-1].copy()
+        unit.tok = XU.Events.OPEN_PARA
+        self.pending.insert( len(self.pending)-1, unit)
+        if self.head_unit :
+            if self.head_unit.text == '' :
+                self.head_unit.text = self.pending[-1].text
+
+    def close_para( self ):
+        '''
+        end of para, append a PCLOSE action.
+        '''
+        unit = self.last().copy()
+        unit.tok = XU.Events.CLOSE_PARA
+        self.pending.append(unit)
+        if self.saved_close :
+            self.pending.append(self.saved_close)
+            self.saved_close = None
+
+    def open_head( self ):
+        '''
+        an EMPTY has been scanned, a head will be recognized.
+        add an empty work unit as a place-holder.
+        '''
+        unit = self.last().copy()
+        self.pending.append(unit)
+        self.head_unit = unit
+
+    def close_head( self, level ):
+        '''
+        modify the work unit created by open_head() to reflect the type of head
+        just scanned, HEAD2 or HEAD3; and append a close-head unit.
+        '''
+        self.head_unit.tok = str(level)
+        unit = self.head_unit.copy()
+        unit.tok = str(level+2)
+        self.pending.append(unit)
+        self.last_head = self.head_unit
+        self.head_unit = None
+
+    def check_head( self ) :
+        '''
+        a HEAD2/3 has just closed in the context of a footnote
+        landing zone. If it was a Head2 (Chapter) throw an
+        exception; that is a no-no.
+        '''
+        if self.last_head is not None and self.last_head.tok != '3' :
+            self._error( 'found a chapter heading in a footnote zone' )
+
+    def close_note( self ) :
+        '''
+        A "]" has been parsed ending a Sidenote, Footnote or Illustration.
+        Push a work unit to that effect. Get the line number from the
+        previous work unit. If it has already happened, don't repeat it.
+        '''
+        if self.last().tok != ']' :
+            unit = WorkUnit( self.last().lnum, ']', '' )
+            self.pending.append( unit )
 
 '''
-Import the code generated by YAPPS as a namespace. Insert into that
-namespace the names of the above functions.
+Define a WorkUnit. One is created for each non-empty line of the document
+and eventually gets fed to the Translator as an Event.
 '''
-import dpdocsyntax
-dpdocsyntax.open_para = open_para
-dpdocsyntax.close_para = close_para
-dpdocsyntax.open_head = open_head
-dpdocsyntax.close_head = close_head
-dpdocsyntax.check_head = check_head
-dpdocsyntax.close_note = close_note
+class WorkUnit( object ) :
+    __slots__ = ['lnum','tok','text','stuff']
+    def __init__ ( self, lnum, tok, text ) :
+        self.lnum = lnum # actual line number in document
+        self.tok = tok   # the parser token or later, event code
+        self.text = text # full text of the line
+        self.stuff = { 'F':0, 'L':0, 'R':0 }
+    def __repr__( self ) :
+        # __repr__ used only in testing
+        return '''WorkUnit( lnum={}, tok="{}", text="{}" )'''.format(
+            self.lnum, self.tok, self.text )
+    def copy( self ) :
+        return WorkUnit(self.lnum, self.tok, '')
+
+''' The grammar name of a token, for error messages. '''
+def _token_name( token ) :
+    for ( name, value ) in TOKEN_VALUE.items() :
+        if value == token :
+            return name
+    return { ']' : 'BCLOSE', '$' : 'END' }.get( token, token )
 
 '''
 Globals needed to perform "tokenization" of the lines of the document.
@@ -799,16 +1356,17 @@ TOKEN_VALUE = {
 
 '''
 Override the YAPPS scanner with our own code to generate one character
-per line of the document. It is initialized with the editdata.all_lines
-iterator from the Book.
+per line of the document. It is initialized with the DocParse it works for
+and an iterator over the lines of the document.
 '''
-class DocScanner( dpdocsyntax.DPDOCScanner ) :
+class DocScanner( object ) :
     # recognize head of a footnote isolating the Key
     fnrex = regex.compile( r'\[Footnote\s+([^:]+):\s*' )
     # recognize head of illo, isolate one or two filenames
-    ilrex = regex.compile( r'\[Illustration:((\w+\.\w+)(\|(\w+\.\w+))?)?\s*' )
+    # (the colon is optional, as it is to the token regex)
+    ilrex = regex.compile( r'\[Illustration:?((\w+\.\w+)(\|(\w+\.\w+))?)?\s*' )
     # recognize head of sidenote
-    snrex = regex.compile( r'\[Sidenote:\s*' )
+    snrex = regex.compile( r'\[Sidenote:?\s*' )
     # recognize one column spec on a /T line, being very forgiving. This accepts
     # such as l, 9C, 25rclTB, etc.
     tbrex = regex.compile( r'[0-9lcrTBC]+' )
@@ -816,11 +1374,10 @@ class DocScanner( dpdocsyntax.DPDOCScanner ) :
     tbhor = regex.compile( r'[lrc]' ) # extract first horizontal char if any
     tbver = regex.compile( r'[TBC]' ) # extract first vertical char if any
 
-    def __init__( self, iterator ):
-        self.iterator = iterator
+    def __init__( self, doc_parse ):
+        self.doc_parse = doc_parse
         self.line_number = 0
         self.find_bracket = False
-        super().__init__('')
 
     nfrex = regex.compile( r'F\w*:\s*(\d+)' )
     def _find_first( self, unit ) :
@@ -840,27 +1397,23 @@ class DocScanner( dpdocsyntax.DPDOCScanner ) :
         if mob :
             unit.stuff['R'] = int( mob.group(1) )
 
-    def grab_input( self ) :
-        global SAVED_CLOSE
-        if self.pos < len( self.input ) :
-            return # some pushed tokens to read still
-        # parser needs another token.
-        self.pos = 0
+    '''
+    Return the tokens for the parser for the next line of the document,
+    usually one character but up to three, and make its work units. At
+    the end of the document, deliver the END token, as often as asked.
+    '''
+    def scan_end( self ) :
         self.line_number += 1
+        return '$'
 
+    def scan_line( self, line ) :
+        self.line_number += 1
         # TODO at this point get file offset and find out if it hits a
         # different scan image, and if so, insert a pagebreak work unit
         # Maybe need to deal in text blocks instead of lines?
 
-        try:
-            # Get the next document line. If this is unit test, iterator is
-            # stringIo and returns strings with newlines. If it is real life,
-            # there should be no whitespace at the end of a line anyway.
-            line = next(self.iterator).rstrip()
-        except StopIteration :
-            # No more lines to process, so...
-            self.input = '$' # ..deliver the END token
-            return # parser should never call back
+        # There should be no whitespace at the end of a line anyway.
+        line = line.rstrip()
 
         # Extract the meaning of the received line.
         mob = TOKEN_X.match(line) # cannot fail
@@ -870,11 +1423,11 @@ class DocScanner( dpdocsyntax.DPDOCScanner ) :
         # for the parser to read.
 
         tok = TOKEN_VALUE[ mob.lastgroup ]
-        self.input = tok
+        tokens = tok
 
         # If it is an empty line, we are done; we do not make WorkUnits for
         # empty lines.
-        if tok == 'E' : return
+        if tok == 'E' : return tokens
 
         # Not an empty line, so make a work unit.
         unit = WorkUnit( self.line_number, tok, line )
@@ -882,12 +1435,12 @@ class DocScanner( dpdocsyntax.DPDOCScanner ) :
         # If starting a bracketed group, set the switch for "looking for a
         # closing bracket". Remove boilerplate from the line text, and put
         # optional items in the stuff dict. Put the group-opening unit on
-        # the WORK_UNITS list and continue with a Line unit.
+        # the work unit list and continue with a Line unit.
         if tok in 'FIS' :
             self.find_bracket = True
             open_unit = unit.copy() # make an F/I/S unit with no text.
-            WORK_UNITS.append( open_unit )
-            self.input += 'L' # token input is FL, IL, or SL
+            self.doc_parse.append( open_unit )
+            tokens += 'L' # token input is FL, IL, or SL
             unit.tok = 'L' # second unit is a LINE
             if tok == 'F' :
                 # remove [Footnote A: from LINE, save "A" in OPEN stuff
@@ -953,13 +1506,13 @@ class DocScanner( dpdocsyntax.DPDOCScanner ) :
         # paragraph that might be working; the ] closes the group.)
         if self.find_bracket :
             if line.endswith(']') :
-                if line.strip() == ']' and WORK_UNITS[-1].tok != 'L' :
+                if line.strip() == ']' and self.doc_parse.last().tok != 'L' :
                     # they ended the block with e.g. a quote and a bracket
                     # on a line by itself.
-                    self.input = self.input[:-1] + ']' # make input ], possibly F] or I]
+                    tokens = tokens[:-1] + ']' # make input ], possibly F] or I]
                     unit.tok = ']'
                 else :
-                    self.input += 'E]' # make input LE], possibly FLE]
+                    tokens += 'E]' # make input LE], possibly FLE]
                     unit.text = unit.text[:-1] # clear bracket from text
                 # either way, no mo brackets expected
                 self.find_bracket = False
@@ -970,15 +1523,13 @@ class DocScanner( dpdocsyntax.DPDOCScanner ) :
         # ahead of every Q/ or U/. However, we also want to append the
         # QCLOSE/UCLOSE work unit we just built, but only after the PCLOSE is
         # pushed by close_para() above.
-        if tok in 'qu' and WORK_UNITS[-1].tok =='L' :
+        if tok in 'qu' and self.doc_parse.last().tok =='L' :
             # closing a quote or list with a paragraph working.
-            self.input = 'E' + tok # input is Eq or Eu
-            SAVED_CLOSE = unit # QCLOSE/UCLOSE unit deferred
+            tokens = 'E' + tok # input is Eq or Eu
+            self.doc_parse.saved_close = unit # QCLOSE/UCLOSE unit deferred
         else :
-            WORK_UNITS.append( unit )
-
-    def get_pos( self ) :
-        return ( '', 1, self.line_number )
+            self.doc_parse.append( unit )
+        return tokens
 
 # End of document-parsing code
 
@@ -986,7 +1537,7 @@ class DocScanner( dpdocsyntax.DPDOCScanner ) :
          "Event" generator
 
 The following generator function yields a sequence of Events based on the
-contents of WORK_UNITS above.
+Work Units from a DocParse, as they come.
 
 An Event is a tuple (code, text, stuff, lnum) which in most cases is just
 the contents of a WorkUnit. We have to make the following modifications.
@@ -1008,9 +1559,39 @@ exceeds the start of the next page and generate a pagebreak event.
 
 5, on finding a Table, break it down into separate events. This is
 raw-ther complex.
+
+6, if run_translator() passed a progress function, call it every
+PROGRESS_UNITS work units with the line number reached and the number of
+lines, and stop the Translator if it says to.
+'''
+PROGRESS_UNITS = 500
+
+'''
+The line number at which the page break of each scan image is to come: the
+first line that starts at or after the start of the page. The pages are
+matched to lines in one merge of their positions, which are in order, with
+the table of line starts, so the generator need only compare line numbers.
+A page starting after the last line gets a line number past the end, and no
+page break. A page out of order is looked up on its own.
 '''
-def event_generator( page_model, edit_model ) :
-    global WORK_UNITS
+def _page_lines( page_model, edit_model ) :
+    if not page_model.active() :
+        return []
+    starts = edit_model.line_start_table()
+    lines = []
+    line = 0
+    last_pos = -1
+    for page in range( page_model.page_count() ) :
+        pos = page_model.position( page )
+        if pos < last_pos :
+            line = bisect.bisect_left( starts, pos )
+        last_pos = pos
+        while line < len( starts ) and starts[ line ] < pos :
+            line += 1
+        lines.append( line + 1 )
+    return lines
+
+def event_generator( page_model, edit_model, units, progress=None ) :
 
     # When the actual lnum of a unit exceeds expect_lnum, and we are in a
     # no-flow section, we need to generate blank lines to fill in.
@@ -1021,17 +1602,23 @@ def event_generator( page_model, edit_model ) :
     # The "bracket" group (fnote, snote, illo) last seen, to be closed
     # when a ']' token appears.
     last_bracket = None
-    # The index of the next scan image, if any, and the position at which it
-    # starts in the source document. If there are no scan images, store a
-    # start position that will never be reached.
+    # The index of the next scan image, if any, and for each scan image the
+    # line number at which its page break comes, see _page_lines().
     next_scan = 0
-    scan_limit = page_model.page_count()
-    next_scan_starts = page_model.position(0) if page_model.active() else int( 2**31 )
+    page_lines = _page_lines( page_model, edit_model )
+    scan_limit = len( page_lines )
     # If in a table, all LINEs get special treatment.
     in_table = False
     columns = []
 
-    for unit in WORK_UNITS :
+    line_count = edit_model.blockCount()
+
+    for ( unit_number, unit ) in enumerate( units ) :
+
+        # Report progress every PROGRESS_UNITS units, and stop if asked.
+        if progress is not None and 0 == unit_number % PROGRESS_UNITS :
+            if not progress( unit.lnum, line_count ) :
+                raise TranslationCancelled
 
         code = unit.tok
         text = unit.text
@@ -1039,13 +1626,11 @@ def event_generator( page_model, edit_model ) :
         lnum = unit.lnum
 
         # In the following we are allowing for the not-uncommon event where
-        # there are multiple pages with the same offset. If we run off the
-        # end of the list, position() returns None, and the >= returns False.
-        while edit_model.line_starts( lnum ) >= next_scan_starts :
+        # there are multiple pages with the same offset, so the same line.
+        while next_scan < scan_limit and page_lines[ next_scan ] <= lnum :
             yield ( XU.Events.PAGE_BREAK, '',
                     {'page':next_scan, 'folio':page_model.folio_string(next_scan) }, lnum )
             next_scan += 1
-            next_scan_starts = page_model.position( next_scan ) if next_scan < scan_limit else int( 2**31 )
 
         if in_table :
             # Only two codes can happen in a table, "t" and LINE
@@ -1140,23 +1725,12 @@ There has to be a line after a head.
 U/
 '''
 
-    import io
-    import yapps.runtime as yapps_runtime
-    DOCFILE = io.StringIO( initial_value = DOC9 )
-    scanner = DocScanner( DOCFILE )
-    parser = dpdocsyntax.DPDOC( scanner )
     try:
-        x = parser.goal()
-    except yapps_runtime.SyntaxError as s:
-        print( 'Document structure error around line {}'.format(s.pos[2]) )
-        print( 'Processing', s.context.rule )
-        print( s.msg )
-    #except Exception as e:
-        #print('Other error')
-        #print(e)
-
-    for unit in WORK_UNITS :
-        print( unit )
+        for unit in DocParse( DOC9 ).units() :
+            print( unit )
+    except DocumentError as e:
+        print( e.args[0] )
+        print( e.args[1] )
     DOC8 = '''
 This keys a footnote[*].
 
@@ -250,6 +250,13 @@ def _check_encoding(fname):
         enc = C.ENCODING_LATIN
     return enc
 
+'''
+The name of the Python codec for writing a file without a QTextStream, as
+in a background save, by the same rule.
+'''
+def python_encoding(fname):
+    return 'ISO-8859-1' if _check_encoding(fname) == C.ENCODING_LATIN else 'UTF-8'
+
 '''
 Convert a QFile for a valid path, into a FileBasedTextStream.
 Refactored out of the following functions.
@@ -601,10 +608,11 @@ def get_find_string(caption, parent, prepared = ''):
 Create a QProgressDialog with no Cancel button and a 0.5-second display time,
 based on a title string and parent widget passed by the caller. The maximum
 value is set to 100. The user can either call setValue() in integer percents,
-or call setMaximum() to set a different end-value.
+or call setMaximum() to set a different end-value. If a cancel label is
+given there is a Cancel button with that label; check wasCanceled().
 '''
-def make_progress(caption,  parent):
-    progress = QProgressDialog( caption, None, 0, 100, parent)
+def make_progress(caption,  parent, cancel=None):
+    progress = QProgressDialog( caption, cancel, 0, 100, parent)
     progress.setMinimumDuration(500)
     return progress
 
@@ -76,6 +76,12 @@ user selects a new scannos file.
 word_read() is registered to read the WORDCENSUS section and initializes the
 vocabulary dict from the object saved by word_save(), with validity checks in
 case of user editing.
+The WORDCENSUS section is registered lazy, so word_read() is not called
+when the book is opened but by load_census(), when the vocabulary is first
+wanted. Until then a save writes back the census as it was read.
+It is also registered tracked: every method that changes the vocabulary
+calls metamgr.mark_dirty(), and a save that follows none of them writes the
+census without calling word_save().
 
 We do not know (nor should care) in which order the metadata readers are
 called. However, each of good_, bad_ and word_read can affect the display of
@@ -159,6 +165,8 @@ Called by the edit panel syntax highlighter:
 
 * spelling_test(token_string) returns "XX in" that token's properties,
   that is, False means correctly spelled, True means mark it misspelt.
+  The highlighter must call load_census() before it starts, as this
+  method is too busy to check.
 
 If the token is not in the table (perhaps the user typed in a new word since
 the last refresh) we return False. So newly entered words are not highlighted
@@ -410,7 +418,8 @@ class WordData(QObject):
         self.metamgr.register(C.MD_GW, self.good_read, self.good_save)
         self.metamgr.register(C.MD_BW, self.bad_read, self.bad_save)
         self.metamgr.register(C.MD_SC, self.scanno_read, self.scanno_save)
-        self.metamgr.register(C.MD_VL, self.word_read, self.word_save)
+        self.metamgr.register(C.MD_VL, self.word_read, self.word_save,
+                              lazy=True, tracked=True)
     # End of __init__
 
     '''
@@ -467,6 +476,7 @@ class WordData(QObject):
                             props = self.vocab[token][1]
                             props.add(GW)
                             props &= prop_nox
+                            self.metamgr.mark_dirty(C.MD_VL)
                 else :
                     worddata_logger.error(
                         '{} in GOODWORDS list ignored'.format(token)
@@ -493,6 +503,7 @@ class WordData(QObject):
                             props = self.vocab[token][1]
                             props.add(BW)
                             props.add(XX)
+                            self.metamgr.mark_dirty(C.MD_VL)
                 else :
                     worddata_logger.error(
                         '{} in BADWORDS list ignored'.format(token)
@@ -595,6 +606,19 @@ class WordData(QObject):
         self.WordsUpdated.emit()
     # end of word_read()
 
+    '''
+    The WORDCENSUS section is registered lazy, because word_read() of a
+    big book's vocabulary can take longer than loading its text. So it is
+    read not when the book opens but when the census is first needed, here.
+    The methods that change the vocabulary, or serve callers other than the
+    word panel, call this first; it costs one dict lookup once the census
+    is loaded. The word panel calls it when it is first shown, and not from
+    its table model, because word_read() signals the panel to reset that
+    model. The edit view calls it before it starts spelling highlights.
+    '''
+    def load_census(self):
+        self.metamgr.load_deferred(C.MD_VL)
+
     '''
     Methods used when opening a new file, one with no metadata.
     
@@ -643,6 +667,8 @@ class WordData(QObject):
     '''
     def recheck_spelling(self, speller):
         global PROP_BGH, prop_nox
+        self.load_census()
+        self.metamgr.mark_dirty(C.MD_VL)
         self.speller = speller
         for i in range(len(self.vocab)) :
             (c, p) = self.vocab_vview[i]
@@ -662,6 +688,8 @@ class WordData(QObject):
     '''
     def refresh(self):
         global RE_LANG_ATTR, RE_TOKEN
+        self.load_census()
+        self.metamgr.mark_dirty(C.MD_VL)
         ''' Get a reference to the dictionary to use. '''
         self.speller = self.my_book.get_speller()
         ''' Clear the alt-dict list. '''
@@ -857,6 +885,7 @@ class WordData(QObject):
     Get the actual size of the vocabulary, for searching it all.
     '''
     def vocab_count(self):
+        self.load_census()
         return len(self.vocab)
     '''
     Get the word at position n in the vocabulary, using the
@@ -975,6 +1004,8 @@ class WordData(QObject):
     # (but does not have to) exist in the database; add GW and remove XX from
     # its properties.
     def add_to_good_set(self, word):
+        self.load_census()
+        self.metamgr.mark_dirty(C.MD_VL)
         self.good_words.add(word)
         if word in self.vocab_kview :
             [count, pset] = self.vocab[word]
@@ -988,6 +1019,8 @@ class WordData(QObject):
     # the database. If it does, remove GW and set XX based on a spellcheck
     # test.
     def del_from_good_set(self, word):
+        self.load_census()
+        self.metamgr.mark_dirty(C.MD_VL)
         self.good_words.remove(word)
         if word in self.vocab_kview :
             [count, pset] = self.vocab[word]
@@ -999,6 +1032,7 @@ class WordData(QObject):
 
     # mostly used by unit test, get the index of a word by its key
     def word_index(self, w):
+        self.load_census()
         try:
             return self.vocab_kview.index(w)
         except Exception as whatever:
@@ -819,6 +819,15 @@ class WordPanel(QWidget) :
         ''' Connect worddata changes due to metadata input '''
         self.words.WordsUpdated.connect(self.do_update)
 
+    '''
+    The word census of a book is not read from metadata until it is needed,
+    which is at latest when this panel is first shown. Loading it signals
+    WordsUpdated, so do it before the table is painted.
+    '''
+    def showEvent(self, event):
+        self.words.load_census()
+        super().showEvent(event)
+
     '''
     Receive the clicked() signal from the Refresh button.
     Clear any filtering being used in the model, but leave the
@@ -0,0 +1,307 @@
+__license__ = '''
+ License (GPL-3.0) :
+    This file is part of PPQT Version 2.
+    PPQT is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You can find a copy of the GNU General Public License in the file
+    extras/COPYING.TXT included in the distribution of this program, or see:
+    <http://www.gnu.org/licenses/>.
+'''
+__version__ = "1.0.0"
+__author__  = "David Cortesi"
+__copyright__ = "Copyright 2015 David Cortesi"
+__maintainer__ = "David Cortesi"
+__email__ = "tallforasmurf@yahoo.com"
+
+DOCSTRING = '''
+Translate books without the PPQT window, for example to make HTML and ASCII
+versions of many books at once. Run it through PPQT2.py:
+
+    python3 PPQT2.py --translate HTML book.txt -o book.html
+    python3 PPQT2.py --translate ASCII --options max_line=70 bold=omit *.txt
+
+--translate names a Translator in extras/Translators by its menu name, in
+any case. Each --options (or -O) is followed by one or more name=value
+pairs, which set the values that the Translator's options dialog would ask
+for; otherwise the Translator's defaults are used. An option is named by
+its label in the dialog or by the Translator global that defines it, with
+or without a DI_ prefix.
+
+Each book is read with its .ppqt metadata, if any, for its page table and
+book facts. With one book, -o names the output file; with several, -o
+names a folder for them. By default each output is written beside its book,
+named for the book with the Translator's menu name as the suffix. Several
+books are translated in parallel, one process per CPU, or as many as -j
+gives.
+'''
+
+import logging
+my_logger = logging.getLogger(name='xltbatch')
+import sys
+import os
+import concurrent.futures
+import multiprocessing
+
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+#
+# Write a brief help message to stdout
+
+def help():
+    print( DOCSTRING )
+
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+#
+# The document and page models need a Qt application, but no window. Make
+# one on the offscreen platform, before any module that makes a QFont at
+# import, so the PPQT modules are imported here and not at the top. This
+# runs once in the main process and once in each worker process.
+
+THE_APP = None
+
+def start_qt():
+    global THE_APP
+    if THE_APP is None :
+        os.environ.setdefault( 'QT_QPA_PLATFORM', 'offscreen' )
+        from PyQt6.QtWidgets import QApplication
+        from PyQt6.QtCore import QSettings
+        THE_APP = QApplication( [ '' ] )
+        THE_APP.setOrganizationName( "PGDP" )
+        THE_APP.setOrganizationDomain( "pgdp.net" )
+        THE_APP.setApplicationName( "PPQT2" )
+        import paths
+        paths.initialize( QSettings() )
+
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+#
+# Just enough of a Book for translators.run_translator(): the document, the
+# page table and the book facts. make_book() takes the text and streams of
+# metadata, and read_book() reads them from a book file and its .ppqt file.
+# Other sections of the metadata are read and ignored.
+
+def make_book( text, meta_streams, name ):
+    from PyQt6.QtCore import QObject
+    import constants as C
+    import metadata
+    import editdata
+    import pagedata
+
+    class BatchBook( QObject ):
+        def __init__( self ):
+            super().__init__( None )
+            self.book_facts = dict()
+            self.metamgr = metadata.MetaMgr()
+            self.metamgr.register( C.MD_BI, self._read_facts, lambda section : self.book_facts )
+            self.editm = editdata.Document( self )
+            self.pagem = pagedata.PageData( self )
+            for name in dir( C ) :
+                section = getattr( C, name )
+                if name.startswith( 'MD_' ) and isinstance( section, str ) \
+                and section not in self.metamgr.section_dict :
+                    self.metamgr.register( section, self._ignore, self._ignore )
+        def _read_facts( self, section, value, version ):
+            if isinstance( value, dict ) :
+                self.book_facts = { key : arg for ( key, arg ) in value.items()
+                                    if isinstance( key, str ) and isinstance( arg, str ) }
+        def _ignore( self, *args ):
+            return None
+        def get_font_size( self ):
+            return C.DEFAULT_FONT_SIZE
+        def get_meta_manager( self ):
+            return self.metamgr
+        def get_edit_model( self ):
+            return self.editm
+        def get_page_model( self ):
+            return self.pagem
+        def get_book_facts( self ):
+            return self.book_facts
+        def metadata_modified( self, state, flag ):
+            pass
+
+    book = BatchBook()
+    book.editm.setPlainText( text )
+    for meta_stream in meta_streams :
+        message = book.metamgr.load_meta( meta_stream )
+        if message :
+            my_logger.error( 'Ignoring metadata of {}: {}'.format( name, message ) )
+    return book
+
+def read_book( book_path ):
+    import constants as C
+    import utilities
+    doc_stream = utilities.path_to_stream( book_path )
+    if doc_stream is None :
+        return None
+    meta_stream = utilities.related_suffix( doc_stream, C.METAFILE_SUFFIX )
+    return make_book( doc_stream.readAll(),
+                      [] if meta_stream is None else [ meta_stream ],
+                      book_path )
+
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+#
+# Translate one book, in this process or a worker. The Translator is loaded
+# afresh in each process, found by its menu name, and its options set.
+# Return None for success or an error message.
+
+def translate_one( menu_name, options, book_path, out_path ):
+    start_qt()
+    import translators
+    found = [ xlt for xlt in translators.find_translators()
+              if xlt.MENU_NAME.lower() == menu_name.lower() ]
+    if not found :
+        return 'no Translator named {}'.format( menu_name )
+    xlt_namespace = found[0]
+    errors = translators.set_options( xlt_namespace, options )
+    if errors :
+        return '; '.join( errors )
+    book = read_book( book_path )
+    if book is None :
+        return 'cannot read {}'.format( book_path )
+    messages = []
+    result = translators.run_translator( xlt_namespace, book,
+                                         lambda m1, m2 : messages.append( m1 + ': ' + m2 ) )
+    if result is None :
+        return '; '.join( messages ) or 'the Translator failed'
+    try :
+        with open( out_path, 'w', encoding='UTF-8' ) as out_file :
+            for stream in result[:3] :
+                stream.rewind()
+                out_file.write( stream.readAll() )
+    except OSError as error_object :
+        return str( error_object )
+    return None
+
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+#
+# Translate a snapshot of an open book in a worker process started by
+# translators.xlt_book(), so the PPQT window stays responsive. It gets the
+# path of the Translator, the results of its option dialog in order, the
+# text, and the page table and book facts sections as JSON. Progress goes
+# back on queue as ('progress', done, total), and the outcome as one of
+# ('done', text, page_list), ('error', m1, m2) or ('cancelled',). When the
+# cancel event is set, translation stops at the next progress report, and
+# the outcome is ('cancelled',) even if the Translator finished anyway.
+
+def translate_snapshot( xlt_path, option_results, text, meta_texts, queue, cancel ):
+    start_qt()
+    import translators
+    import utilities
+    xlt_namespace = translators.load_translator( xlt_path )
+    if xlt_namespace is None :
+        queue.put( ( 'error', 'Cannot load the Translator', xlt_path ) )
+        return
+    for ( item, result ) in zip( getattr( xlt_namespace, 'OPTION_DIALOG', None ) or [],
+                                 option_results ) :
+        item.result = result
+    meta_streams = []
+    for meta_text in meta_texts :
+        stream = utilities.MemoryStream()
+        stream << meta_text
+        stream.rewind()
+        meta_streams.append( stream )
+    book = make_book( text, meta_streams, xlt_namespace.MENU_NAME )
+    messages = []
+    def progress( done, total ):
+        queue.put( ( 'progress', done, total ) )
+        return not cancel.is_set()
+    result = translators.run_translator( xlt_namespace, book,
+                                         lambda m1, m2 : messages.append( ( m1, m2 ) ),
+                                         progress )
+    if cancel.is_set() :
+        queue.put( ( 'cancelled', ) )
+    elif result is not None :
+        parts = []
+        for stream in result[:3] :
+            stream.rewind()
+            parts.append( stream.readAll() )
+        queue.put( ( 'done', ''.join( parts ), result[3] ) )
+    elif messages :
+        queue.put( ( 'error', ) + messages[0] )
+    else :
+        queue.put( ( 'error', 'The Translator failed', xlt_namespace.MENU_NAME ) )
+
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+#
+# Parse the command line (after --translate) into the Translator name,
+# options, book paths, output path and process count, or None if it makes
+# no sense.
+
+def parse_args( args ):
+    menu_name = None
+    options = dict()
+    books = []
+    out_path = None
+    jobs = None
+    args = list( args )
+    try :
+        while args :
+            arg = args.pop(0)
+            if arg == '--translate' :
+                menu_name = args.pop(0)
+            elif arg in ( '--options', '-O' ) :
+                while args and '=' in args[0] and not args[0].startswith( '-' ) :
+                    ( key, value ) = args.pop(0).split( '=', 1 )
+                    options[ key ] = value
+            elif arg == '-o' :
+                out_path = args.pop(0)
+            elif arg == '-j' :
+                jobs = int( args.pop(0) )
+            else :
+                books.append( arg )
+    except ( IndexError, ValueError ) :
+        return None
+    if menu_name is None or not books :
+        return None
+    return ( menu_name, options, books, out_path, jobs )
+
+def output_path( book_path, menu_name, out_path, several ):
+    name = os.path.splitext( os.path.basename( book_path ) )[0] + '.' + menu_name.lower()
+    if out_path is None :
+        return os.path.join( os.path.dirname( book_path ), name )
+    if several :
+        return os.path.join( out_path, name )
+    return out_path
+
+def main( argv ):
+
+    parsed = parse_args( argv[1:] )
+    if parsed is None :
+        help()
+        return 2
+    ( menu_name, options, books, out_path, jobs ) = parsed
+    several = len( books ) > 1
+    if several and out_path is not None and not os.path.isdir( out_path ) :
+        my_logger.error( 'With several books, -o must name a folder' )
+        return 2
+    work = [ ( book_path, output_path( book_path, menu_name, out_path, several ) )
+             for book_path in books ]
+
+    failures = 0
+    if not several :
+        # one book: no point in starting another process
+        results = [ translate_one( menu_name, options, *work[0] ) ]
+    else :
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=jobs,
+                mp_context=multiprocessing.get_context('spawn') ) as pool :
+            futures = [ pool.submit( translate_one, menu_name, options, book_path, out_name )
+                        for ( book_path, out_name ) in work ]
+            results = [ future.result() for future in futures ]
+    for ( ( book_path, out_name ), error ) in zip( work, results ) :
+        if error is None :
+            print( 'Translated {0} to {1}'.format( book_path, out_name ) )
+        else :
+            failures += 1
+            my_logger.error( 'Cannot translate {0}: {1}'.format( book_path, error ) )
+            print( 'Failed {0}: {1}'.format( book_path, error ) )
+    return 1 if failures else 0
+
+if __name__ == '__main__' :
+    sys.exit( main( sys.argv ) )